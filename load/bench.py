@@ -0,0 +1,307 @@
+"""
+Offline benchmark of the e-mail validation, driving both the
+`SMTPVerifier` and the FastAPI app against an in-process fake SMTP
+server and a stub DNS resolver, at varying concurrency levels.
+
+Usage:
+
+    python load/bench.py --concurrency 1,16,64 --requests 2000
+    python load/bench.py --save load/baseline.json
+    python load/bench.py --baseline load/baseline.json --tolerance 0.2
+
+When a baseline is provided the run is compared against it and the
+process exits with a non zero code in case of regressions.
+"""
+
+import os
+import sys
+import json
+import socket
+import asyncio
+import argparse
+
+from time import perf_counter
+from urllib.parse import urlencode
+from typing import Any, Awaitable, Callable, Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the fakes are shared with the tests, that own them
+sys.path.insert(0, os.path.join(ROOT, "test", "common"))
+
+from fakes import FakeResolver, FakeSMTPServer
+
+HOST = "127.0.0.1"
+
+STALL_HOST = "127.0.0.2"
+
+# the reserved (special use) TLDs are rejected before any network work
+# so the (resolved by the stub) domains use a non reserved one
+CATCH_ALL_DOMAINS = ["catchall.bench"]
+
+TIMEOUT_DOMAINS = ["timeout.bench"]
+
+Result = dict[str, float]
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as _socket:
+        _socket.bind((HOST, 0))
+        return _socket.getsockname()[1]
+
+
+def workload(requests: int, bad: float, catch_all: float, timeouts: float) -> list[str]:
+    """
+    Builds the (deterministic) list of unique addresses to validate,
+    mixing deliverable, undeliverable, catch-all and timing out ones
+    according to the provided ratios.
+    """
+
+    addresses: list[str] = []
+    for index in range(requests):
+        slot = (index * 7919 % 1000) / 1000.0
+        if slot < timeouts:
+            addresses.append(f"user{index}@{TIMEOUT_DOMAINS[0]}")
+        elif slot < timeouts + bad:
+            addresses.append(f"bad{index}@domain{index % 50}.bench")
+        elif slot < timeouts + bad + catch_all:
+            addresses.append(f"user{index}@{CATCH_ALL_DOMAINS[0]}")
+        else:
+            addresses.append(f"user{index}@domain{index % 50}.bench")
+    return addresses
+
+
+def percentile(values: Sequence[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(int(round(percent / 100.0 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+async def drive(
+    call: Callable[[str], Awaitable[bool]], addresses: Sequence[str], concurrency: int
+) -> Result:
+    """
+    Runs the provided call for every address using a fixed number
+    of concurrent workers, measuring the latency of each call.
+    """
+
+    latencies: list[float] = []
+    errors = 0
+    iterator = iter(addresses)
+
+    async def worker():
+        nonlocal errors
+        for address in iterator:
+            start = perf_counter()
+            try:
+                if not await call(address):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(perf_counter() - start)
+
+    start = perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = perf_counter() - start
+
+    return dict(
+        requests=len(latencies),
+        errors=errors,
+        elapsed=elapsed,
+        throughput=len(latencies) / elapsed if elapsed else 0.0,
+        p50=percentile(latencies, 50) * 1000.0,
+        p95=percentile(latencies, 95) * 1000.0,
+        p99=percentile(latencies, 99) * 1000.0,
+    )
+
+
+async def asgi_get(app: Any, path: str, query: str) -> int:
+    """
+    Sends a GET request directly to the ASGI app (no network), so
+    that only the app overhead is added to the verifier one.
+    """
+
+    status = 0
+    scope = dict(
+        type="http",
+        asgi=dict(version="3.0", spec_version="2.3"),
+        http_version="1.1",
+        method="GET",
+        scheme="http",
+        path=path,
+        raw_path=path.encode("utf-8"),
+        root_path="",
+        query_string=query.encode("utf-8"),
+        headers=[(b"host", b"bench")],
+        client=(HOST, 0),
+        server=(HOST, 80),
+    )
+
+    async def receive() -> dict[str, Any]:
+        return dict(type="http.request", body=b"", more_body=False)
+
+    async def send(message: dict[str, Any]):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def compare(
+    results: dict[str, Result], baseline: dict[str, Result], tolerance: float
+) -> list[str]:
+    """
+    Compares the results against the baseline ones, a regression is
+    a throughput drop or a p95/p99 latency increase beyond the tolerance.
+    """
+
+    regressions: list[str] = []
+    for name, result in results.items():
+        base = baseline.get(name, None)
+        if not base:
+            continue
+        if result["throughput"] < base["throughput"] * (1.0 - tolerance):
+            regressions.append(
+                f"{name}: throughput {result['throughput']:.1f} req/s "
+                f"(baseline {base['throughput']:.1f} req/s)"
+            )
+        for key in ("p95", "p99"):
+            if result[key] > base[key] * (1.0 + tolerance):
+                regressions.append(
+                    f"{name}: {key} {result[key]:.2f} ms (baseline {base[key]:.2f} ms)"
+                )
+    return regressions
+
+
+def report(results: dict[str, Result], baseline: dict[str, Result]):
+    print(
+        f"{'scenario':<16}{'requests':>10}{'errors':>8}{'req/s':>10}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'vs base':>10}"
+    )
+    for name, result in results.items():
+        base = baseline.get(name, None)
+        delta = (
+            f"{(result['throughput'] / base['throughput'] - 1.0) * 100.0:+.1f}%"
+            if base and base["throughput"]
+            else "-"
+        )
+        print(
+            f"{name:<16}{result['requests']:>10.0f}{result['errors']:>8.0f}"
+            f"{result['throughput']:>10.1f}{result['p50']:>10.2f}"
+            f"{result['p95']:>10.2f}{result['p99']:>10.2f}{delta:>10}"
+        )
+
+
+async def run(options: argparse.Namespace) -> dict[str, Result]:
+    from posterum.common import smtp
+    from posterum.common.resolver import MXResolver
+
+    from app import app
+
+    records = dict((domain, [STALL_HOST]) for domain in TIMEOUT_DOMAINS)
+    resolver = FakeResolver(records=records, default=[HOST], latency=options.dns)
+    smtp.MX_RESOLVER = MXResolver(factory=lambda: resolver)
+
+    server = FakeSMTPServer(
+        hosts=(HOST, STALL_HOST) if options.timeouts else (HOST,),
+        port=int(os.environ["SMTP_PORT"]),
+        latency=options.latency,
+        jitter=options.jitter,
+        greylist=options.greylist,
+        catch_all_domains=CATCH_ALL_DOMAINS,
+        stall_hosts=(STALL_HOST,),
+    )
+
+    async def verifier(address: str) -> bool:
+        result = await smtp.SMTPVerifier.validate_email(address, cache=False)
+        return not result is None
+
+    async def http(address: str) -> bool:
+        status = await asgi_get(
+            app, "/v1/addresses/validate", urlencode(dict(email=address, cache="false"))
+        )
+        return status == 200
+
+    targets = dict(verifier=verifier, app=http)
+    results: dict[str, Result] = {}
+
+    async with server:
+        for target in options.targets.split(","):
+            for concurrency in (int(value) for value in options.concurrency.split(",")):
+                addresses = workload(
+                    options.requests,
+                    bad=options.bad,
+                    catch_all=options.catch_all,
+                    timeouts=options.timeouts,
+                )
+                # every scenario uses its own set of addresses so that
+                # no result is shared (coalesced) among scenarios
+                addresses = [
+                    address.replace("@", f"+{target}{concurrency}@")
+                    for address in addresses
+                ]
+                results[f"{target}/c{concurrency}"] = await drive(
+                    targets[target], addresses, concurrency
+                )
+
+    return results
+
+
+def main(args: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Offline benchmark of the e-mail validation"
+    )
+    parser.add_argument("--targets", default="verifier,app")
+    parser.add_argument("--concurrency", default="1,16,64")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.001)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--dns", type=float, default=0.0)
+    parser.add_argument("--bad", type=float, default=0.15)
+    parser.add_argument("--catch-all", type=float, default=0.1)
+    parser.add_argument("--timeouts", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=0.5)
+    parser.add_argument("--greylist", action="store_true")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save", default=None)
+    options = parser.parse_args(args)
+
+    # the configuration is read by the verifier at import time so it
+    # must be set before any of the posterum modules is imported
+    os.environ["SMTP_PORT"] = str(free_port())
+    os.environ["SMTP_TIMEOUT"] = str(options.timeout)
+    os.environ["SMTP_FAILOVER"] = "1"
+    os.environ.setdefault("SMTP_HOST", "localhost")
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+
+    results = asyncio.run(run(options))
+
+    baseline: dict[str, Result] = {}
+    if options.baseline:
+        with open(options.baseline, "r") as file:
+            baseline = json.load(file)["results"]
+
+    report(results, baseline)
+
+    if options.save:
+        with open(options.save, "w") as file:
+            json.dump(
+                dict(options=vars(options), results=results),
+                file,
+                indent=4,
+                sort_keys=True,
+            )
+
+    regressions = compare(results, baseline, options.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
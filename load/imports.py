@@ -0,0 +1,174 @@
+"""
+Benchmark of the import (cold start) cost of each of the entry points,
+measuring the import time and the resident memory of each of them in
+a fresh interpreter, and if appier (and its admin stack) is loaded.
+
+Usage:
+
+    python load/imports.py --runs 5
+    python load/imports.py --save load/imports.json
+    python load/imports.py --baseline load/imports.json --tolerance 0.2
+
+When a baseline is provided the run is compared against it and the
+process exits with a non zero code in case of regressions.
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+from statistics import median
+from typing import Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRIES = dict(
+    verifier="from posterum import SMTPVerifier",
+    syntax="from posterum.common.syntax import AddressParser",
+    cli="import posterum.cli",
+    fastapi="from app import app",
+    appier="from posterum import PosterumApp",
+)
+""" The import statement of each of the entry points """
+
+PROBE = """
+import sys, json, resource
+from time import perf_counter
+
+start = perf_counter()
+exec(sys.argv[1])
+elapsed = perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+scale = 1.0 if sys.platform == "darwin" else 1024.0
+print(
+    json.dumps(
+        dict(
+            time=elapsed * 1000.0,
+            rss=rss * scale / (1024.0 * 1024.0),
+            modules=len(sys.modules),
+            appier="appier" in sys.modules,
+        )
+    )
+)
+"""
+
+Result = dict[str, float]
+
+
+def probe(statement: str) -> Result:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.join(ROOT, "src")]
+        + ([env["PYTHONPATH"]] if env.get("PYTHONPATH", None) else [])
+    )
+    output = subprocess.check_output(
+        [sys.executable, "-c", PROBE, statement], env=env, cwd=ROOT
+    )
+    return json.loads(output.decode("utf-8").splitlines()[-1])
+
+
+def measure(statement: str, runs: int) -> Result:
+    """
+    Measures the import of the provided statement in multiple fresh
+    interpreters, using the median of the import times (the first
+    runs are skewed by the cold bytecode and file system caches).
+    """
+
+    samples = [probe(statement) for _ in range(runs)]
+    return dict(
+        time=median(sample["time"] for sample in samples),
+        rss=median(sample["rss"] for sample in samples),
+        modules=samples[-1]["modules"],
+        appier=samples[-1]["appier"],
+    )
+
+
+def compare(
+    results: dict[str, Result], baseline: dict[str, Result], tolerance: float
+) -> list[str]:
+    """
+    Compares the results against the baseline ones, a regression is an
+    import time or memory increase beyond the tolerance or an entry point
+    that loads appier when it did not in the baseline.
+    """
+
+    regressions: list[str] = []
+    for name, result in results.items():
+        base = baseline.get(name, None)
+        if not base:
+            continue
+        if result["time"] > base["time"] * (1.0 + tolerance):
+            regressions.append(
+                f"{name}: import {result['time']:.1f} ms "
+                f"(baseline {base['time']:.1f} ms)"
+            )
+        if result["rss"] > base["rss"] * (1.0 + tolerance):
+            regressions.append(
+                f"{name}: rss {result['rss']:.1f} MB (baseline {base['rss']:.1f} MB)"
+            )
+        if result["appier"] and not base["appier"]:
+            regressions.append(f"{name}: appier is now imported")
+    return regressions
+
+
+def report(results: dict[str, Result], baseline: dict[str, Result]):
+    print(
+        f"{'entry':<12}{'import ms':>12}{'rss MB':>10}{'modules':>10}"
+        f"{'appier':>8}{'vs base':>10}"
+    )
+    for name, result in results.items():
+        base = baseline.get(name, None)
+        delta = (
+            f"{(result['time'] / base['time'] - 1.0) * 100.0:+.1f}%"
+            if base and base["time"]
+            else "-"
+        )
+        print(
+            f"{name:<12}{result['time']:>12.1f}{result['rss']:>10.1f}"
+            f"{result['modules']:>10.0f}{'yes' if result['appier'] else 'no':>8}"
+            f"{delta:>10}"
+        )
+
+
+def main(args: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the import cost of the entry points"
+    )
+    parser.add_argument("--entries", default=",".join(ENTRIES))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--save", default=None)
+    options = parser.parse_args(args)
+
+    results = {
+        name: measure(ENTRIES[name], options.runs)
+        for name in options.entries.split(",")
+    }
+
+    baseline: dict[str, Result] = {}
+    if options.baseline:
+        with open(options.baseline, "r") as file:
+            baseline = json.load(file)["results"]
+
+    report(results, baseline)
+
+    if options.save:
+        with open(options.save, "w") as file:
+            json.dump(
+                dict(options=vars(options), results=results),
+                file,
+                indent=4,
+                sort_keys=True,
+            )
+
+    regressions = compare(results, baseline, options.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Micro benchmark of the provider classification, comparing the
+rules based `ProviderIndex` against the (former) hard-coded chain
+of suffix and substring checks.
+
+Usage:
+
+    python load/providers.py --lookups 200000
+"""
+
+import os
+import sys
+import random
+import argparse
+
+from time import perf_counter
+from typing import Sequence
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLES = [
+    ("aspmx.l.google.com", "2.1.5 OK 5si2397ejb.123 - gsmtp"),
+    ("example-com.mail.protection.outlook.com", "2.1.5 Recipient OK"),
+    ("mta7.am0.yahoodns.net", "250 recipient <joe@yahoo.com> ok"),
+    ("mx.zoho.eu", "250 Zoho Mail ESMTP accepted"),
+    ("mx01.mail.icloud.com", "250 2.1.5 Ok"),
+    ("mx1.example.com", "250 2.1.5 Ok"),
+    ("mail.example.org", "550 5.1.1 User unknown"),
+    ("mx1.smtp.goog", "250 2.1.5 OK - gsmtp"),
+]
+
+
+def chain(mx_server: str | None = None, message: str | None = None) -> str:
+    # the classification as done before the rules based index
+    if mx_server:
+        if mx_server.endswith(".google.com"):
+            return "google"
+        if mx_server.endswith(".outlook.com"):
+            return "microsoft"
+    if message:
+        if "gsmtp" in message:
+            return "google"
+        if "outlook" in message:
+            return "microsoft"
+        if "yahoo" in message:
+            return "yahoo"
+    return "unknown"
+
+
+def measure(name: str, classify, lookups: Sequence[tuple[str, str]]) -> float:
+    start = perf_counter()
+    for mx_server, message in lookups:
+        classify(mx_server, message)
+    elapsed = perf_counter() - start
+    print(
+        f"{name:<16}{len(lookups) / elapsed:>14.0f} lookups/s"
+        f"{elapsed / len(lookups) * 1e9:>12.0f} ns/lookup"
+    )
+    return elapsed
+
+
+def main(args: Sequence[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark of the provider index")
+    parser.add_argument("--lookups", type=int, default=200000)
+    options = parser.parse_args(args)
+
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+    from posterum.common.providers import ProviderIndex
+
+    start = perf_counter()
+    index = ProviderIndex.load()
+    print(
+        f"loaded {len(index.rules)} providers in "
+        f"{(perf_counter() - start) * 1000.0:.2f} ms"
+    )
+
+    random.seed(0)
+    lookups = [random.choice(SAMPLES) for _ in range(options.lookups)]
+    measure("chain", chain, lookups)
+    measure("index", index.classify, lookups)
+
+    # unique MX hosts defeat the memoization, measuring the trie walk
+    cold = [(f"mx{i}.{host}", message) for i, (host, message) in enumerate(lookups)]
+    measure("index (cold)", ProviderIndex(index.rules).classify, cold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
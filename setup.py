@@ -14,7 +14,16 @@ setuptools.setup(
     packages=["posterum", "posterum.controllers", "posterum.common"],
     test_suite="posterum.test",
     package_dir={"": os.path.normpath("src")},
-    install_requires=["appier", "appier-extras", "jinja2", "fastapi"],
+    package_data={"posterum.common": ["providers.json", "disposable.txt"]},
+    install_requires=[
+        "appier",
+        "appier-extras",
+        "jinja2",
+        "fastapi",
+        "aiodns",
+        "aiosmtplib>=5.1,<6",
+    ],
+    entry_points={"console_scripts": ["posterum = posterum.cli:main"]},
     classifiers=[
         "Development Status :: 5 - Production/Stable",
         "Topic :: Utilities",
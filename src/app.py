@@ -1,22 +1,75 @@
 import uvicorn
 
-from os import environ
+from os import cpu_count, environ
+from json import dumps
 from time import time
-from typing import Any, cast
+from typing import Any, AsyncIterator, cast
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import (
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.types import Receive, Scope, Send
 
-from posterum import SMTPVerifier, PosterumError
+from posterum import (
+    CACHE_SNAPSHOTS,
+    JOB_MANAGER,
+    JOBS_LIMIT,
+    METRICS,
+    SMTPVerifier,
+    ValidationResult,
+    PosterumError,
+    NotFoundError,
+    UserError,
+    Priority,
+)
+from posterum.common.stream import (
+    extract_addresses,
+    iter_lines,
+    parse_lines,
+    read_addresses,
+    validate_stream,
+)
 
 NAME = "posterum"
 VERSION = "0.1.1"
 DESCRIPTION = "Simple e-mail address SMTP verification service"
 
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streaming response that does not listen for the client disconnect
+    while streaming, as doing so would consume the request body that
+    is still being read (while the response is being sent).
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    # the caches are restored (lazily) from the last snapshot and
+    # then periodically snapshotted, with a final one on shutdown
+    CACHE_SNAPSHOTS.start()
+    try:
+        yield
+    finally:
+        JOB_MANAGER.stop()
+        CACHE_SNAPSHOTS.stop()
+
+
 app = FastAPI(
     title=NAME,
     version=VERSION,
     description=DESCRIPTION,
+    lifespan=lifespan,
 )
 
 
@@ -32,12 +85,21 @@ async def ping():
     return JSONResponse(dict(pong=True, timestamp=time()))
 
 
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(
+        METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/v1/addresses/validate")
 @app.get("/api/v1/addresses/validate")
 async def address_validate(
     address: str | None = None,
     email: str | None = None,
     cache: bool | None = None,
+    profile: bool | None = None,
+    priority: Priority = "interactive",
     key: str | None = None,
 ):
     secret_key = environ.get("SECRET_KEY", None)
@@ -53,31 +115,220 @@ async def address_validate(
     # runs the effective SMTP validation test for the address
     # and obtains the result of the validation, to be used in
     # the sending of the response
-    result = await SMTPVerifier.validate_email(address, cache=cache)
+    result = await SMTPVerifier.validate_email(
+        address, cache=cache, profile=profile, priority=priority
+    )
+
+    return Response(
+        ValidationResult.serialize(address, result), media_type="application/json"
+    )
+
+
+@app.post("/v1/addresses/validate/batch")
+@app.post("/api/v1/addresses/validate/batch")
+async def address_validate_batch(
+    request: Request,
+    cache: bool | None = None,
+    key: str | None = None,
+):
+    secret_key = environ.get("SECRET_KEY", None)
+    batch_limit = int(environ.get("BATCH_LIMIT", "10000"))
 
-    return JSONResponse(dict(address=address, **(result.to_dict() if result else {})))
+    if secret_key and not key == secret_key:
+        raise RuntimeError("Invalid key")
+
+    # the body may be either the plain list of addresses or an
+    # object containing them under the addresses (or emails) key
+    addresses = extract_addresses(await _json(request), limit=batch_limit)
+
+    # runs the SMTP validation for the complete set of addresses
+    # grouping them by MX server to re-use the SMTP sessions
+    results = await SMTPVerifier.validate_emails(addresses, cache=cache)
+
+    return Response(
+        b"["
+        + b",".join(
+            ValidationResult.serialize(address, result)
+            for address, result in zip(addresses, results)
+        )
+        + b"]",
+        media_type="application/json",
+    )
 
 
+@app.post("/v1/addresses/validate/stream")
+@app.post("/api/v1/addresses/validate/stream")
+async def address_validate_stream(
+    request: Request,
+    ordered: bool = False,
+    concurrency: int | None = None,
+    cache: bool | None = None,
+    key: str | None = None,
+):
+    secret_key = environ.get("SECRET_KEY", None)
+    stream_concurrency = int(environ.get("STREAM_CONCURRENCY", "32"))
+
+    if secret_key and not key == secret_key:
+        raise RuntimeError("Invalid key")
+
+    # the input format is inferred from the content type, with
+    # NDJSON being used for anything that is not CSV
+    content_type = request.headers.get("content-type", "")
+    input_format = "csv" if "csv" in content_type else "ndjson"
+
+    # the validation results are streamed (as NDJSON) as they become
+    # available, with the request body being read only when there's
+    # room for more validations and no more validations being started
+    # while the client is not reading the response (backpressure)
+    async def generate():
+        async for data in validate_stream(
+            parse_lines(iter_lines(request.stream()), input_format=input_format),
+            concurrency=min(concurrency or stream_concurrency, stream_concurrency),
+            ordered=ordered,
+            cache=cache,
+        ):
+            yield dumps(data) + "\n"
+
+    return DuplexStreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@app.post("/v1/jobs")
+@app.post("/api/v1/jobs")
+async def job_create(
+    request: Request,
+    cache: bool | None = None,
+    key: str | None = None,
+):
+    secret_key = environ.get("SECRET_KEY", None)
+
+    if secret_key and not key == secret_key:
+        raise RuntimeError("Invalid key")
+
+    # the body may be either a JSON list of addresses (or an object
+    # containing them under the addresses key) or the complete CSV
+    # or NDJSON file, with the format inferred from the content type
+    content_type = request.headers.get("content-type", "")
+    if "json" in content_type and not "ndjson" in content_type:
+        addresses = extract_addresses(await _json(request))
+    else:
+        addresses = await read_addresses(
+            await request.body(),
+            input_format="csv" if "csv" in content_type else "ndjson",
+        )
+
+    if not addresses:
+        raise UserError("Missing email addresses")
+
+    if len(addresses) > JOBS_LIMIT:
+        raise UserError(f"Too many email addresses (limit is {JOBS_LIMIT})")
+
+    job = JOB_MANAGER.submit(addresses, cache=cache)
+
+    return JSONResponse(job.to_dict(), status_code=202)
+
+
+@app.get("/v1/jobs/{job_id}")
+@app.get("/api/v1/jobs/{job_id}")
+async def job_show(
+    job_id: str,
+    offset: int = 0,
+    limit: int = 1000,
+    key: str | None = None,
+):
+    secret_key = environ.get("SECRET_KEY", None)
+
+    if secret_key and not key == secret_key:
+        raise RuntimeError("Invalid key")
+
+    job = JOB_MANAGER.store.get(job_id)
+    if not job:
+        raise NotFoundError(f"Job not found: {job_id}")
+
+    # the (pre-serialized) results are paginated in completion order
+    # so that they can be retrieved while the job is still running
+    results = JOB_MANAGER.store.results(job_id, offset=offset, limit=min(limit, 10000))
+
+    return Response(
+        dumps(dict(job.to_dict(), offset=offset))[:-1].encode("utf-8")
+        + b',"results":['
+        + ",".join(results).encode("utf-8")
+        + b"]}",
+        media_type="application/json",
+    )
+
+
+@app.delete("/v1/jobs/{job_id}")
+@app.delete("/api/v1/jobs/{job_id}")
+async def job_cancel(job_id: str, key: str | None = None):
+    secret_key = environ.get("SECRET_KEY", None)
+
+    if secret_key and not key == secret_key:
+        raise RuntimeError("Invalid key")
+
+    job = JOB_MANAGER.cancel(job_id)
+    if not job:
+        raise NotFoundError(f"Job not found: {job_id}")
+
+    return JSONResponse(job.to_dict())
+
+
+async def _json(request: Request) -> Any:
+    try:
+        return await request.json()
+    except ValueError as exception:
+        raise UserError("Invalid JSON body") from exception
+
+
+@app.exception_handler(PosterumError)
 @app.exception_handler(Exception)
 async def unicorn_exception_handler(request: Request, exc: Exception):
     code = 500
     payload = None
+    headers = None
     if isinstance(exc, PosterumError):
         exc = cast(PosterumError, exc)
         code = exc.code
         payload = exc.payload
+        headers = exc.headers
     content: dict[str, Any] = dict(
         message=str(exc), name=exc.__class__.__name__, code=code
     )
     if payload:
         content["payload"] = payload
-    return JSONResponse(status_code=code, content=content)
+    return JSONResponse(status_code=code, content=content, headers=headers)
 
 
-if __name__ == "__main__":
+def serve():
+    """
+    Runs the server, in development (`RELOAD` set) as a single process
+    that is reloaded on code changes, otherwise with `WORKERS` processes
+    accepting connections on the same (pre-forked) listening socket.
+
+    The worker processes are supervised by the parent process, that
+    replaces the dead ones and that on SIGHUP gracefully restarts them
+    one at a time (each new worker is ready before an old one stops).
+    """
+
+    reload = environ.get("RELOAD", "0") in ("1", "true", "True")
+    workers = 1 if reload else int(environ.get("WORKERS", str(cpu_count() or 1)))
+
+    # the worker processes inherit the environment, so by default they
+    # share the caches (through memory mapped files) and the jobs (on
+    # disk) instead of each of them having its own (private) ones
+    if workers > 1:
+        environ.setdefault("CACHE_BACKEND", "shared")
+        environ.setdefault("JOBS_STORE", "disk")
+        environ.setdefault("JOBS_WORKERS", "1")
+
     uvicorn.run(
         "app:app",
         host=environ.get("HOST", "0.0.0.0"),
         port=int(environ.get("PORT", "8080")),
-        reload=True,
+        reload=reload,
+        workers=workers,
+        timeout_graceful_shutdown=int(environ.get("GRACEFUL_TIMEOUT", "30")),
     )
+
+
+if __name__ == "__main__":
+    serve()
@@ -1,3 +1,123 @@
-from .common import *
-from .controllers import *
-from .main import PosterumApp
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+from .common import __all__ as _common
+
+if TYPE_CHECKING:
+    from .common import (
+        SMTPVerifier,
+        ValidationResult,
+        ResultRecord,
+        CACHE_SNAPSHOTS,
+        PosterumError,
+        UserError,
+        NotFoundError,
+        OverloadedError,
+        AdmissionController,
+        Priority,
+        Cache,
+        MemoryCache,
+        RedisCache,
+        TieredCache,
+        SharedCache,
+        Snapshot,
+        CacheSnapshots,
+        build_cache,
+        METRICS,
+        Counter,
+        Gauge,
+        Histogram,
+        Registry,
+        Address,
+        AddressError,
+        AddressParser,
+        Verdict,
+        VerdictStore,
+        JOB_MANAGER,
+        JOBS_LIMIT,
+        Job,
+        JobStore,
+        MemoryJobStore,
+        DiskJobStore,
+        JobManager,
+        build_job_store,
+    )
+    from .controllers import (
+        AddressController,
+        BaseController,
+        JobController,
+        MetricsController,
+        RootController,
+    )
+    from .main import PosterumApp
+
+# the public names are resolved lazily (PEP 562) so that importing the
+# verifier does not import appier and the admin stack, only required
+# by the appier app (main) and its controllers
+_EXPORTS = dict(
+    PosterumApp=".main",
+    AddressController=".controllers",
+    BaseController=".controllers",
+    JobController=".controllers",
+    MetricsController=".controllers",
+    RootController=".controllers",
+    **{name: ".common" for name in _common},
+)
+
+__all__ = [
+    "PosterumApp",
+    "AddressController",
+    "BaseController",
+    "JobController",
+    "MetricsController",
+    "RootController",
+    "SMTPVerifier",
+    "ValidationResult",
+    "ResultRecord",
+    "CACHE_SNAPSHOTS",
+    "PosterumError",
+    "UserError",
+    "NotFoundError",
+    "OverloadedError",
+    "AdmissionController",
+    "Priority",
+    "Cache",
+    "MemoryCache",
+    "RedisCache",
+    "TieredCache",
+    "SharedCache",
+    "Snapshot",
+    "CacheSnapshots",
+    "build_cache",
+    "METRICS",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Registry",
+    "Address",
+    "AddressError",
+    "AddressParser",
+    "Verdict",
+    "VerdictStore",
+    "JOB_MANAGER",
+    "JOBS_LIMIT",
+    "Job",
+    "JobStore",
+    "MemoryJobStore",
+    "DiskJobStore",
+    "JobManager",
+    "build_job_store",
+]
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name, None)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,98 @@
+import sys
+import asyncio
+import argparse
+
+from json import dumps
+from typing import Sequence, TextIO, cast
+
+from posterum.common.stream import Format, aiter_sync, parse_lines, validate_stream
+
+
+async def validate_file(
+    source: TextIO,
+    target: TextIO,
+    input_format: Format = "ndjson",
+    concurrency: int = 32,
+    ordered: bool = False,
+    cache: bool | None = None,
+):
+    async for data in validate_stream(
+        parse_lines(aiter_sync(source), input_format=input_format),
+        concurrency=concurrency,
+        ordered=ordered,
+        cache=cache,
+    ):
+        target.write(dumps(data) + "\n")
+        target.flush()
+
+
+def main(args: Sequence[str] | None = None):
+    parser = argparse.ArgumentParser(
+        prog="posterum",
+        description="Validates the e-mail addresses of an NDJSON or CSV file, "
+        "streaming the NDJSON results",
+    )
+    parser.add_argument("input", help="path to the input file, '-' for stdin")
+    parser.add_argument(
+        "-o", "--output", default="-", help="path to the output file, '-' for stdout"
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=("ndjson", "csv"),
+        default=None,
+        help="format of the input file, guessed from the extension if not set",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=32,
+        help="maximum number of concurrent validations",
+    )
+    parser.add_argument(
+        "--ordered",
+        action="store_true",
+        help="outputs the results in the input order (instead of completion order)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="bypasses the result cache"
+    )
+    options = parser.parse_args(args)
+
+    input_format = cast(
+        Format,
+        options.format
+        or ("csv" if options.input.lower().endswith(".csv") else "ndjson"),
+    )
+
+    source = (
+        sys.stdin
+        if options.input == "-"
+        else open(options.input, "r", encoding="utf-8", newline="")
+    )
+    target = (
+        sys.stdout
+        if options.output == "-"
+        else open(options.output, "w", encoding="utf-8")
+    )
+    try:
+        asyncio.run(
+            validate_file(
+                source,
+                target,
+                input_format=input_format,
+                concurrency=options.concurrency,
+                ordered=options.ordered,
+                cache=False if options.no_cache else None,
+            )
+        )
+    finally:
+        if not source is sys.stdin:
+            source.close()
+        if not target is sys.stdout:
+            target.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,124 @@
-from .smtp import SMTPVerifier
-from .errors import PosterumError, UserError, NotFoundError
-from .cache import Cache, MemoryCache
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .smtp import SMTPVerifier, ValidationResult, ResultRecord, CACHE_SNAPSHOTS
+    from .errors import PosterumError, UserError, NotFoundError, OverloadedError
+    from .admission import AdmissionController, Priority
+    from .cache import (
+        Cache,
+        MemoryCache,
+        RedisCache,
+        TieredCache,
+        SharedCache,
+        Snapshot,
+        CacheSnapshots,
+        build_cache,
+    )
+    from .metrics import METRICS, Counter, Gauge, Histogram, Registry
+    from .syntax import Address, AddressError, AddressParser
+    from .verdicts import Verdict, VerdictStore
+    from .jobs import (
+        JOB_MANAGER,
+        JOBS_LIMIT,
+        Job,
+        JobStore,
+        MemoryJobStore,
+        DiskJobStore,
+        JobManager,
+        build_job_store,
+    )
+
+# the public names are resolved lazily (PEP 562), only importing the
+# module that defines them, so that (eg) the syntax parser can be used
+# without the SMTP stack and its caches being set up
+_EXPORTS = dict(
+    SMTPVerifier=".smtp",
+    ValidationResult=".smtp",
+    ResultRecord=".smtp",
+    CACHE_SNAPSHOTS=".smtp",
+    PosterumError=".errors",
+    UserError=".errors",
+    NotFoundError=".errors",
+    OverloadedError=".errors",
+    AdmissionController=".admission",
+    Priority=".admission",
+    Cache=".cache",
+    MemoryCache=".cache",
+    RedisCache=".cache",
+    TieredCache=".cache",
+    SharedCache=".cache",
+    Snapshot=".cache",
+    CacheSnapshots=".cache",
+    build_cache=".cache",
+    METRICS=".metrics",
+    Counter=".metrics",
+    Gauge=".metrics",
+    Histogram=".metrics",
+    Registry=".metrics",
+    Address=".syntax",
+    AddressError=".syntax",
+    AddressParser=".syntax",
+    Verdict=".verdicts",
+    VerdictStore=".verdicts",
+    JOB_MANAGER=".jobs",
+    JOBS_LIMIT=".jobs",
+    Job=".jobs",
+    JobStore=".jobs",
+    MemoryJobStore=".jobs",
+    DiskJobStore=".jobs",
+    JobManager=".jobs",
+    build_job_store=".jobs",
+)
+
+__all__ = [
+    "SMTPVerifier",
+    "ValidationResult",
+    "ResultRecord",
+    "CACHE_SNAPSHOTS",
+    "PosterumError",
+    "UserError",
+    "NotFoundError",
+    "OverloadedError",
+    "AdmissionController",
+    "Priority",
+    "Cache",
+    "MemoryCache",
+    "RedisCache",
+    "TieredCache",
+    "SharedCache",
+    "Snapshot",
+    "CacheSnapshots",
+    "build_cache",
+    "METRICS",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Registry",
+    "Address",
+    "AddressError",
+    "AddressParser",
+    "Verdict",
+    "VerdictStore",
+    "JOB_MANAGER",
+    "JOBS_LIMIT",
+    "Job",
+    "JobStore",
+    "MemoryJobStore",
+    "DiskJobStore",
+    "JobManager",
+    "build_job_store",
+]
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name, None)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,176 @@
+import asyncio
+
+from time import monotonic
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Literal
+
+from .errors import OverloadedError
+from .timeouts import Deadline
+
+Priority = Literal["interactive", "bulk"]
+
+PRIORITIES: tuple[Priority, ...] = ("interactive", "bulk")
+""" The priorities from the most to the least prioritary one """
+
+SHED_CODES: dict[Priority, int] = dict(interactive=503, bulk=429)
+""" The HTTP status code of the shed operations per priority, with the
+bulk clients being asked to slow down (429) and the interactive ones
+being told that the service is overloaded (503) """
+
+
+class AdmissionController:
+    """
+    Admission control of the validation work, bounding the number of
+    operations in flight (admitted) with the other ones waiting in per
+    priority FIFO queues, served from the most to the least prioritary.
+
+    Operations whose (estimated or effective) wait exceeds the maximum
+    wait are shed right away with an overloaded error, carrying the time
+    after which they may be retried, instead of piling up in the queues.
+
+    :param limit: The maximum number of operations in flight, admission
+    control is disabled if zero.
+    :param max_wait: The maximum time (in seconds) an operation may
+    wait in the queues before being shed.
+    :param alpha: The weight of each new sample (0.0 to 1.0) of the
+    rolling (EWMA) time an operation is held, used to estimate the wait.
+    """
+
+    def __init__(
+        self, limit: int = 256, max_wait: float = 5.0, alpha: float = 0.1
+    ) -> None:
+        self.limit = limit
+        self.max_wait = max_wait
+        self.alpha = alpha
+        self.active = 0
+        self.sheds: dict[Priority, int] = dict((name, 0) for name in PRIORITIES)
+        self._queues: dict[Priority, deque[asyncio.Future[None]]] = dict(
+            (name, deque()) for name in PRIORITIES
+        )
+        self._service: float | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        priority: Priority = "interactive",
+        deadline: Deadline | None = None,
+        shed: bool = True,
+    ) -> AsyncIterator[None]:
+        """
+        Waits for the admission of an operation with the provided priority,
+        shedding it (with an overloaded error) if it would wait longer than
+        the maximum wait or than the remaining time of its deadline.
+
+        :param priority: The priority of the operation.
+        :param deadline: The deadline of the operation, capping its wait.
+        :param shed: If the operation may be shed, otherwise it waits for
+        as long as required (or until its deadline).
+        """
+
+        if not self.limit:
+            yield
+            return
+
+        self._ensure_loop()
+        await self._acquire(priority, deadline, shed)
+        start = monotonic()
+        try:
+            yield
+        finally:
+            self._observe(monotonic() - start)
+            self._release()
+
+    def queued(self, priority: Priority | None = None) -> int:
+        if priority is None:
+            return sum(len(queue) for queue in self._queues.values())
+        return len(self._queues[priority])
+
+    def estimate(self, priority: Priority = "interactive") -> float:
+        """
+        Estimates the time (in seconds) an operation with the provided
+        priority would wait for its admission, from the number of the
+        operations queued ahead of it and the rolling time each one of
+        them is held.
+
+        :param priority: The priority of the operation.
+        :return: The estimated wait (in seconds).
+        """
+
+        ahead = 0
+        for name in PRIORITIES:
+            ahead += len(self._queues[name])
+            if name == priority:
+                break
+        if self.active < self.limit and not ahead:
+            return 0.0
+        return (ahead + 1) * (self._service or 0.0) / self.limit
+
+    async def _acquire(
+        self, priority: Priority, deadline: Deadline | None, shed: bool
+    ) -> None:
+        if self.active < self.limit and not self.queued():
+            self.active += 1
+            return
+
+        max_wait = self.max_wait if shed else None
+        if not deadline is None:
+            remaining = deadline.remaining
+            if not remaining is None:
+                max_wait = remaining if max_wait is None else min(max_wait, remaining)
+        if not max_wait is None:
+            wait = self.estimate(priority)
+            if wait > max_wait:
+                raise self._shed(priority, wait)
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        queue = self._queues[priority]
+        queue.append(future)
+        try:
+            await asyncio.wait_for(future, max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exception:
+            # the slot may have been handed over right before the wait
+            # was given up, in which case it must be passed on
+            if future.done() and not future.cancelled():
+                self._release()
+            elif future in queue:
+                queue.remove(future)
+            if isinstance(exception, asyncio.TimeoutError):
+                raise self._shed(priority, self.estimate(priority))
+            raise
+
+    def _release(self):
+        # hands the slot over to the first waiter of the most prioritary
+        # queue, keeping the number of operations in flight
+        for name in PRIORITIES:
+            queue = self._queues[name]
+            while queue:
+                future = queue.popleft()
+                if not future.done():
+                    future.set_result(None)
+                    return
+        self.active = max(self.active - 1, 0)
+
+    def _observe(self, elapsed: float):
+        if self._service is None:
+            self._service = elapsed
+        else:
+            self._service += self.alpha * (elapsed - self._service)
+
+    def _shed(self, priority: Priority, wait: float) -> OverloadedError:
+        self.sheds[priority] += 1
+        return OverloadedError(
+            message=f"Too many validations in progress ({priority}), retry later",
+            code=SHED_CODES[priority],
+            retry_after=max(wait, 1.0),
+        )
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        self.active = 0
+        for queue in self._queues.values():
+            queue.clear()
+        self._loop = loop
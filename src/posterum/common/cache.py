@@ -1,5 +1,28 @@
+import os
+import sqlite3
+import asyncio
+import tempfile
+
 from time import time
-from typing import Any, NamedTuple
+from struct import Struct
+from hashlib import blake2b
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from uuid import uuid4
+from json import JSONEncoder, dumps, loads
+from heapq import heapify, heappop, heappush
+from itertools import count
+from threading import Event, Lock, RLock, Thread, local
+from collections import OrderedDict, deque
+from typing import (
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Literal,
+    NamedTuple,
+    Sequence,
+    cast,
+)
 
 Key = Any
 Value = Any
@@ -27,6 +50,19 @@ class Cache:
     def timestamp(self, key: Key) -> float:
         raise NotImplementedError()
 
+    def get_items(self, keys: Sequence[Key]) -> list[CacheItem | None]:
+        items: list[CacheItem | None] = []
+        for key in keys:
+            try:
+                items.append(self.get_item(key))
+            except KeyError:
+                items.append(None)
+        return items
+
+    def set_items(self, items: Iterable[tuple[Key, Value]], ttl: float | None = None):
+        for key, value in items:
+            self.set(key, value, ttl=ttl)
+
     def __getitem__(self, key: Key):
         return self.get(key)
 
@@ -40,38 +76,147 @@ class Cache:
         return self.contains(key)
 
 
+class FrequencySketch:
+    """
+    Count-min sketch of the access frequency of keys, with periodic
+    aging (halving of the counters), used for TinyLFU like admission.
+    """
+
+    def __init__(self, width: int = 4096, depth: int = 4) -> None:
+        self.width = width
+        self.depth = depth
+        self.sample_size = width * 10
+        self._tables = [bytearray(width) for _ in range(depth)]
+        self._increments = 0
+
+    def increment(self, key: Key):
+        for seed, table in enumerate(self._tables):
+            index = hash((seed, key)) % self.width
+            if table[index] < 255:
+                table[index] += 1
+        self._increments += 1
+        if self._increments >= self.sample_size:
+            self._age()
+
+    def estimate(self, key: Key) -> int:
+        return min(
+            table[hash((seed, key)) % self.width]
+            for seed, table in enumerate(self._tables)
+        )
+
+    def _age(self):
+        for table in self._tables:
+            for index, value in enumerate(table):
+                table[index] = value >> 1
+        self._increments //= 2
+
+
 class MemoryCache(Cache):
-    def __init__(self) -> None:
+    """
+    In-memory cache with optional size bound, evicting the least
+    recently used entries (LRU) once the maximum size is reached.
+
+    Expired entries are removed in the background (when running in
+    an event loop) using an expiry heap, so that the sweep cost only
+    depends on the number of entries that effectively expired.
+
+    :param max_size: The maximum number of entries, unbounded if None.
+    :param admission: If a TinyLFU like admission policy should be
+    used, so that new entries only evict the LRU entry when they are
+    more frequently accessed than it.
+    :param sweep_interval: The interval (in seconds) between runs of
+    the background expiry sweep, disabled if None.
+    :param lock: The (re-entrant) lock held by the owner of the cache
+    while accessing it from several threads, held as well by the sweep
+    so that it's serialized with those accesses.
+    """
+
+    def __init__(
+        self,
+        max_size: int | None = None,
+        admission: bool = False,
+        sweep_interval: float | None = 60.0,
+        lock: AbstractContextManager[Any] | None = None,
+    ) -> None:
         super().__init__()
-        self._cache: dict[str, CacheItem] = {}
+        self.max_size = max_size
+        self.sweep_interval = sweep_interval
+        self.lock = lock
+        self.evictions = 0
+        self._cache: OrderedDict[Key, CacheItem] = OrderedDict()
+        self._expiry: list[tuple[float, int, Key]] = []
+        self._counter = count()
+        self._sketch = FrequencySketch() if admission else None
+        self._sweeper: asyncio.Task[None] | None = None
+        self._snapshot: Snapshot | None = None
+        self._restored: deque[list[tuple[Key, CacheItem]]] = deque()
+        self._restorer: Thread | None = None
+        self._cancelled = Event()
+        self._merging = False
 
     def get(self, key: Key, default: Any | None = None) -> Any:
-        value, _, timeout = self._cache.get(key, (default, None, None))
-        if not timeout is None and time() > timeout:
+        if self._sketch:
+            self._sketch.increment(key)
+        if self._snapshot:
+            self._restore(key)
+        item = self._cache.get(key, None)
+        if item is None:
+            return default
+        if not item.timeout is None and time() > item.timeout:
             self.delete(key)
             return default
-        return value
+        self._cache.move_to_end(key)
+        return item.value
 
     def get_item(self, key: Key) -> CacheItem:
+        if self._sketch:
+            self._sketch.increment(key)
+        if self._snapshot:
+            self._restore(key)
         item = self._cache[key]
-        _, _, timeout = item
-        if not timeout is None and time() > timeout:
+        if not item.timeout is None and time() > item.timeout:
             self.delete(key)
             raise KeyError(key)
+        self._cache.move_to_end(key)
         return item
 
     def set(self, key: Key, value: Value, ttl: float | None = None):
         timestamp = time()
-        self._cache[key] = (
-            CacheItem(value, timestamp, timestamp + ttl)
-            if ttl
-            else CacheItem(value, timestamp, None)
+        self.set_item(
+            key,
+            (
+                CacheItem(value, timestamp, timestamp + ttl)
+                if ttl
+                else CacheItem(value, timestamp, None)
+            ),
         )
 
+    def set_item(self, key: Key, item: CacheItem):
+        """
+        Stores the provided cache item as is, keeping its timestamp
+        and timeout, useful to copy items from other caches.
+
+        :param key: The key to store the item under.
+        :param item: The cache item to be stored.
+        """
+
+        if key in self._cache:
+            self._cache.move_to_end(key)
+        elif not self.max_size is None and len(self._cache) >= self.max_size:
+            self.sweep()
+            if len(self._cache) >= self.max_size and not self._evict(key):
+                return
+        self._cache[key] = item
+        if not item.timeout is None:
+            heappush(self._expiry, (item.timeout, next(self._counter), key))
+        self._ensure_sweeper()
+
     def delete(self, key: Key):
         del self._cache[key]
 
     def contains(self, key: Key) -> bool:
+        if self._snapshot:
+            self._restore(key)
         if not key in self._cache:
             return False
         _, _, timeout = self._cache[key]
@@ -80,3 +225,1013 @@ class MemoryCache(Cache):
     def timestamp(self, key: Key) -> float:
         _, timestamp, _ = self._cache[key]
         return timestamp
+
+    def sweep(self) -> int:
+        """
+        Removes every expired entry from the cache, in time proportional
+        to the number of entries that expired.
+
+        :return: The number of entries that were removed.
+        """
+
+        with self.lock or nullcontext():
+            if self._snapshot:
+                self._restore()
+
+            now = time()
+            removed = 0
+            while self._expiry and self._expiry[0][0] < now:
+                timeout, _, key = heappop(self._expiry)
+                item = self._cache.get(key, None)
+                if item is None or not item.timeout == timeout:
+                    continue
+                del self._cache[key]
+                removed += 1
+
+            # re-builds the expiry heap when it's mostly made of stale
+            # entries (from keys that were overwritten or deleted)
+            if len(self._expiry) > len(self._cache) * 2 + 64:
+                self._expiry = [
+                    (item.timeout, next(self._counter), key)
+                    for key, item in self._cache.items()
+                    if not item.timeout is None
+                ]
+                heapify(self._expiry)
+
+            return removed
+
+    def clear(self):
+        self._cache.clear()
+        self._expiry.clear()
+
+    def items(self) -> list[tuple[Key, CacheItem]]:
+        """
+        Obtains a copy of the (non expired) entries of the cache, safe
+        to be called from a thread other than the one using the cache.
+
+        :return: The list of key and cache item tuples.
+        """
+
+        while True:
+            try:
+                items = list(self._cache.items())
+                break
+            except RuntimeError:
+                # the cache was changed (by another thread) while being
+                # copied, which is rare enough for a simple retry
+                continue
+        now = time()
+        return [
+            (key, item)
+            for key, item in items
+            if item.timeout is None or item.timeout > now
+        ]
+
+    def restore(self, snapshot: "Snapshot", batch_size: int = 10000):
+        """
+        Restores the entries of the provided snapshot lazily, without
+        blocking the caller: the snapshot is read in batches by a
+        background thread and merged into the cache (in small slices)
+        as the cache is used, while keys that are not yet restored are
+        looked up in the snapshot directly.
+
+        Entries that already exist in the cache are kept as they're
+        more recent than the ones in the snapshot, for the same reason
+        the merge stops once the cache is full (the remaining entries
+        are only restored when looked up).
+
+        :param snapshot: The snapshot to restore the entries from.
+        :param batch_size: The number of entries read per batch.
+        """
+
+        cancelled = Event()
+
+        def load():
+            for batch in snapshot.iter_items(batch_size=batch_size):
+                if cancelled.is_set():
+                    break
+                self._restored.append(batch)
+
+        self.close()
+        self._snapshot = snapshot
+        self._cancelled = cancelled
+        self._restorer = Thread(target=load, name="posterum-restore", daemon=True)
+        self._restorer.start()
+
+    def close(self):
+        """
+        Stops the restore of the snapshot (if any), waiting for the
+        background thread that reads it, the entries that were not
+        yet restored are given up.
+        """
+
+        restorer = self._restorer
+        if restorer is None:
+            return
+        self._cancelled.set()
+        restorer.join()
+        self._snapshot, self._restorer = None, None
+        self._restored.clear()
+
+    @property
+    def restoring(self) -> bool:
+        return not self._snapshot is None
+
+    def stop(self):
+        if self._sweeper:
+            self._sweeper.cancel()
+        self._sweeper = None
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def _restore(self, key: Key | None = None, slice_size: int = 256):
+        # the storing of the restored entries may sweep the cache, which
+        # restores as well, so the (nested) restore is skipped
+        snapshot = self._snapshot
+        if snapshot is None or self._merging:
+            return
+        self._merging = True
+        try:
+            self._merge(slice_size)
+            if key is None or key in self._cache:
+                return
+            stored = snapshot.get_item(key)
+            if stored is None or (
+                not stored.timeout is None and stored.timeout < time()
+            ):
+                return
+            self.set_item(key, stored)
+        finally:
+            self._merging = False
+
+    def _merge(self, slice_size: int):
+        # merges a slice of the already loaded entries, so that the
+        # cost of the restore is spread among the cache operations
+        restored = 0
+        while self._restored and restored < slice_size:
+            batch = self._restored[0]
+            while batch and restored < slice_size:
+                # a full cache only holds entries more recent than the
+                # ones of the snapshot, so the (bulk) merge is over
+                if not self.max_size is None and len(self._cache) >= self.max_size:
+                    self._cancelled.set()
+                    self._restored.clear()
+                    break
+                _key, item = batch.pop()
+                if not _key in self._cache:
+                    self.set_item(_key, item)
+                restored += 1
+            if self._restored and not batch:
+                self._restored.popleft()
+
+        if not self._restored and self._restorer and not self._restorer.is_alive():
+            self._snapshot, self._restorer = None, None
+
+    def _evict(self, candidate: Key) -> bool:
+        victim = next(iter(self._cache))
+        sketch = self._sketch
+        if sketch and sketch.estimate(candidate) < sketch.estimate(victim):
+            return False
+        del self._cache[victim]
+        self.evictions += 1
+        return True
+
+    def _ensure_sweeper(self):
+        if not self.sweep_interval:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if (
+            self._sweeper
+            and not self._sweeper.done()
+            and self._sweeper.get_loop() is loop
+        ):
+            return
+        self._sweeper = loop.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        # the sweep holds the lock of the owner (if any), as the cache
+        # may be changed meanwhile by another thread (eg: invalidations)
+        while True:
+            await asyncio.sleep(self.sweep_interval or 0.0)
+            self.sweep()
+
+
+class RedisCache(Cache):
+    """
+    Cache backed by a (shared) Redis server, using the native Redis
+    TTLs for expiration and MGET and pipelines for bulk operations.
+
+    Items are stored as compact JSON arrays with the timestamp, the
+    timeout and the value converted by the provided encoder.
+
+    :param namespace: The prefix for every key of this cache.
+    :param url: The URL of the Redis server, used when no client is given.
+    :param client: The (already created) Redis client to be used.
+    :param encoder: The function that converts values into JSON values.
+    :param decoder: The function that converts JSON values into values.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "posterum",
+        url: str = "redis://localhost:6379",
+        client: Any | None = None,
+        encoder: Callable[[Value], Any] | None = None,
+        decoder: Callable[[Any], Value] | None = None,
+    ) -> None:
+        super().__init__()
+        if client is None:
+            import redis
+
+            client = redis.Redis.from_url(url)
+        self.namespace = namespace
+        self.client = client
+        self.encoder = encoder or (lambda value: value)
+        self.decoder = decoder or (lambda value: value)
+
+    def key(self, key: Key) -> str:
+        return self.namespace + ":" + dumps(key, separators=(",", ":"))
+
+    def get(self, key: Key, default: Any | None = None) -> Any:
+        try:
+            return self.get_item(key).value
+        except KeyError:
+            return default
+
+    def get_item(self, key: Key) -> CacheItem:
+        item = self._load(cast(bytes | None, self.client.get(self.key(key))))
+        if item is None:
+            raise KeyError(key)
+        return item
+
+    def get_items(self, keys: Sequence[Key]) -> list[CacheItem | None]:
+        if not keys:
+            return []
+        return [
+            self._load(cast(bytes | None, data))
+            for data in self.client.mget([self.key(key) for key in keys])
+        ]
+
+    def set(self, key: Key, value: Value, ttl: float | None = None):
+        timestamp = time()
+        self.set_item(
+            key,
+            (
+                CacheItem(value, timestamp, timestamp + ttl)
+                if ttl
+                else CacheItem(value, timestamp, None)
+            ),
+        )
+
+    def set_item(self, key: Key, item: CacheItem):
+        self._store(self.client, key, item)
+
+    def set_items(self, items: Iterable[tuple[Key, Value]], ttl: float | None = None):
+        timestamp = time()
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in items:
+            self._store(
+                pipeline,
+                key,
+                (
+                    CacheItem(value, timestamp, timestamp + ttl)
+                    if ttl
+                    else CacheItem(value, timestamp, None)
+                ),
+            )
+        pipeline.execute()
+
+    def delete(self, key: Key):
+        if not self.client.delete(self.key(key)):
+            raise KeyError(key)
+
+    def contains(self, key: Key) -> bool:
+        return self.client.exists(self.key(key)) > 0
+
+    def timestamp(self, key: Key) -> float:
+        return self.get_item(key).timestamp
+
+    def _store(self, client: Any, key: Key, item: CacheItem):
+        value, timestamp, timeout = item
+        if not timeout is None and timeout <= time():
+            client.delete(self.key(key))
+            return
+        client.set(
+            self.key(key),
+            dumps([timestamp, timeout, self.encoder(value)], separators=(",", ":")),
+            px=int((timeout - time()) * 1000) if timeout else None,
+        )
+
+    def _load(self, data: bytes | None) -> CacheItem | None:
+        if data is None:
+            return None
+        timestamp, timeout, value = loads(data)
+        return CacheItem(self.decoder(value), timestamp, timeout)
+
+
+class TieredCache(Cache):
+    """
+    Two tier cache made of an in-process (L1) memory cache in front
+    of a shared (L2) Redis cache, changes to an entry are published
+    in a Redis channel so that the L1 copies held by other processes
+    are invalidated.
+
+    The invalidations are applied by the thread of the Redis listener,
+    so every access to the L1 cache (including its background expiry
+    sweep) is serialized by the cache lock, shared with the L1 cache.
+
+    :param remote: The shared Redis cache (L2).
+    :param local_cache: The in-process memory cache (L1).
+    :param channel: The Redis pub/sub channel used for invalidation.
+    """
+
+    def __init__(
+        self,
+        remote: RedisCache,
+        local_cache: MemoryCache | None = None,
+        channel: str = "posterum:invalidate",
+    ) -> None:
+        super().__init__()
+        self.remote = remote
+        self.local = local_cache or MemoryCache()
+        self.channel = channel
+        self.id = uuid4().hex
+        self._listener: Any | None = None
+        self._lock = RLock()
+        self.local.lock = self._lock
+
+    def get(self, key: Key, default: Any | None = None) -> Any:
+        try:
+            return self.get_item(key).value
+        except KeyError:
+            return default
+
+    def get_item(self, key: Key) -> CacheItem:
+        self._ensure_listener()
+        local_key = self.remote.key(key)
+        try:
+            with self._lock:
+                return self.local.get_item(local_key)
+        except KeyError:
+            item = self.remote.get_item(key)
+            with self._lock:
+                self.local.set_item(local_key, item)
+            return item
+
+    def get_items(self, keys: Sequence[Key]) -> list[CacheItem | None]:
+        self._ensure_listener()
+        local_keys = [self.remote.key(key) for key in keys]
+        with self._lock:
+            items = self.local.get_items(local_keys)
+        missing = [index for index, item in enumerate(items) if item is None]
+        if not missing:
+            return items
+        remote_items = self.remote.get_items([keys[index] for index in missing])
+        with self._lock:
+            for index, item in zip(missing, remote_items):
+                if item is None:
+                    continue
+                self.local.set_item(local_keys[index], item)
+                items[index] = item
+        return items
+
+    def set(self, key: Key, value: Value, ttl: float | None = None):
+        timestamp = time()
+        self.set_item(
+            key,
+            (
+                CacheItem(value, timestamp, timestamp + ttl)
+                if ttl
+                else CacheItem(value, timestamp, None)
+            ),
+        )
+
+    def set_item(self, key: Key, item: CacheItem):
+        self._ensure_listener()
+        with self._lock:
+            self.local.set_item(self.remote.key(key), item)
+        self.remote.set_item(key, item)
+        self._invalidate(key)
+
+    def set_items(self, items: Iterable[tuple[Key, Value]], ttl: float | None = None):
+        self._ensure_listener()
+        items = list(items)
+        timestamp = time()
+        with self._lock:
+            for key, value in items:
+                self.local.set_item(
+                    self.remote.key(key),
+                    (
+                        CacheItem(value, timestamp, timestamp + ttl)
+                        if ttl
+                        else CacheItem(value, timestamp, None)
+                    ),
+                )
+        self.remote.set_items(items, ttl=ttl)
+        pipeline = self.remote.client.pipeline(transaction=False)
+        for key, _ in items:
+            pipeline.publish(self.channel, f"{self.id} {self.remote.key(key)}")
+        pipeline.execute()
+
+    def delete(self, key: Key):
+        self._ensure_listener()
+        try:
+            with self._lock:
+                self.local.delete(self.remote.key(key))
+        except KeyError:
+            pass
+        try:
+            self.remote.delete(key)
+        finally:
+            self._invalidate(key)
+
+    def contains(self, key: Key) -> bool:
+        with self._lock:
+            if self.local.contains(self.remote.key(key)):
+                return True
+        return self.remote.contains(key)
+
+    def timestamp(self, key: Key) -> float:
+        return self.get_item(key).timestamp
+
+    def stop(self):
+        if self._listener:
+            self._listener.stop()
+        self._listener = None
+        self.local.stop()
+
+    def _invalidate(self, key: Key):
+        self.remote.client.publish(self.channel, f"{self.id} {self.remote.key(key)}")
+
+    def _on_invalidate(self, message: dict[str, Any]):
+        data = message["data"]
+        origin, local_key = (
+            data.decode("utf-8") if isinstance(data, bytes) else data
+        ).split(" ", 1)
+        if origin == self.id:
+            return
+        try:
+            with self._lock:
+                self.local.delete(local_key)
+        except KeyError:
+            pass
+
+    def _ensure_listener(self):
+        if self._listener:
+            return
+        with self._lock:
+            if self._listener:
+                return
+            pubsub = self.remote.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._on_invalidate})
+            self._listener = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+
+class SharedCache(Cache):
+    """
+    Cache shared among the processes of a host through a fixed size
+    hash table in a memory mapped file, so that the worker processes
+    of the server see the entries set by each other, without the need
+    for an external server (as in Redis).
+
+    The table is set associative, a key may live in any of the `ways`
+    slots that follow its hash, with the entry with the oldest timestamp
+    being evicted once they're all taken. Writes are serialized with a
+    file lock while reads are lock free, relying on a per slot sequence
+    number (seqlock) to detect (and retry) reads of torn entries.
+
+    Entries whose (JSON encoded) key and value do not fit in a slot are
+    not stored, being counted as `oversized`.
+
+    :param namespace: The name of the cache, used as the file name.
+    :param path: The directory of the memory mapped file.
+    :param slots: The number of slots (maximum number of entries).
+    :param slot_size: The size (in bytes) of each of the slots.
+    :param ways: The number of slots in which a key may be stored.
+    :param encoder: The function that converts values into JSON values.
+    :param decoder: The function that converts JSON values into values.
+    """
+
+    MAGIC = b"PSTC"
+
+    VERSION = 1
+
+    HEADER = Struct("<4sIII")
+
+    HEADER_SIZE = 64
+
+    SLOT = Struct("<IQddHI")
+
+    SEQUENCE = Struct("<I")
+
+    def __init__(
+        self,
+        namespace: str = "posterum",
+        path: str | None = None,
+        slots: int = 65536,
+        slot_size: int = 512,
+        ways: int = 8,
+        encoder: Callable[[Value], Any] | None = None,
+        decoder: Callable[[Any], Value] | None = None,
+    ) -> None:
+        super().__init__()
+        import mmap
+        import fcntl
+
+        self.namespace = namespace
+        self.path = path or os.path.join(tempfile.gettempdir(), "posterum")
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ways = min(ways, slots)
+        self.encoder = encoder or (lambda value: value)
+        self.decoder = decoder or (lambda value: value)
+        self.evictions = 0
+        self.oversized = 0
+        self._fcntl = fcntl
+        self._lock = Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+        self.file_path = os.path.join(self.path, f"{namespace}.cache")
+        size = self.HEADER_SIZE + slots * slot_size
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, slots, slot_size)
+        self._fd = os.open(self.file_path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        # the first process to open the file sizes it (with zeros, that
+        # stand for empty slots), a file with a different layout (from
+        # a different configuration) is re-created
+        with self._locked():
+            if (
+                not os.fstat(self._fd).st_size == size
+                or not os.pread(self._fd, self.HEADER.size, 0) == header
+            ):
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, header, 0)
+        self._map = mmap.mmap(self._fd, size)
+
+    def get(self, key: Key, default: Any | None = None) -> Any:
+        try:
+            return self.get_item(key).value
+        except KeyError:
+            return default
+
+    def get_item(self, key: Key) -> CacheItem:
+        key_bytes = self._key(key)
+        key_hash = self._hash(key_bytes)
+        for offset in self._offsets(key_hash):
+            entry = self._read(offset, key_hash, key_bytes)
+            if entry is None:
+                continue
+            timestamp, timeout, value = entry
+            if timeout and timeout <= time():
+                break
+            return CacheItem(self.decoder(loads(value)), timestamp, timeout or None)
+        raise KeyError(key)
+
+    def set(self, key: Key, value: Value, ttl: float | None = None):
+        timestamp = time()
+        self.set_item(
+            key,
+            (
+                CacheItem(value, timestamp, timestamp + ttl)
+                if ttl
+                else CacheItem(value, timestamp, None)
+            ),
+        )
+
+    def set_item(self, key: Key, item: CacheItem):
+        value, timestamp, timeout = item
+        if not timeout is None and timeout <= time():
+            try:
+                self.delete(key)
+            except KeyError:
+                pass
+            return
+
+        key_bytes = self._key(key)
+        value_bytes = dumps(self.encoder(value), separators=(",", ":")).encode("utf-8")
+        if self.SLOT.size + len(key_bytes) + len(value_bytes) > self.slot_size:
+            self.oversized += 1
+            return
+
+        key_hash = self._hash(key_bytes)
+        with self._locked():
+            offset = self._slot(key_hash, key_bytes)
+            self._write(
+                offset,
+                key_hash,
+                timestamp,
+                timeout or 0.0,
+                key_bytes,
+                value_bytes,
+            )
+
+    def delete(self, key: Key):
+        key_bytes = self._key(key)
+        key_hash = self._hash(key_bytes)
+        with self._locked():
+            for offset in self._offsets(key_hash):
+                if self._matches(offset, key_hash, key_bytes):
+                    self._write(offset, 0, 0.0, 0.0, b"", b"")
+                    return
+        raise KeyError(key)
+
+    def contains(self, key: Key) -> bool:
+        try:
+            self.get_item(key)
+        except KeyError:
+            return False
+        return True
+
+    def timestamp(self, key: Key) -> float:
+        return self.get_item(key).timestamp
+
+    def clear(self):
+        with self._locked():
+            for index in range(self.slots):
+                offset = self.HEADER_SIZE + index * self.slot_size
+                if self.SLOT.unpack_from(self._map, offset)[1]:
+                    self._write(offset, 0, 0.0, 0.0, b"", b"")
+
+    def stop(self):
+        self._map.close()
+        os.close(self._fd)
+
+    def __len__(self) -> int:
+        now = time()
+        entries = 0
+        for index in range(self.slots):
+            _, key_hash, _, timeout, _, _ = self.SLOT.unpack_from(
+                self._map, self.HEADER_SIZE + index * self.slot_size
+            )
+            if key_hash and (not timeout or timeout > now):
+                entries += 1
+        return entries
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        # the file lock is held by the process (not by the thread) so
+        # the threads of the same process are serialized with a mutex
+        with self._lock:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN)
+
+    def _key(self, key: Key) -> bytes:
+        return dumps(key, separators=(",", ":")).encode("utf-8")
+
+    def _hash(self, key_bytes: bytes) -> int:
+        # the zero hash is reserved for the empty slots
+        return int.from_bytes(blake2b(key_bytes, digest_size=8).digest(), "little") | 1
+
+    def _offsets(self, key_hash: int) -> Iterator[int]:
+        for way in range(self.ways):
+            yield self.HEADER_SIZE + (key_hash + way) % self.slots * self.slot_size
+
+    def _slot(self, key_hash: int, key_bytes: bytes) -> int:
+        # picks the slot holding the key or else the first free (or
+        # expired) one, evicting the oldest entry as the last resort
+        now = time()
+        free: int | None = None
+        oldest: tuple[float, int] | None = None
+        for offset in self._offsets(key_hash):
+            _, _hash, timestamp, timeout, key_length, _ = self.SLOT.unpack_from(
+                self._map, offset
+            )
+            start = offset + self.SLOT.size
+            if _hash == key_hash and self._map[start : start + key_length] == key_bytes:
+                return offset
+            if free is None and (not _hash or (timeout and timeout <= now)):
+                free = offset
+            if oldest is None or timestamp < oldest[0]:
+                oldest = (timestamp, offset)
+        if not free is None:
+            return free
+        self.evictions += 1
+        return cast(tuple[float, int], oldest)[1]
+
+    def _matches(self, offset: int, key_hash: int, key_bytes: bytes) -> bool:
+        _, _hash, _, _, key_length, _ = self.SLOT.unpack_from(self._map, offset)
+        start = offset + self.SLOT.size
+        return _hash == key_hash and self._map[start : start + key_length] == key_bytes
+
+    def _read(
+        self, offset: int, key_hash: int, key_bytes: bytes, retries: int = 8
+    ) -> tuple[float, float, bytes] | None:
+        for _ in range(retries):
+            (sequence,) = self.SEQUENCE.unpack_from(self._map, offset)
+            if sequence & 1:
+                continue
+            _, _hash, timestamp, timeout, key_length, value_length = (
+                self.SLOT.unpack_from(self._map, offset)
+            )
+            if not _hash == key_hash:
+                return None
+            start = offset + self.SLOT.size
+            data = self._map[start : start + key_length + value_length]
+            if not self.SEQUENCE.unpack_from(self._map, offset)[0] == sequence:
+                continue
+            if not data[:key_length] == key_bytes:
+                return None
+            return timestamp, timeout, data[key_length:]
+        return None
+
+    def _write(
+        self,
+        offset: int,
+        key_hash: int,
+        timestamp: float,
+        timeout: float,
+        key_bytes: bytes,
+        value_bytes: bytes,
+    ):
+        # the sequence is odd while the slot is being written so that
+        # the (lock free) readers can detect the partial writes
+        (sequence,) = self.SEQUENCE.unpack_from(self._map, offset)
+        sequence = (sequence + 1) & 0xFFFFFFFF
+        self.SEQUENCE.pack_into(self._map, offset, sequence)
+        start = offset + self.SLOT.size
+        self._map[start : start + len(key_bytes) + len(value_bytes)] = (
+            key_bytes + value_bytes
+        )
+        self.SLOT.pack_into(
+            self._map,
+            offset,
+            sequence,
+            key_hash,
+            timestamp,
+            timeout,
+            len(key_bytes),
+            len(value_bytes),
+        )
+        self.SEQUENCE.pack_into(self._map, offset, (sequence + 1) & 0xFFFFFFFF)
+
+
+class Snapshot:
+    """
+    On-disk (SQLite) snapshot of the entries of a cache, each entry
+    keeping its original timestamp and timeout so that the TTL of the
+    restored entries still holds.
+
+    Several caches may share the same database file, as each one has
+    its own namespace, and each snapshot of a namespace atomically
+    replaces the previous one.
+
+    :param path: The path to the SQLite database file.
+    :param namespace: The namespace of the cache in the database.
+    :param encoder: The function that converts values into JSON values.
+    :param decoder: The function that converts JSON values into values.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str,
+        encoder: Callable[[Value], Any] | None = None,
+        decoder: Callable[[Any], Value] | None = None,
+    ) -> None:
+        self.path = path
+        self.namespace = namespace
+        self.encoder = encoder or (lambda value: value)
+        self.decoder = decoder or (lambda value: value)
+        self._dumps = JSONEncoder(separators=(",", ":")).encode
+        self._local = local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # each thread has its own connection, as connections can't
+        # be shared among threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (namespace TEXT, key TEXT, "
+                "timestamp REAL, timeout REAL, value TEXT, "
+                "PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+            )
+            self._local.connection = connection
+        return connection
+
+    def save(self, items: Iterable[tuple[Key, CacheItem]], replace: bool = True) -> int:
+        """
+        Saves the provided entries, replacing the previous snapshot.
+
+        :param items: The key and cache item tuples to be saved.
+        :param replace: If the entries of the previous snapshot should
+        be removed, otherwise the entries are merged into it.
+        :return: The number of saved entries.
+        """
+
+        connection = self.connection
+        with connection:
+            if replace:
+                connection.execute(
+                    "DELETE FROM entries WHERE namespace = ?", (self.namespace,)
+                )
+            cursor = connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        self.namespace,
+                        self._key(key),
+                        timestamp,
+                        timeout,
+                        self._dumps(self.encoder(value)),
+                    )
+                    for key, (value, timestamp, timeout) in items
+                ),
+            )
+        return cursor.rowcount
+
+    def get_item(self, key: Key) -> CacheItem | None:
+        row = self.connection.execute(
+            "SELECT timestamp, timeout, value FROM entries "
+            "WHERE namespace = ? AND key = ?",
+            (self.namespace, self._key(key)),
+        ).fetchone()
+        if row is None:
+            return None
+        timestamp, timeout, value = row
+        return CacheItem(self.decoder(loads(value)), timestamp, timeout)
+
+    def iter_items(
+        self, batch_size: int = 10000
+    ) -> Iterator[list[tuple[Key, CacheItem]]]:
+        """
+        Iterates over the (non expired) entries of the snapshot in
+        batches, so that only a batch is held in memory at a time.
+
+        :param batch_size: The maximum number of entries per batch.
+        :return: The iterator of batches of key and cache item tuples.
+        """
+
+        cursor = self.connection.execute(
+            "SELECT key, timestamp, timeout, value FROM entries "
+            "WHERE namespace = ? AND (timeout IS NULL OR timeout > ?)",
+            (self.namespace, time()),
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [
+                (
+                    _tuple(loads(key)),
+                    CacheItem(self.decoder(loads(value)), timestamp, timeout),
+                )
+                for key, timestamp, timeout, value in rows
+            ]
+
+    def _key(self, key: Key) -> str:
+        return self._dumps(key)
+
+
+class CacheSnapshots:
+    """
+    Periodic (and on shutdown) snapshotting of a set of in-memory
+    caches into a single SQLite database, done in a background thread
+    so that the event loop is never blocked by the disk writes.
+
+    :param path: The path to the SQLite database file, snapshotting
+    is disabled when not set.
+    :param interval: The interval (in seconds) between snapshots.
+    """
+
+    def __init__(self, path: str | None = None, interval: float = 300.0) -> None:
+        self.path = path
+        self.interval = interval
+        self.snapshots: list[tuple[MemoryCache, Snapshot]] = []
+        self._thread: Thread | None = None
+        self._stopped = Event()
+
+    def add(
+        self,
+        namespace: str,
+        cache: Cache,
+        encoder: Callable[[Value], Any] | None = None,
+        decoder: Callable[[Any], Value] | None = None,
+    ):
+        # only the in-memory caches are snapshotted, the shared ones
+        # are persisted (and survive restarts) by Redis itself or by
+        # their memory mapped file
+        if not self.path or not isinstance(cache, MemoryCache):
+            return
+        self.snapshots.append(
+            (cache, Snapshot(self.path, namespace, encoder=encoder, decoder=decoder))
+        )
+
+    def restore(self):
+        for cache, snapshot in self.snapshots:
+            cache.restore(snapshot)
+
+    def save(self) -> int:
+        # caches that are still being restored are merged into their
+        # snapshot, as replacing it would lose the non restored entries
+        return sum(
+            snapshot.save(cache.items(), replace=not cache.restoring)
+            for cache, snapshot in self.snapshots
+        )
+
+    def start(self):
+        """
+        Starts the lazy restore of the caches and the background
+        thread that periodically snapshots them.
+        """
+
+        if not self.snapshots or self._thread:
+            return
+        self.restore()
+        self._stopped.clear()
+        self._thread = Thread(target=self._run, name="posterum-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the periodic snapshots, saving a final snapshot (in the
+        background thread) and waiting for it to be written.
+        """
+
+        if not self._thread:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        for cache, _ in self.snapshots:
+            cache.close()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.save()
+        self.save()
+
+
+def build_cache(
+    namespace: str,
+    backend: Literal["memory", "redis", "tiered", "shared"] = "memory",
+    url: str = "redis://localhost:6379",
+    max_size: int | None = None,
+    admission: bool = False,
+    encoder: Callable[[Value], Any] | None = None,
+    decoder: Callable[[Any], Value] | None = None,
+    path: str | None = None,
+    slots: int = 65536,
+    slot_size: int = 512,
+) -> Cache:
+    """
+    Builds a cache for the provided backend, the memory backend keeps
+    the values in-process, the shared backend shares them among the
+    processes of the host (through a memory mapped file) while the
+    redis and tiered backends share them (through Redis) among every
+    process.
+
+    :param namespace: The namespace (key prefix) of the cache.
+    :param backend: The cache backend to be used.
+    :param url: The URL of the Redis server (for Redis backends).
+    :param max_size: The maximum number of in-process entries.
+    :param admission: If TinyLFU admission is used for in-process entries.
+    :param encoder: The function that converts values into JSON values.
+    :param decoder: The function that converts JSON values into values.
+    :param path: The directory of the memory mapped files (shared backend).
+    :param slots: The number of entries of the shared backend.
+    :param slot_size: The size (in bytes) of each shared backend entry.
+    :return: The cache for the provided backend.
+    """
+
+    if backend == "memory":
+        return MemoryCache(max_size=max_size, admission=admission)
+    if backend == "shared":
+        return SharedCache(
+            namespace,
+            path=path,
+            slots=slots,
+            slot_size=slot_size,
+            encoder=encoder,
+            decoder=decoder,
+        )
+    remote = RedisCache(
+        namespace=f"posterum:{namespace}", url=url, encoder=encoder, decoder=decoder
+    )
+    if backend == "redis":
+        return remote
+    if backend == "tiered":
+        return TieredCache(
+            remote,
+            local_cache=MemoryCache(max_size=max_size, admission=admission),
+            channel=f"posterum:{namespace}:invalidate",
+        )
+    raise ValueError(f"Invalid cache backend: {backend}")
+
+
+def _tuple(value: Any) -> Any:
+    # JSON has no tuples, so the (tuple) keys are restored from lists
+    if isinstance(value, list):
+        return tuple(_tuple(item) for item in value)
+    return value
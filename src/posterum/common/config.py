@@ -0,0 +1,94 @@
+import os
+import sys
+import importlib.util
+
+from types import ModuleType
+from typing import Any, Callable
+
+CASTS: dict[Any, Callable[[Any], Any]] = {
+    bool: lambda value: (
+        value if isinstance(value, bool) else value in ("1", "true", "True")
+    ),
+    list: lambda value: (
+        value if isinstance(value, list) else value.split(";") if value else []
+    ),
+}
+""" The casts that differ from calling the type itself, the same
+ones as the ones of appier, used when appier is not installed """
+
+
+def conf(name: str, default: Any = None, cast: Callable[[Any], Any] | None = None):
+    """
+    Retrieves the configuration value with the provided name from the
+    appier configuration (environment and configuration files), the
+    single source of configuration, no matter if the appier app has
+    been loaded or not, falling back to the environment when appier
+    is not installed.
+
+    :param name: The name of the configuration value.
+    :param default: The value to be used if the value is not set.
+    :param cast: The cast to be applied to the (set) value.
+    :return: The (casted) configuration value.
+    """
+
+    if not CONFIG is None:
+        return CONFIG.conf(name, default, cast=cast)
+    value = os.environ.get(name, default)
+    if not cast is None and not value is None:
+        value = CASTS.get(cast, cast)(value)
+    return value
+
+
+def load_config() -> ModuleType | None:
+    """
+    Loads the configuration module of appier (`appier.config`), that
+    only depends on `appier.legacy`, without running the (expensive)
+    initialization of the appier package, so that the entry points that
+    don't use appier (FastAPI app, command line and job workers) never
+    pay for its import.
+
+    The modules are registered under their own names so that appier,
+    once imported, re-uses them and both share the same configuration.
+
+    :return: The appier configuration module, None if appier is not
+    installed.
+    """
+
+    config = sys.modules.get("appier.config", None)
+    if not config is None:
+        return config
+
+    spec = importlib.util.find_spec("appier")
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    path = list(spec.submodule_search_locations)[0]
+
+    # the relative imports of the modules require their package to be
+    # loaded, so a placeholder is used while they are executed
+    package = ModuleType("appier")
+    package.__path__ = [path]
+    sys.modules["appier"] = package
+    try:
+        for name in ("legacy", "config"):
+            _spec = importlib.util.spec_from_file_location(
+                f"appier.{name}", os.path.join(path, f"{name}.py")
+            )
+            if _spec is None or _spec.loader is None:
+                raise ImportError(f"Missing appier module: {name}")
+            module = importlib.util.module_from_spec(_spec)
+            sys.modules[_spec.name] = module
+            try:
+                _spec.loader.exec_module(module)
+            except BaseException:
+                del sys.modules[_spec.name]
+                raise
+            setattr(package, name, module)
+    finally:
+        if sys.modules.get("appier", None) is package:
+            del sys.modules["appier"]
+    return sys.modules["appier.config"]
+
+
+CONFIG = load_config()
+""" The configuration module of appier, the source of every
+configuration value, None if appier is not installed """
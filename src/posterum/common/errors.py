@@ -1,3 +1,5 @@
+import math
+
 from typing import Any
 
 
@@ -5,6 +7,7 @@ class PosterumError(Exception):
     code: int = 500
     message: str = "Internal Server Error"
     payload: dict[str, Any] = {}
+    headers: dict[str, str] = {}
 
     def __init__(self, message: str = "Internal Server Error", code: int = 500):
         super().__init__(message)
@@ -20,3 +23,16 @@ class UserError(PosterumError):
 class NotFoundError(UserError):
     def __init__(self, message: str = "Not Found Error", code: int = 404):
         super().__init__(message, code)
+
+
+class OverloadedError(PosterumError):
+    def __init__(
+        self,
+        message: str = "Overloaded Error",
+        code: int = 503,
+        retry_after: float = 1.0,
+    ):
+        super().__init__(message, code)
+        self.retry_after = retry_after
+        self.payload = dict(retry_after=retry_after)
+        self.headers = {"Retry-After": str(max(math.ceil(retry_after), 1))}
@@ -0,0 +1,59 @@
+import asyncio
+
+from typing import Any, Awaitable, Callable, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent executions of the same (keyed) operation so
+    that only one of them is effectively run and every other caller
+    awaits its shared result (or exception).
+    """
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, asyncio.Future[T]] = {}
+
+    async def run(
+        self, key: Hashable, factory: Callable[[], Awaitable[T]]
+    ) -> tuple[T, bool]:
+        """
+        Runs the operation created by the provided factory, unless an
+        operation for the same key is already in flight, in which case
+        its result is awaited instead.
+
+        The shared operation is shielded from the cancellation of any
+        of its callers, so that the remaining ones are not affected.
+
+        :param key: The key that identifies the operation.
+        :param factory: The callable that creates the awaitable for
+        the operation, only called when there's no flight for the key.
+        :return: The tuple with the result of the operation and a flag
+        indicating if the result was coalesced from another caller.
+        """
+
+        future = self._flights.get(key, None)
+        if future:
+            return await asyncio.shield(future), True
+
+        future = asyncio.ensure_future(factory())
+        self._flights[key] = future
+        future.add_done_callback(lambda _: self._done(key, future))
+        return await asyncio.shield(future), False
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._flights
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def _done(self, key: Hashable, future: asyncio.Future[Any]):
+        if self._flights.get(key, None) is future:
+            del self._flights[key]
+
+        # marks the exception as retrieved, otherwise a failed flight
+        # whose callers were all cancelled would be reported as never
+        # retrieved by the event loop
+        if not future.cancelled():
+            future.exception()
@@ -0,0 +1,651 @@
+import os
+import queue
+import sqlite3
+import asyncio
+import multiprocessing
+
+from time import time
+from uuid import uuid4
+from zlib import crc32
+from threading import Lock, RLock, Thread, local
+from typing import Any, Literal, Sequence, cast
+
+from .config import conf
+from .smtp import SMTPVerifier, ValidationResult
+from .timeouts import Deadline
+
+JobStatus = Literal["pending", "running", "completed", "cancelled", "failed"]
+
+JobResult = tuple[int, str]
+
+
+class Job:
+    """
+    Validation job of a (possibly very large) list of addresses, its
+    results being stored (in completion order) by the job store.
+    """
+
+    def __init__(
+        self,
+        job_id: str | None = None,
+        status: JobStatus = "pending",
+        total: int = 0,
+        processed: int = 0,
+        created: float | None = None,
+        updated: float | None = None,
+        error: str | None = None,
+    ) -> None:
+        self.id = job_id or uuid4().hex
+        self.status: JobStatus = status
+        self.total = total
+        self.processed = processed
+        self.created = created or time()
+        self.updated = updated or self.created
+        self.error = error
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "cancelled", "failed")
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(
+            id=self.id,
+            status=self.status,
+            total=self.total,
+            processed=self.processed,
+            progress=self.processed / self.total if self.total else 1.0,
+            created=self.created,
+            updated=self.updated,
+            error=self.error,
+        )
+
+
+class JobStore:
+    """
+    Storage of the jobs and of their results, the results of a job
+    are kept in completion order so that they can be paginated while
+    the job is still running.
+
+    Implementations must be thread safe, as the results are added by
+    the thread collecting them from the worker processes.
+
+    The finished jobs (and their results) are removed once they have
+    not been updated for the TTL, as new jobs are created.
+
+    :param ttl: The time (in seconds) a finished job is kept, forever
+    if None.
+    """
+
+    shared = False
+    """ If the store is shared by processes, being then handed to the
+    worker processes so that they check the status of the jobs """
+
+    def __init__(self, ttl: float | None = 86400.0) -> None:
+        self.ttl = ttl
+
+    def create(self, job: Job):
+        raise NotImplementedError()
+
+    def get(self, job_id: str) -> Job | None:
+        raise NotImplementedError()
+
+    def update(self, job_id: str, **fields: Any):
+        raise NotImplementedError()
+
+    def add_results(self, job_id: str, results: Sequence[JobResult]) -> Job | None:
+        raise NotImplementedError()
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 1000) -> list[str]:
+        raise NotImplementedError()
+
+    def delete(self, job_id: str):
+        raise NotImplementedError()
+
+
+class MemoryJobStore(JobStore):
+    """
+    Job store kept in the memory of the process, the jobs are only
+    visible to the (server) process that created them, so multiple
+    server processes require the disk store (the default of `app.py`
+    when running multiple workers).
+    """
+
+    def __init__(self, ttl: float | None = 86400.0) -> None:
+        super().__init__(ttl=ttl)
+        self._jobs: dict[str, Job] = {}
+        self._results: dict[str, list[str]] = {}
+        self._lock = Lock()
+
+    def create(self, job: Job):
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+            self._results[job.id] = []
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id, None)
+
+    def update(self, job_id: str, **fields: Any):
+        with self._lock:
+            job = self._jobs[job_id]
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated = time()
+
+    def add_results(self, job_id: str, results: Sequence[JobResult]) -> Job | None:
+        with self._lock:
+            job = self._jobs.get(job_id, None)
+            if job is None or job.done:
+                return None
+            self._results[job_id].extend(data for _, data in results)
+            job.processed += len(results)
+            job.updated = time()
+            return job
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 1000) -> list[str]:
+        return self._results.get(job_id, [])[offset : offset + limit]
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self._results.pop(job_id, None)
+
+    def _expire(self):
+        if self.ttl is None:
+            return
+        limit = time() - self.ttl
+        expired = [
+            job.id for job in self._jobs.values() if job.done and job.updated < limit
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            del self._results[job_id]
+
+
+class DiskJobStore(JobStore):
+    """
+    Job store backed by a local SQLite database, so that the jobs
+    (and their results) survive restarts of the service and are
+    shared by the server processes of the host.
+
+    :param path: The path to the SQLite database file.
+    :param ttl: The time (in seconds) a finished job is kept, forever
+    if None.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = "jobs.db", ttl: float | None = 86400.0) -> None:
+        super().__init__(ttl=ttl)
+        self.path = path
+        self._local = local()
+        self._lock = Lock()
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # only the location of the database is sent to other processes,
+        # which open their own connections
+        return (self.__class__, (self.path, self.ttl))
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30.0)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, status TEXT, "
+                "total INTEGER, processed INTEGER, created REAL, updated REAL, "
+                "error TEXT)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (job TEXT, sequence INTEGER, "
+                "data TEXT, PRIMARY KEY (job, sequence)) WITHOUT ROWID"
+            )
+            self._local.connection = connection
+        return connection
+
+    def create(self, job: Job):
+        with self.connection as connection:
+            if not self.ttl is None:
+                self._expire(connection)
+            connection.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.status,
+                    job.total,
+                    job.processed,
+                    job.created,
+                    job.updated,
+                    job.error,
+                ),
+            )
+
+    def get(self, job_id: str) -> Job | None:
+        row = self.connection.execute(
+            "SELECT id, status, total, processed, created, updated, error "
+            "FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        return Job(*row) if row else None
+
+    def update(self, job_id: str, **fields: Any):
+        fields["updated"] = time()
+        with self._lock, self.connection as connection:
+            connection.execute(
+                "UPDATE jobs SET "
+                + ", ".join(f"{name} = ?" for name in fields)
+                + " WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+
+    def add_results(self, job_id: str, results: Sequence[JobResult]) -> Job | None:
+        with self._lock, self.connection as connection:
+            job = self.get(job_id)
+            if job is None or job.done:
+                return None
+            connection.executemany(
+                "INSERT INTO results VALUES (?, ?, ?)",
+                (
+                    (job_id, job.processed + sequence, data)
+                    for sequence, (_, data) in enumerate(results)
+                ),
+            )
+            job.processed += len(results)
+            job.updated = time()
+            connection.execute(
+                "UPDATE jobs SET processed = ?, updated = ? WHERE id = ?",
+                (job.processed, job.updated, job_id),
+            )
+            return job
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 1000) -> list[str]:
+        return [
+            data
+            for (data,) in self.connection.execute(
+                "SELECT data FROM results WHERE job = ? AND sequence >= ? "
+                "ORDER BY sequence LIMIT ?",
+                (job_id, offset, limit),
+            )
+        ]
+
+    def delete(self, job_id: str):
+        with self._lock, self.connection as connection:
+            connection.execute("DELETE FROM results WHERE job = ?", (job_id,))
+            connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def _expire(self, connection: sqlite3.Connection):
+        expired = (
+            "SELECT id FROM jobs WHERE status IN ('completed', 'cancelled', "
+            "'failed') AND updated < ?"
+        )
+        limit = time() - cast(float, self.ttl)
+        connection.execute(f"DELETE FROM results WHERE job IN ({expired})", (limit,))
+        connection.execute(f"DELETE FROM jobs WHERE id IN ({expired})", (limit,))
+
+
+class Chunk:
+    """
+    Chunk of the addresses of a job sent to a worker, kept until its
+    results are collected so that it can be re-queued.
+    """
+
+    def __init__(
+        self,
+        worker: int,
+        addresses: list[tuple[int, str]],
+        cache: bool | None = None,
+    ) -> None:
+        self.worker = worker
+        self.addresses = addresses
+        self.cache = cache
+        self.attempts = 0
+
+
+class JobManager:
+    """
+    Runs the validation jobs in a pool of worker processes, each one
+    with its own event loop and `SMTPVerifier` (pools, caches and
+    schedulers), so that every core of the machine is used.
+
+    The addresses of a job are sharded by domain, so that all the
+    addresses of a domain (and so of its MX servers) are handled by
+    the same worker, re-using its SMTP sessions and cached answers.
+
+    The chunks sent to a worker are tracked until their results are
+    collected, so that a worker that exits (eg: crashed or killed) is
+    restarted and its in-flight chunks re-queued, the jobs of the
+    chunks that exhausted their retries being failed.
+
+    :param store: The store of the jobs and of their results.
+    :param workers: The number of worker processes.
+    :param chunk_size: The maximum number of addresses sent to a
+    worker at once.
+    :param concurrency: The maximum number of chunks validated at
+    the same time by each of the workers.
+    :param retries: The number of times a chunk is re-queued after
+    the worker validating it exited.
+    """
+
+    def __init__(
+        self,
+        store: JobStore | None = None,
+        workers: int | None = None,
+        chunk_size: int = 500,
+        concurrency: int = 16,
+        retries: int = 1,
+    ) -> None:
+        self.store = store or MemoryJobStore()
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.retries = retries
+        self.restarts = 0
+        self._context: Any | None = None
+        self._inboxes: list[Any] = []
+        self._outbox: Any | None = None
+        self._processes: list[multiprocessing.process.BaseProcess] = []
+        self._pending: dict[tuple[str, int], Chunk] = {}
+        self._collector: Thread | None = None
+        self._stopping = False
+        self._lock = RLock()
+
+    def submit(self, addresses: Sequence[str], cache: bool | None = None) -> Job:
+        """
+        Creates a job for the provided addresses, sending its chunks
+        to the workers (started on first use) and returning right away.
+
+        :param addresses: The e-mail addresses to be validated.
+        :param cache: If the result cache should be used by the workers.
+        :return: The created job.
+        """
+
+        self.start()
+
+        job = Job(status="running" if addresses else "completed", total=len(addresses))
+        self.store.create(job)
+
+        shards: list[list[tuple[int, str]]] = [[] for _ in range(self.workers)]
+        for index, address in enumerate(addresses):
+            domain = address.rsplit("@", 1)[-1].lower()
+            shards[crc32(domain.encode("utf-8")) % self.workers].append(
+                (index, address)
+            )
+        with self._lock:
+            sequence = 0
+            for worker, shard in enumerate(shards):
+                for offset in range(0, len(shard), self.chunk_size):
+                    chunk = Chunk(
+                        worker, shard[offset : offset + self.chunk_size], cache
+                    )
+                    self._pending[(job.id, sequence)] = chunk
+                    self._send(job.id, sequence, chunk)
+                    sequence += 1
+
+        return job
+
+    def cancel(self, job_id: str) -> Job | None:
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if not job.done:
+            self.store.update(job_id, status="cancelled")
+            self._cancel(job_id)
+        return self.store.get(job_id)
+
+    def start(self):
+        if self._processes:
+            return
+        with self._lock:
+            if self._processes:
+                return
+            # uses spawn (instead of fork) as the parent process may
+            # have running threads (eg: cache listeners and snapshots)
+            self._context = multiprocessing.get_context("spawn")
+            self._outbox = self._context.Queue()
+            for index in range(self.workers):
+                inbox, process = self._spawn(index)
+                self._inboxes.append(inbox)
+                self._processes.append(process)
+            self._collector = Thread(
+                target=self._collect, name="posterum-collector", daemon=True
+            )
+            self._collector.start()
+
+    def stop(self, timeout: float = 10.0):
+        if not self._processes:
+            return
+        self._stopping = True
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        if self._outbox:
+            self._outbox.put(None)
+        if self._collector:
+            self._collector.join(timeout)
+        for _queue in (*self._inboxes, self._outbox):
+            if _queue:
+                _queue.close()
+        self._inboxes, self._processes = [], []
+        self._outbox, self._collector = None, None
+        self._pending.clear()
+        self._stopping = False
+
+    def _collect(self):
+        outbox = self._outbox
+        while outbox:
+            # waits for the next message with a timeout so that the
+            # workers are watched even when no results are coming
+            try:
+                message = outbox.get(timeout=1.0)
+            except queue.Empty:
+                self._watch()
+                continue
+            if message is None:
+                break
+            job_id, sequence, results, error = message
+            # the results of a chunk are only taken once, as a chunk
+            # re-queued from an exited worker may have been validated
+            with self._lock:
+                chunk = self._pending.pop((job_id, sequence), None)
+            if chunk and not error is None:
+                self._fail(job_id, error)
+            elif chunk:
+                job = self.store.add_results(job_id, results)
+                if job and job.processed >= job.total:
+                    self.store.update(job_id, status="completed")
+            self._watch()
+
+    def _watch(self):
+        # restarts the workers that exited (while not being stopped),
+        # re-queueing their in-flight chunks in the new worker, unless
+        # they already exhausted their retries (failing their jobs)
+        failed: dict[str, str] = {}
+        with self._lock:
+            for worker, process in enumerate(self._processes):
+                if self._stopping or process.is_alive():
+                    continue
+                error = f"Worker exited with code {process.exitcode}"
+                self._restart(worker)
+                for (job_id, sequence), chunk in list(self._pending.items()):
+                    if not chunk.worker == worker or job_id in failed:
+                        continue
+                    if chunk.attempts >= self.retries:
+                        failed[job_id] = error
+                        continue
+                    chunk.attempts += 1
+                    self._send(job_id, sequence, chunk)
+        for job_id, error in failed.items():
+            self._fail(job_id, error)
+
+    def _restart(self, worker: int):
+        # the inbox of the exited worker is replaced as it may have
+        # been left in an inconsistent state (eg: killed while reading)
+        inbox = self._inboxes[worker]
+        inbox.cancel_join_thread()
+        inbox.close()
+        self._inboxes[worker], self._processes[worker] = self._spawn(worker)
+        self.restarts += 1
+
+    def _spawn(self, index: int) -> tuple[Any, multiprocessing.process.BaseProcess]:
+        context = cast(Any, self._context)
+        inbox = context.Queue()
+        process = context.Process(
+            target=_worker,
+            args=(
+                inbox,
+                self._outbox,
+                self.concurrency,
+                self.store if self.store.shared else None,
+            ),
+            name=f"posterum-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return inbox, process
+
+    def _send(self, job_id: str, sequence: int, chunk: Chunk):
+        self._inboxes[chunk.worker].put(
+            ("validate", job_id, sequence, chunk.addresses, chunk.cache)
+        )
+
+    def _fail(self, job_id: str, error: str):
+        # a chunk that could not be validated fails the whole job, as
+        # its addresses would be missing from the results, with the
+        # remaining chunks being cancelled
+        job = self.store.get(job_id)
+        if job is None or job.done:
+            return
+        self.store.update(job_id, status="failed", error=error)
+        self._cancel(job_id)
+
+    def _cancel(self, job_id: str):
+        with self._lock:
+            for key in [key for key in self._pending if key[0] == job_id]:
+                del self._pending[key]
+            for inbox in self._inboxes:
+                inbox.put(("cancel", job_id, None, None, None))
+
+
+def _worker(inbox: Any, outbox: Any, concurrency: int, store: JobStore | None = None):
+    asyncio.run(_serve(inbox, outbox, concurrency, store=store))
+
+
+async def _serve(
+    inbox: Any, outbox: Any, concurrency: int, store: JobStore | None = None
+):
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks: dict[str, set[asyncio.Task[None]]] = {}
+
+    while True:
+        message = await loop.run_in_executor(None, _get, inbox)
+        if message is None:
+            break
+        if message is False:
+            continue
+        kind, job_id, sequence, chunk, cache = message
+        if kind == "cancel":
+            for task in tasks.pop(job_id, set()):
+                task.cancel()
+            continue
+        task = loop.create_task(
+            _validate(job_id, sequence, chunk, cache, outbox, semaphore, store=store)
+        )
+        job_tasks = tasks.setdefault(job_id, set())
+        job_tasks.add(task)
+        task.add_done_callback(job_tasks.discard)
+
+    for _tasks in tasks.values():
+        for task in _tasks:
+            task.cancel()
+
+
+def _get(inbox: Any) -> Any:
+    # waits for the next message with a timeout so that the executor
+    # thread is not left blocked forever when the loop is stopped
+    try:
+        return inbox.get(timeout=1.0)
+    except queue.Empty:
+        return False
+
+
+async def _validate(
+    job_id: str,
+    sequence: int,
+    chunk: list[tuple[int, str]],
+    cache: bool | None,
+    outbox: Any,
+    semaphore: asyncio.Semaphore,
+    store: JobStore | None = None,
+):
+    async with semaphore:
+        # the job may have been cancelled by another server process
+        # (sharing the store), which can only be seen in the store
+        job = store.get(job_id) if store else None
+        if job and job.done:
+            outbox.put((job_id, sequence, [], None))
+            return
+        indexes = [index for index, _ in chunk]
+        addresses = [address for _, address in chunk]
+        try:
+            # the jobs are bounded by their own concurrency and never
+            # shed (nor given up on), waiting for their admission instead
+            results = await SMTPVerifier.validate_emails(
+                addresses, cache=cache, shed=False, deadline=Deadline()
+            )
+        except Exception as exception:
+            outbox.put(
+                (
+                    job_id,
+                    sequence,
+                    None,
+                    str(exception) or exception.__class__.__name__,
+                )
+            )
+            return
+        data = [
+            ValidationResult.serialize(address, result).decode("utf-8")
+            for address, result in zip(addresses, results)
+        ]
+        outbox.put(
+            (
+                job_id,
+                sequence,
+                [
+                    (index, '{"index":' + str(index) + "," + value[1:])
+                    for index, value in zip(indexes, data)
+                ],
+                None,
+            )
+        )
+
+
+def build_job_store(
+    backend: Literal["memory", "disk"] = "memory",
+    path: str = "jobs.db",
+    ttl: float | None = 86400.0,
+) -> JobStore:
+    if backend == "memory":
+        return MemoryJobStore(ttl=ttl)
+    if backend == "disk":
+        return DiskJobStore(path, ttl=ttl)
+    raise ValueError(f"Invalid job store backend: {backend}")
+
+
+JOBS_LIMIT = cast(int, conf("JOBS_LIMIT", 1000000, cast=int))
+
+JOB_MANAGER = JobManager(
+    store=build_job_store(
+        cast(Any, conf("JOBS_STORE", "memory")),
+        path=cast(str, conf("JOBS_PATH", "jobs.db")),
+        ttl=cast(float | None, conf("JOBS_TTL", 86400.0, cast=float)) or None,
+    ),
+    workers=cast(int | None, conf("JOBS_WORKERS", None, cast=int)),
+    chunk_size=cast(int, conf("JOBS_CHUNK_SIZE", 500, cast=int)),
+    concurrency=cast(int, conf("JOBS_CONCURRENCY", 16, cast=int)),
+)
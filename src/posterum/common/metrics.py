@@ -0,0 +1,208 @@
+from bisect import bisect_left
+from typing import Callable, Iterable, Literal, Sequence, TypeVar
+
+MetricType = Literal["counter", "gauge", "histogram"]
+
+Labels = tuple[str, ...]
+
+Sample = tuple[Labels, float]
+
+M = TypeVar("M", bound="Metric")
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+
+class Metric:
+    """
+    Base metric with a fixed set of label names, samples are kept in
+    plain dictionaries keyed by the tuple of label values.
+
+    Updates are not guarded by any lock, they're expected to happen
+    in the (single) thread of the event loop, where each update runs
+    to completion without being interleaved with other updates.
+
+    :param name: The name of the metric (eg: posterum_validations_total).
+    :param description: The description of the metric.
+    :param labels: The names of the labels of the metric.
+    :param collect: The function that returns the samples of the metric
+    when it's rendered, for values that are owned by other objects.
+    """
+
+    type: MetricType = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        collect: Callable[[], Iterable[Sample]] | None = None,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.collect = collect
+        self._values: dict[Labels, float] = {}
+
+    def samples(self) -> Iterable[tuple[str, Labels, Labels, float]]:
+        values = self.collect() if self.collect else self._values.items()
+        for labels, value in values:
+            yield self.name, self.labels, labels, value
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        for name, names, labels, value in self.samples():
+            lines.append(f"{name}{_labels(names, labels)} {_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type: MetricType = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    type: MetricType = "gauge"
+
+    def set(self, *labels: str, value: float = 0.0):
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) - amount
+
+
+class Histogram(Metric):
+    """
+    Histogram with fixed (upper bound) buckets, the per bucket counts
+    are stored non cumulatively so that an observation only updates
+    a single bucket, being accumulated when rendered.
+
+    :param buckets: The sorted upper bounds of the buckets.
+    """
+
+    type: MetricType = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description, labels=labels)
+        self.buckets = tuple(buckets)
+        self._counts: dict[Labels, list[int]] = {}
+        self._sums: dict[Labels, float] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self._counts.get(labels, None)
+        if counts is None:
+            counts = [0] * (len(self.buckets) + 1)
+            self._counts[labels] = counts
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] = self._sums.get(labels, 0.0) + value
+
+    def samples(self) -> Iterable[tuple[str, Labels, Labels, float]]:
+        names = self.labels + ("le",)
+        for labels, counts in list(self._counts.items()):
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                total += count
+                yield self.name + "_bucket", names, labels + (_value(bound),), total
+            yield self.name + "_sum", self.labels, labels, self._sums[labels]
+            yield self.name + "_count", self.labels, labels, total
+
+
+class Registry:
+    """
+    Registry of metrics, rendered using the Prometheus text based
+    exposition format.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+
+    def counter(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        collect: Callable[[], Iterable[Sample]] | None = None,
+    ) -> Counter:
+        return self.register(Counter(name, description, labels=labels, collect=collect))
+
+    def gauge(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        collect: Callable[[], Iterable[Sample]] | None = None,
+    ) -> Gauge:
+        return self.register(Gauge(name, description, labels=labels, collect=collect))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(
+            Histogram(name, description, labels=labels, buckets=buckets)
+        )
+
+    def register(self, metric: M) -> M:
+        if metric.name in self.metrics:
+            raise ValueError(f"Duplicated metric: {metric.name}")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+def _labels(names: Labels, values: Labels) -> str:
+    if not names:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+        + "}"
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _value(value: float | str) -> str:
+    if isinstance(value, str):
+        return value
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+METRICS = Registry()
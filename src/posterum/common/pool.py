@@ -0,0 +1,534 @@
+import asyncio
+
+from time import time, monotonic
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Sequence, cast
+from contextlib import asynccontextmanager
+from aiosmtplib import (
+    SMTP,
+    SMTPReadTimeoutError,
+    SMTPResponse,
+    SMTPResponseException,
+    SMTPServerDisconnected,
+    SMTPTimeoutError,
+)
+
+from .profiling import Span
+from .timeouts import Deadline, LatencyEstimator
+
+PoolKey = tuple[str, str | None]
+
+PIPELINE_BUFFER = 1048576
+
+
+class PipelineProtocol(asyncio.Protocol):
+    """
+    Protocol that takes over the transport of an SMTP session while a
+    pipeline runs, as the protocol of the session parses (and keeps)
+    a single response per read, buffering every response received and
+    handing the connection events over to the protocol of the session.
+
+    :param protocol: The protocol of the SMTP session.
+    :param max_size: The maximum size of the buffered responses.
+    """
+
+    def __init__(self, protocol: asyncio.Protocol, max_size: int = PIPELINE_BUFFER):
+        self.protocol = protocol
+        self.max_size = max_size
+        self.buffer = bytearray()
+        self.error: BaseException | None = None
+        self._waiter: asyncio.Future[None] | None = None
+
+    def data_received(self, data: bytes):
+        self.buffer.extend(data)
+        self._wake()
+
+    def eof_received(self) -> bool | None:
+        self.error = SMTPServerDisconnected("Unexpected EOF received")
+        self._wake()
+        return self.protocol.eof_received()
+
+    def connection_lost(self, exc: Exception | None):
+        if self.error is None:
+            self.error = SMTPServerDisconnected("Connection lost")
+        self._wake()
+        self.protocol.connection_lost(exc)
+
+    def pause_writing(self):
+        self.protocol.pause_writing()
+
+    def resume_writing(self):
+        self.protocol.resume_writing()
+
+    async def read_response(self, timeout: float | None = None) -> SMTPResponse:
+        """
+        Reads the next response, waiting for it to be (completely)
+        received for at most the provided timeout.
+
+        :param timeout: The timeout for the response.
+        :return: The response, with multiline messages joined by newlines.
+        """
+
+        while True:
+            response = self._parse()
+            if not response is None:
+                return response
+            if not self.error is None:
+                raise self.error
+            if len(self.buffer) > self.max_size:
+                raise SMTPResponseException(500, "Response too long")
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            except asyncio.TimeoutError as exception:
+                raise SMTPReadTimeoutError(
+                    "Timed out waiting for server response"
+                ) from exception
+            finally:
+                self._waiter = None
+
+    def _parse(self) -> SMTPResponse | None:
+        lines: list[bytes] = []
+        offset = 0
+        while True:
+            end = self.buffer.find(b"\n", offset)
+            if end == -1:
+                return None
+            line = bytes(self.buffer[offset : end + 1])
+            offset = end + 1
+            try:
+                code = int(line[:3])
+            except ValueError:
+                raise SMTPResponseException(
+                    500, "Malformed SMTP response line"
+                ) from None
+            lines.append(line[4:].strip(b" \t\r\n"))
+            if not line[3:4] == b"-":
+                del self.buffer[:offset]
+                return SMTPResponse(
+                    code, b"\n".join(lines).decode("utf-8", "surrogateescape")
+                )
+
+    def _wake(self):
+        if self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+class PooledSMTP(SMTP):
+    """
+    SMTP client that keeps track of the usage information required
+    by the connection pool to decide on re-use, observing the latency
+    of each command in the (optional) latency estimator.
+
+    The spans of the acquisition of the session (connect, banner and
+    EHLO for a new session, RSET for a re-used one) are kept until the
+    next acquisition.
+    """
+
+    def __init__(
+        self, *args: Any, latencies: LatencyEstimator | None = None, **kwargs: Any
+    ):
+        self.connected: float | None = None
+        self.greeted: float | None = None
+        super().__init__(*args, **kwargs)
+        self.created = time()
+        self.last_used = self.created
+        self.commands = 0
+        self.latencies = latencies
+        self.spans: list[Span] = []
+
+    @property
+    def protocol(self) -> Any:
+        return self._protocol
+
+    @protocol.setter
+    def protocol(self, protocol: Any):
+        # the protocol is set as soon as the TCP connection is made and
+        # before the banner is read, marking the end of the connect
+        self._protocol = protocol
+        if not protocol is None:
+            self.connected = monotonic()
+
+    async def ehlo(self, *args: Any, **kwargs: Any):
+        # the (first) EHLO is sent right after the banner is read, even
+        # if from within the connect (to check for STARTTLS)
+        if self.greeted is None:
+            self.greeted = monotonic()
+        return await super().ehlo(*args, **kwargs)
+
+    async def execute_command(self, *args: Any, **kwargs: Any):
+        self.commands += 1
+        if self.latencies is None:
+            return await super().execute_command(*args, **kwargs)
+        start = monotonic()
+        try:
+            response = await super().execute_command(*args, **kwargs)
+        except SMTPTimeoutError:
+            self.latencies.observe(
+                (self.hostname, "command"), monotonic() - start, censored=True
+            )
+            raise
+        self.latencies.observe((self.hostname, "command"), monotonic() - start)
+        return response
+
+    @property
+    def pipelining(self) -> bool:
+        """
+        If the commands can be pipelined, meaning that the server has
+        advertised the PIPELINING extension (RFC 2920).
+        """
+
+        return self.supports_extension("pipelining")
+
+    async def pipeline(
+        self, *commands: bytes, timeout: float | None = None
+    ) -> list[SMTPResponse]:
+        """
+        Sends the provided commands in a single write (RFC 2920), then
+        reads their responses in order, so that the whole group costs a
+        single round-trip instead of one per command.
+
+        Only the commands allowed in a pipeline (eg: RSET, MAIL and RCPT)
+        should be sent, and only to a server that advertised it, with no
+        other command running in the session at the same time (as it's
+        the case for the sessions handed out by the pool).
+
+        :param commands: The commands (without the line terminator).
+        :param timeout: The timeout for each of the responses.
+        :return: The responses of the commands, in the same order.
+        """
+
+        transport = cast(asyncio.Transport | None, self.transport)
+        if transport is None or transport.is_closing() or not self.is_connected:
+            raise SMTPServerDisconnected("Server not connected")
+        for command in commands:
+            if b"\r" in command or b"\n" in command:
+                raise ValueError("Command contains a prohibited control character")
+
+        self.commands += len(commands)
+        start = monotonic()
+        responses: list[SMTPResponse] = []
+
+        # the transport is handed over to the pipeline protocol while
+        # the responses are read, and then back to the session protocol
+        protocol = transport.get_protocol()
+        pipeline = PipelineProtocol(cast(asyncio.Protocol, protocol))
+        transport.set_protocol(pipeline)
+        try:
+            try:
+                transport.write(b"".join(command + b"\r\n" for command in commands))
+                for _ in commands:
+                    responses.append(await pipeline.read_response(timeout=timeout))
+            finally:
+                transport.set_protocol(protocol)
+        except (SMTPServerDisconnected, SMTPTimeoutError, SMTPResponseException):
+            # the responses are no longer in sync with the commands
+            self.close()
+            raise
+        finally:
+            if not self.latencies is None:
+                self.latencies.observe(
+                    (self.hostname, "command"),
+                    monotonic() - start,
+                    censored=len(responses) < len(commands),
+                )
+
+        if any(response.code == 421 for response in responses):
+            self.close()
+        return responses
+
+
+class SMTPPool:
+    """
+    Pool of SMTP sessions keyed by the MX server and the hostname
+    used in the EHLO command, idle sessions are reset (RSET) before
+    being handed out again so that the connect and EHLO round-trips
+    are avoided for repeated validations against the same server.
+
+    Discarded sessions are closed with a QUIT sent in the background
+    (bounded by the quit timeout), never delaying the caller.
+
+    :param max_size: The maximum number of sessions per MX server.
+    :param sizes: The callback returning the maximum number of sessions
+    of the provided MX server, used instead of the maximum size so that
+    the pool follows the (per provider) limits of the scheduler.
+    :param idle_timeout: The time (in seconds) an idle session is kept.
+    :param max_commands: The number of commands after which a session
+    is no longer re-used.
+    :param port: The port of the MX servers.
+    :param quit_timeout: The timeout (in seconds) of the QUIT command.
+    :param latencies: The estimator of the connect and command latencies
+    of each MX server, adapting the connect timeouts when set.
+    :param observe: The callback that observes the time (in seconds)
+    of the phases run in the background (eg: QUIT), called with the MX
+    server, the phase and the time.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 8,
+        sizes: Callable[[str], int] | None = None,
+        idle_timeout: float = 30.0,
+        max_commands: int = 100,
+        port: int = 25,
+        quit_timeout: float = 5.0,
+        latencies: LatencyEstimator | None = None,
+        observe: Callable[[str, str, float], None] | None = None,
+    ) -> None:
+        self.max_size = max_size
+        self.sizes = sizes
+        self.idle_timeout = idle_timeout
+        self.max_commands = max_commands
+        self.port = port
+        self.quit_timeout = quit_timeout
+        self.latencies = latencies
+        self.observe = observe
+        self.active = 0
+        self._idle: dict[PoolKey, list[PooledSMTP]] = {}
+        self._semaphores: dict[PoolKey, asyncio.Semaphore] = {}
+        self._tasks: set[asyncio.Future[None]] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @asynccontextmanager
+    async def session(
+        self,
+        mx_server: str,
+        hostname: str | None = None,
+        timeout: float = 10.0,
+        hedge: Sequence[str] = (),
+        hedge_delay: float | None = None,
+        deadline: Deadline | None = None,
+    ) -> AsyncIterator[PooledSMTP]:
+        """
+        Obtains a ready to use SMTP session for the provided MX server,
+        returning it to the pool on success and discarding it on any
+        error, as the state of the session can no longer be trusted.
+
+        If hedge servers are provided and there's no idle session for
+        the MX server, a connection to the next hedge server is started
+        whenever the previous ones did not connect within the hedge
+        delay (or failed), the first one to connect is used.
+
+        :param mx_server: The MX server to obtain the session for.
+        :param hostname: The hostname to be used in the EHLO command.
+        :param timeout: The timeout for the connect, EHLO and RSET operations.
+        :param hedge: The (ordered) alternative MX servers to race against.
+        :param hedge_delay: The delay (in seconds) before starting each of
+        the connections to the alternative MX servers.
+        :param deadline: The deadline of the operation, capping both the
+        wait for a free session and the connect timeout.
+        :return: The SMTP client of the session, its `hostname` being the
+        MX server that is effectively being used.
+        """
+
+        self._ensure_loop()
+        keys = [(mx_server, hostname)] + [(server, hostname) for server in hedge]
+        if len(keys) > 1 and not hedge_delay is None and not self._idle.get(keys[0]):
+            key, client = await self._acquire_hedged(
+                keys, hedge_delay, timeout=timeout, deadline=deadline
+            )
+        else:
+            key, client = keys[0], await self._acquire_slot(
+                keys[0], timeout=timeout, deadline=deadline
+            )
+        semaphore = self._semaphore(key)
+        self.active += 1
+        try:
+            yield client
+        except BaseException:
+            self._discard(client)
+            raise
+        else:
+            self._release(key, client)
+        finally:
+            self.active -= 1
+            semaphore.release()
+
+    def close(self):
+        """
+        Closes every idle session in the pool, sending QUIT in the
+        background whenever an event loop is available.
+        """
+
+        for clients in self._idle.values():
+            for client in clients:
+                self._discard(client)
+        self._idle.clear()
+
+    @property
+    def size(self) -> int:
+        return sum(len(clients) for clients in self._idle.values())
+
+    async def _acquire_slot(
+        self, key: PoolKey, timeout: float = 10.0, deadline: Deadline | None = None
+    ) -> PooledSMTP:
+        semaphore = self._semaphore(key)
+        if deadline is None:
+            await semaphore.acquire()
+        else:
+            await deadline.wait_for(semaphore.acquire())
+        try:
+            return await self._acquire(key, timeout=timeout, deadline=deadline)
+        except BaseException:
+            semaphore.release()
+            raise
+
+    async def _acquire_hedged(
+        self,
+        keys: Sequence[PoolKey],
+        delay: float,
+        timeout: float = 10.0,
+        deadline: Deadline | None = None,
+    ) -> tuple[PoolKey, PooledSMTP]:
+        tasks: dict[asyncio.Future[PooledSMTP], PoolKey] = {}
+        pending = list(keys)
+        errors: list[BaseException] = []
+        winner: tuple[PoolKey, PooledSMTP] | None = None
+        try:
+            while winner is None and (pending or tasks):
+                if pending:
+                    key = pending.pop(0)
+                    task = asyncio.ensure_future(
+                        self._acquire_slot(key, timeout, deadline=deadline)
+                    )
+                    tasks[task] = key
+                done, _ = await asyncio.wait(
+                    tasks,
+                    timeout=delay if pending else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for future in done:
+                    key = tasks.pop(future)
+                    exception = future.exception()
+                    if exception:
+                        errors.append(exception)
+                    elif winner is None:
+                        winner = (key, future.result())
+                    else:
+                        self._settle(key, future)
+        finally:
+            # the connections that lost the race are kept running and
+            # parked in the pool once established, to be re-used later
+            for future, key in tasks.items():
+                future.add_done_callback(partial(self._settle, key))
+
+        if winner is None:
+            raise errors[0]
+        return winner
+
+    def _settle(self, key: PoolKey, task: asyncio.Future[PooledSMTP]):
+        if task.cancelled() or task.exception():
+            return
+        self._release(key, task.result())
+        self._semaphore(key).release()
+
+    def _semaphore(self, key: PoolKey) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(key, None)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(
+                self.max_size if self.sizes is None else self.sizes(key[0])
+            )
+            self._semaphores[key] = semaphore
+        return semaphore
+
+    async def _acquire(
+        self, key: PoolKey, timeout: float = 10.0, deadline: Deadline | None = None
+    ) -> PooledSMTP:
+        mx_server, hostname = key
+        if not deadline is None:
+            timeout = deadline.cap(timeout)
+        clients = self._idle.get(key, [])
+        while clients:
+            client = clients.pop()
+            if not client.is_connected or time() - client.last_used > self.idle_timeout:
+                self._discard(client)
+                continue
+            start = monotonic()
+            try:
+                await client.rset(timeout=timeout)
+            except Exception:
+                self._discard(client)
+                continue
+            client.spans = [("rset", start, monotonic() - start)]
+            return client
+
+        # the connect timeout is adapted to the latency of previous
+        # connections to the MX server (banner and EHLO included)
+        connect_timeout = (
+            timeout
+            if self.latencies is None
+            else self.latencies.timeout((mx_server, "connect"), timeout)
+        )
+        client = PooledSMTP(
+            hostname=mx_server,
+            port=self.port,
+            local_hostname=hostname,
+            timeout=timeout,
+            latencies=self.latencies,
+        )
+        start = monotonic()
+        try:
+            await client.connect(timeout=connect_timeout)
+            if client.last_ehlo_response is None:
+                await client.ehlo(hostname=hostname, timeout=connect_timeout)
+        except BaseException as exception:
+            client.close()
+            if not self.latencies is None and isinstance(exception, SMTPTimeoutError):
+                self.latencies.observe(
+                    (mx_server, "connect"), monotonic() - start, censored=True
+                )
+            raise
+        end = monotonic()
+        if not self.latencies is None:
+            self.latencies.observe((mx_server, "connect"), end - start)
+        connected = client.connected or start
+        greeted = client.greeted or end
+        client.spans = [
+            ("connect", start, connected - start),
+            ("banner", connected, greeted - connected),
+            ("ehlo", greeted, end - greeted),
+        ]
+        return client
+
+    def _release(self, key: PoolKey, client: PooledSMTP):
+        if not client.is_connected or client.commands >= self.max_commands:
+            self._discard(client)
+            return
+        client.last_used = time()
+        self._idle.setdefault(key, []).append(client)
+
+    def _discard(self, client: PooledSMTP):
+        if not client.is_connected:
+            client.close()
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            client.close()
+            return
+        task = asyncio.ensure_future(self._quit(client))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _quit(self, client: PooledSMTP):
+        start = monotonic()
+        try:
+            await client.quit(timeout=self.quit_timeout)
+        except Exception:
+            client.close()
+        finally:
+            if not self.observe is None:
+                self.observe(cast(str, client.hostname), "quit", monotonic() - start)
+
+    def _ensure_loop(self):
+        # sessions (and semaphores) are bound to the event loop that
+        # created them, so a new loop requires a new set of them
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        for clients in self._idle.values():
+            for client in clients:
+                client.close()
+        self._idle.clear()
+        self._semaphores.clear()
+        self._loop = loop
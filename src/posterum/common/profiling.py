@@ -0,0 +1,205 @@
+import os
+import io
+import pstats
+import random
+import cProfile
+
+from json import dumps
+from time import monotonic, time
+from uuid import uuid4
+from typing import Any, Awaitable, Literal, Sequence, TypeVar
+
+T = TypeVar("T")
+
+Span = tuple[str, float, float]
+
+ProfileMode = Literal["trace", "cprofile"]
+
+
+class Timings:
+    """
+    Accumulator of the time spent in each phase (eg: connect, banner,
+    EHLO, VRFY or RCPT) of a validation, with the phases that repeat
+    (eg: on MX failover) being added up.
+
+    When tracing, the (ordered) spans of every phase are also kept, as
+    the coroutine level trace of the validation.
+
+    :param trace: If the spans of the phases should be kept.
+    """
+
+    __slots__ = ("phases", "spans", "origin")
+
+    def __init__(self, trace: bool = False) -> None:
+        self.phases: dict[str, float] = {}
+        self.spans: list[Span] | None = [] if trace else None
+        self.origin = monotonic()
+
+    def add(self, phase: str, start: float, elapsed: float | None = None):
+        """
+        Adds the time spent in the provided phase, started at the
+        provided (monotonic) time and ending now, if not elapsed.
+
+        :param phase: The name of the phase.
+        :param start: The (monotonic) start time of the phase.
+        :param elapsed: The time (in seconds) spent in the phase.
+        """
+
+        if elapsed is None:
+            elapsed = monotonic() - start
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+        if not self.spans is None:
+            self.spans.append((phase, start - self.origin, elapsed))
+
+    async def measure(self, phase: str, awaitable: Awaitable[T]) -> T:
+        """
+        Awaits the provided awaitable, adding the time it took to the
+        provided phase (even if it fails).
+
+        :param phase: The name of the phase.
+        :param awaitable: The awaitable of the phase.
+        :return: The result of the awaitable.
+        """
+
+        start = monotonic()
+        try:
+            return await awaitable
+        finally:
+            self.add(phase, start)
+
+    def session(self, start: float, spans: Sequence[Span]):
+        """
+        Records the acquisition of an SMTP session started at the provided
+        time, made of the provided spans (connect, banner and EHLO for new
+        sessions, RSET for re-used ones), the remaining time being the
+        one waiting (queue) for an MX slot or for a pooled session.
+
+        :param start: The (monotonic) start time of the acquisition.
+        :param spans: The spans of the session, with monotonic start times.
+        """
+
+        elapsed = monotonic() - start
+        self.add("queue", start, max(elapsed - sum(span[2] for span in spans), 0.0))
+        for phase, span_start, span_elapsed in spans:
+            self.add(phase, span_start, span_elapsed)
+
+
+class Profile:
+    """
+    Profile of a single validation, with its trace (the spans of each
+    of its phases) and, in the cProfile mode, the statistics of the
+    function calls made while it runs.
+
+    As cProfile profiles the whole thread, the statistics include every
+    other coroutine that ran concurrently with the validation.
+    """
+
+    def __init__(self, mode: ProfileMode = "trace", limit: int = 25) -> None:
+        self.limit = limit
+        self.timings = Timings(trace=True)
+        self.profile: cProfile.Profile | None = None
+        if mode == "cprofile" and not Profiler.active:
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:
+                # another profiling tool is already active (Python 3.12+)
+                self.profile = None
+            else:
+                Profiler.active = True
+
+    def finish(self) -> dict[str, Any]:
+        """
+        Finishes the profile, stopping cProfile (if running).
+
+        :return: The map with the trace of the validation and the text
+        summary of the cProfile statistics (if any).
+        """
+
+        data: dict[str, Any] = dict(
+            trace=[
+                dict(phase=phase, start=start, time=elapsed)
+                for phase, start, elapsed in self.timings.spans or []
+            ]
+        )
+        if not self.profile is None:
+            self.profile.disable()
+            Profiler.active = False
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profile, stream=stream)
+            stats.sort_stats("cumulative").print_stats(self.limit)
+            data["cprofile"] = stream.getvalue()
+            self.profile = None
+        return data
+
+
+class Profiler:
+    """
+    Opt-in profiler of the validations, either requested per validation
+    or sampled at the configured rate, whose profiles are attached to
+    the validation results or written (as JSON) to a local directory.
+
+    When disabled (not requested and no sampling) the only overhead is
+    the check of the request flag.
+
+    :param sample: The rate (0.0 to 1.0) of the validations profiled
+    without being requested.
+    :param mode: The mode of the profiles, either `trace` (the spans of
+    the phases) or `cprofile` (the trace and the cProfile statistics).
+    :param path: The directory where the profiles are written, if not
+    set the profiles are attached to the results.
+    :param limit: The number of functions in the cProfile statistics.
+    """
+
+    active = False
+    """ If a cProfile profile is running, as only one can run at a time """
+
+    def __init__(
+        self,
+        sample: float = 0.0,
+        mode: ProfileMode = "trace",
+        path: str | None = None,
+        limit: int = 25,
+    ) -> None:
+        self.sample = sample
+        self.mode: ProfileMode = mode
+        self.path = path
+        self.limit = limit
+
+    def start(self, profile: bool | None = None) -> Profile | None:
+        """
+        Starts the profile of a validation if it has been requested or,
+        when not explicitly set, if the validation is sampled.
+
+        :param profile: If the validation should be profiled, if not set
+        the validation is sampled at the configured rate.
+        :return: The started profile, None if not profiled.
+        """
+
+        if profile is None:
+            profile = self.sample > 0.0 and random.random() < self.sample
+        if not profile:
+            return None
+        return Profile(mode=self.mode, limit=self.limit)
+
+    def finish(self, profile: Profile, name: str) -> dict[str, Any]:
+        """
+        Finishes the provided profile, writing it to the profiles
+        directory (if configured).
+
+        :param profile: The profile to be finished.
+        :param name: The name of the profiled operation (eg: the address).
+        :return: The profile data to be attached to the result, only
+        the path of the file if it has been written.
+        """
+
+        data = dict(name=name, timestamp=time(), **profile.finish())
+        if not self.path:
+            return data
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(
+            self.path, f"{int(data['timestamp'] * 1000)}-{uuid4().hex[:8]}.json"
+        )
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(dumps(data))
+        return dict(path=path)
@@ -0,0 +1,182 @@
+import os
+
+from json import loads
+from collections import deque
+from typing import Any, Iterable
+
+Rules = dict[str, dict[str, list[str]]]
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "providers.json")
+
+
+class SuffixTrie:
+    """
+    Trie of domain suffixes indexed by their reversed labels, so that
+    the most specific suffix of a host name is found with a single walk
+    over its labels (from the TLD down), regardless of the number of
+    suffixes in the trie.
+    """
+
+    def __init__(self) -> None:
+        self._root: dict[str, Any] = {}
+
+    def add(self, suffix: str, value: str):
+        node = self._root
+        for label in reversed(suffix.strip(".").lower().split(".")):
+            node = node.setdefault(label, {})
+        # the empty label can't be part of a host name so it's safe
+        # to use it as the key of the value of the node
+        node[""] = value
+
+    def find(self, host: str) -> str | None:
+        node = self._root
+        value = None
+        for label in reversed(host.strip(".").lower().split(".")):
+            child = node.get(label, None)
+            if child is None:
+                break
+            node = child
+            value = node.get("", value)
+        return value
+
+
+class AhoCorasick:
+    """
+    Aho–Corasick automaton matching a set of patterns in a text with
+    a single pass over it, no matter the number of patterns.
+
+    Patterns are matched case insensitively and the value of the first
+    pattern to end in the text is returned (the longest one when more
+    than a single pattern ends at the same position).
+
+    The failure links are resolved at build time into a (complete)
+    transition table, so that each char of the text costs a single
+    dictionary lookup.
+    """
+
+    def __init__(self, patterns: Iterable[tuple[str, str]] = ()) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[str | None] = [None]
+        self._delta: list[dict[str, int]] = []
+        for pattern, value in patterns:
+            self._add(pattern.lower(), value)
+        self._build()
+
+    def search(self, text: str) -> str | None:
+        delta, output = self._delta, self._output
+        state = 0
+        for char in text.lower():
+            state = delta[state].get(char, 0)
+            if not output[state] is None:
+                return output[state]
+        return None
+
+    def _add(self, pattern: str, value: str):
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            target = self._goto[state].get(char, None)
+            if target is None:
+                target = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+                self._goto[state][char] = target
+            state = target
+        if self._output[state] is None:
+            self._output[state] = value
+
+    def _build(self):
+        # computes the failure links in breadth first order, so that the
+        # link of each state points to its longest proper suffix that is
+        # also a prefix of a pattern, inheriting its output when unset,
+        # and the transitions of each state as the ones of its failure
+        # state overridden by its own
+        self._delta = [{} for _ in self._goto]
+        self._delta[0] = dict(self._goto[0])
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            self._delta[state] = dict(
+                self._delta[self._fail[state]], **self._goto[state]
+            )
+            for char, target in self._goto[state].items():
+                queue.append(target)
+                self._fail[target] = self._delta[self._fail[state]].get(char, 0)
+                if self._output[target] is None:
+                    self._output[target] = self._output[self._fail[target]]
+
+
+class ProviderIndex:
+    """
+    Index that classifies the e-mail provider of an MX server from the
+    rules of each provider, the MX host name suffixes (matched with a
+    suffix trie) and the banner or response message fragments (matched
+    with an Aho–Corasick automaton).
+
+    The classification of each MX host is memoized, as the same hosts
+    are looked up again and again by the validations.
+
+    :param rules: The map of provider names to their `mx` suffixes
+    and `banners` fragments.
+    :param memo_size: The maximum number of memoized MX hosts.
+    """
+
+    def __init__(self, rules: Rules, memo_size: int = 65536) -> None:
+        self.rules = rules
+        self.memo_size = memo_size
+        self._trie = SuffixTrie()
+        for provider, rule in rules.items():
+            for suffix in rule.get("mx", []):
+                self._trie.add(suffix, provider)
+        self._automaton = AhoCorasick(
+            (banner, provider)
+            for provider, rule in rules.items()
+            for banner in rule.get("banners", [])
+        )
+        self._memo: dict[str, str | None] = {}
+
+    def classify(self, mx_server: str | None = None, message: str | None = None) -> str:
+        """
+        Classifies the provider from the MX server host name and, when
+        that is not conclusive, from the banner or response message.
+
+        :param mx_server: The host name of the MX server.
+        :param message: The banner or response message of the server.
+        :return: The name of the provider, `unknown` when no rule matches.
+        """
+
+        if mx_server:
+            try:
+                provider = self._memo[mx_server]
+            except KeyError:
+                provider = self._trie.find(mx_server)
+                if len(self._memo) >= self.memo_size:
+                    self._memo.clear()
+                self._memo[mx_server] = provider
+            if provider:
+                return provider
+        if message:
+            provider = self._automaton.search(message)
+            if provider:
+                return provider
+        return "unknown"
+
+    @classmethod
+    def load(cls, *paths: str) -> "ProviderIndex":
+        """
+        Loads the index from the provided JSON rules files, the rules of
+        a provider in a later file replacing the ones of earlier files.
+
+        :param paths: The paths of the rules files, defaulting to the
+        rules bundled with the package.
+        :return: The loaded provider index.
+        """
+
+        rules: Rules = {}
+        for path in paths or (RULES_PATH,):
+            with open(path, "rb") as file:
+                rules.update(loads(file.read()))
+        return cls(rules)
@@ -0,0 +1,95 @@
+import asyncio
+
+from typing import Any, Callable
+from weakref import WeakKeyDictionary
+from aiodns import DNSResolver
+from aiodns.error import ARES_ENODATA, ARES_ENOTFOUND, DNSError
+
+
+class MXResolver:
+    """
+    Resolver of the MX servers of a domain, sharing a single (long
+    lived) DNS resolver per event loop and computing the cache TTL
+    of each answer from the TTL of its records.
+
+    Domains that do not exist or that have no MX records are given
+    the negative TTL, unless an implicit MX (the domain itself, as
+    defined in RFC 5321) can be used because it has an A or AAAA record.
+
+    :param min_ttl: The minimum TTL (floor) of a positive answer.
+    :param max_ttl: The maximum TTL (cap) of a positive answer.
+    :param negative_ttl: The TTL of negative answers (no MX servers).
+    :param implicit_mx: If the A/AAAA implicit MX fallback should be used.
+    :param factory: The factory of DNS resolvers, called once per loop.
+    """
+
+    def __init__(
+        self,
+        min_ttl: float = 60.0,
+        max_ttl: float = 86400.0,
+        negative_ttl: float = 300.0,
+        implicit_mx: bool = True,
+        factory: Callable[[], Any] = DNSResolver,
+    ) -> None:
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.implicit_mx = implicit_mx
+        self.factory = factory
+        self._resolvers: WeakKeyDictionary[asyncio.AbstractEventLoop, Any] = (
+            WeakKeyDictionary()
+        )
+
+    @property
+    def resolver(self) -> Any:
+        loop = asyncio.get_running_loop()
+        resolver = self._resolvers.get(loop, None)
+        if resolver is None:
+            resolver = self.factory()
+            self._resolvers[loop] = resolver
+        return resolver
+
+    async def resolve(self, domain: str) -> tuple[list[str], float]:
+        """
+        Resolves the MX servers of the provided domain, sorted by their
+        preference (lowest priority value first).
+
+        :param domain: The domain to resolve the MX servers for.
+        :return: The tuple with the sorted list of MX servers and the
+        TTL (in seconds) for which the answer can be cached.
+        :raises DNSError: In case of a transient DNS failure (eg: timeout),
+        for which the answer should not be cached.
+        """
+
+        try:
+            records = await self.resolver.query(domain, "MX")
+        except DNSError as exception:
+            code = exception.args[0] if exception.args else None
+            if code == ARES_ENODATA and self.implicit_mx:
+                return await self._resolve_implicit(domain)
+            if code in (ARES_ENODATA, ARES_ENOTFOUND):
+                return [], self.negative_ttl
+            raise
+
+        records = sorted(records, key=lambda record: (record.priority, record.host))
+
+        # a "null MX" (RFC 7505) means that the domain explicitly does
+        # not accept any e-mail, so it's handled as a negative answer
+        mx_servers = [str(record.host) for record in records if record.host]
+        if not mx_servers or mx_servers == ["."]:
+            return [], self.negative_ttl
+
+        return mx_servers, self._ttl(min(record.ttl for record in records))
+
+    async def _resolve_implicit(self, domain: str) -> tuple[list[str], float]:
+        for qtype in ("A", "AAAA"):
+            try:
+                records = await self.resolver.query(domain, qtype)
+            except DNSError:
+                continue
+            if records:
+                return [domain], self._ttl(min(record.ttl for record in records))
+        return [], self.negative_ttl
+
+    def _ttl(self, ttl: float) -> float:
+        return min(max(ttl, self.min_ttl), self.max_ttl)
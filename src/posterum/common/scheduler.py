@@ -0,0 +1,287 @@
+import asyncio
+
+from time import monotonic
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Literal, NamedTuple
+
+from .cache import Cache
+from .timeouts import Deadline
+
+BreakerState = Literal["closed", "open", "half-open"]
+
+Limits = NamedTuple(
+    "Limits", [("concurrency", int), ("rate", float | None), ("burst", int)]
+)
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter, waiters are served in FIFO order so that
+    no caller is starved by the ones arriving after it.
+
+    :param rate: The number of tokens added per second.
+    :param burst: The maximum number of tokens in the bucket.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1.0:
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1.0
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(
+            self._tokens + (now - self._updated) * self.rate, float(self.burst)
+        )
+        self._updated = now
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker that opens once the error rate over a sliding time
+    window exceeds a threshold, re-trying (half-open) a single call
+    after an exponentially growing backoff period.
+
+    :param window: The duration (in seconds) of the sliding window.
+    :param threshold: The error rate (0.0 to 1.0) that opens the circuit.
+    :param min_calls: The minimum number of calls in the window required
+    before the error rate is considered.
+    :param backoff: The initial (open) backoff period in seconds.
+    :param max_backoff: The maximum backoff period in seconds.
+    """
+
+    def __init__(
+        self,
+        window: float = 60.0,
+        threshold: float = 0.5,
+        min_calls: int = 5,
+        backoff: float = 30.0,
+        max_backoff: float = 3600.0,
+    ) -> None:
+        self.window = window
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.state: BreakerState = "closed"
+        self.opens = 0
+        self._calls: deque[tuple[float, bool]] = deque()
+        self._failures = 0
+        self._backoff = backoff
+        self._retry_at = 0.0
+        self._probe_at: float | None = None
+
+    def allow(self) -> bool:
+        """
+        Checks if a call is currently allowed, in the half-open state
+        only a single (probe) call is allowed at a time.
+
+        :return: If the call is allowed.
+        """
+
+        if self.state == "closed":
+            return True
+        now = monotonic()
+        if self.state == "open":
+            if now < self._retry_at:
+                return False
+            self.state = "half-open"
+
+        # a probe call whose outcome was never recorded is considered
+        # lost after a window, so that a new probe may be tried
+        if not self._probe_at is None and now < self._probe_at + self.window:
+            return False
+        self._probe_at = now
+        return True
+
+    def record(self, success: bool):
+        now = monotonic()
+
+        if self.state == "half-open":
+            self._probe_at = None
+            if success:
+                self._close()
+            else:
+                self._open(now, self._backoff * 2.0)
+            return
+
+        self._calls.append((now, success))
+        if not success:
+            self._failures += 1
+        while self._calls and self._calls[0][0] < now - self.window:
+            _, _success = self._calls.popleft()
+            if not _success:
+                self._failures -= 1
+
+        if (
+            self.state == "closed"
+            and len(self._calls) >= self.min_calls
+            and self._failures / len(self._calls) >= self.threshold
+        ):
+            self._open(now, self.backoff)
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open" and monotonic() < self._retry_at
+
+    @property
+    def retry_after(self) -> float:
+        return max(self._retry_at - monotonic(), 0.0)
+
+    def _open(self, now: float, backoff: float):
+        self.state = "open"
+        self.opens += 1
+        self._backoff = min(backoff, self.max_backoff)
+        self._retry_at = now + self._backoff
+
+    def _close(self):
+        self.state = "closed"
+        self._backoff = self.backoff
+        self._calls.clear()
+        self._failures = 0
+
+
+class MXScheduler:
+    """
+    Scheduler of the SMTP work per MX server, capping the number of
+    concurrent sessions and the rate at which they're started, with
+    limits that can be overridden per e-mail provider, and keeping a
+    circuit breaker per MX server.
+
+    :param limits: The default limits for every MX server.
+    :param overrides: The limits per provider (eg: google, microsoft).
+    :param window: The sliding window of the circuit breakers.
+    :param threshold: The error rate threshold of the circuit breakers.
+    :param min_calls: The minimum calls before the circuit breakers open.
+    :param backoff: The initial backoff of the circuit breakers.
+    :param max_backoff: The maximum backoff of the circuit breakers.
+    :param shared: The cache (shared among processes) where the open
+    circuits are published, so that they're respected by every process.
+    """
+
+    def __init__(
+        self,
+        limits: Limits = Limits(8, None, 1),
+        overrides: dict[str, Limits] | None = None,
+        window: float = 60.0,
+        threshold: float = 0.5,
+        min_calls: int = 5,
+        backoff: float = 30.0,
+        max_backoff: float = 3600.0,
+        shared: Cache | None = None,
+    ) -> None:
+        self.limits = limits
+        self.overrides = overrides or {}
+        self.window = window
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.shared = shared
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        mx_server: str,
+        provider: str | None = None,
+        deadline: Deadline | None = None,
+    ) -> AsyncIterator[None]:
+        """
+        Waits (in FIFO order) for a free slot to run SMTP work against
+        the provided MX server, respecting its concurrency and rate limits.
+
+        :param mx_server: The MX server to run the work against.
+        :param provider: The provider of the MX server, used to select
+        the limits from the overrides.
+        :param deadline: The deadline of the work, the wait for the slot
+        is given up (with a timeout error) once it's reached.
+        """
+
+        self._ensure_loop()
+        limits = self.limits_for(provider)
+        semaphore = self._semaphores.get(mx_server, None)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(limits.concurrency)
+            self._semaphores[mx_server] = semaphore
+        if deadline is None:
+            await semaphore.acquire()
+        else:
+            await deadline.wait_for(semaphore.acquire())
+        try:
+            if limits.rate:
+                bucket = self._buckets.get(mx_server, None)
+                if bucket is None:
+                    bucket = TokenBucket(limits.rate, burst=limits.burst)
+                    self._buckets[mx_server] = bucket
+                if deadline is None:
+                    await bucket.acquire()
+                else:
+                    await deadline.wait_for(bucket.acquire())
+            yield
+        finally:
+            semaphore.release()
+
+    def limits_for(self, provider: str | None = None) -> Limits:
+        return self.overrides.get(provider or "", self.limits)
+
+    def breaker(self, mx_server: str) -> CircuitBreaker:
+        breaker = self._breakers.get(mx_server, None)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                window=self.window,
+                threshold=self.threshold,
+                min_calls=self.min_calls,
+                backoff=self.backoff,
+                max_backoff=self.max_backoff,
+            )
+            self._breakers[mx_server] = breaker
+        return breaker
+
+    def allow(self, mx_server: str) -> bool:
+        breaker = self.breaker(mx_server)
+        if breaker.state == "closed" and self._shared_open(mx_server):
+            return False
+        return breaker.allow()
+
+    def is_open(self, mx_server: str) -> bool:
+        breaker = self._breakers.get(mx_server, None)
+        if breaker and breaker.is_open:
+            return True
+        return self._shared_open(mx_server)
+
+    def record(self, mx_server: str, success: bool):
+        breaker = self.breaker(mx_server)
+        opens = breaker.opens
+        breaker.record(success)
+        if not self.shared is None and breaker.opens > opens:
+            self.shared.set(mx_server, True, ttl=breaker.retry_after)
+
+    @property
+    def breakers(self) -> dict[str, CircuitBreaker]:
+        return self._breakers
+
+    def _shared_open(self, mx_server: str) -> bool:
+        return False if self.shared is None else self.shared.contains(mx_server)
+
+    def _ensure_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        self._semaphores.clear()
+        self._buckets.clear()
+        self._loop = loop
@@ -1,39 +1,647 @@
-import appier
+import asyncio
 
-from time import time
-from typing import Literal, cast
-from aiodns import DNSResolver
-from aiosmtplib import SMTP, SMTPConnectTimeoutError, SMTPResponseException
+from json import JSONEncoder, loads
+from contextlib import nullcontext
+from time import monotonic, time
+from typing import Any, Awaitable, Callable, Hashable, Literal, Sequence, cast
+from aiosmtplib import (
+    SMTP,
+    SMTPConnectError,
+    SMTPConnectTimeoutError,
+    SMTPRecipientRefused,
+    SMTPResponseException,
+    SMTPSenderRefused,
+    SMTPTimeoutError,
+)
+from aiosmtplib.email import quote_address
 from aiodns.error import DNSError
 
-from .cache import MemoryCache
+from .admission import AdmissionController, Priority, PRIORITIES
+from .cache import (
+    Cache,
+    CacheItem,
+    CacheSnapshots,
+    MemoryCache,
+    SharedCache,
+    TieredCache,
+    build_cache,
+)
+from .config import conf
+from .errors import OverloadedError
+from .pool import PooledSMTP, SMTPPool
+from .flight import SingleFlight
+from .metrics import METRICS, Sample
+from .profiling import Profiler, Timings
+from .providers import RULES_PATH, ProviderIndex
+from .syntax import DISPOSABLE_PATH, Address, AddressError, AddressParser
+from .resolver import MXResolver
+from .scheduler import Limits, MXScheduler
+from .timeouts import Deadline, LatencyEstimator
+from .verdicts import Verdict, VerdictStore
 
-MX_CACHE: dict[str, list[str]] = {}
+CACHE_BACKEND = cast(str, conf("CACHE_BACKEND", "memory"))
 
-RESULT_CACHE = MemoryCache()
+CACHE_MAX_SIZE = cast(int, conf("CACHE_MAX_SIZE", 1000000, cast=int))
 
-CATCH_ALL_CACHE = MemoryCache()
+CACHE_ADMISSION = cast(bool, conf("CACHE_ADMISSION", False, cast=bool))
 
-BLACKLISTED = MemoryCache()
+REDIS_URL = cast(str, conf("REDIS_URL", "redis://localhost:6379"))
 
-Status = Literal["deliverable", "undeliverable", "risky", "unknown", "unavailable"]
+CACHE_SHARED_PATH = cast(str | None, conf("CACHE_SHARED_PATH", None))
+
+CACHE_SHARED_SLOTS = cast(int, conf("CACHE_SHARED_SLOTS", 65536, cast=int))
+
+CACHE_SHARED_SLOT_SIZE = cast(int, conf("CACHE_SHARED_SLOT_SIZE", 512, cast=int))
+
+MX_CACHE = build_cache(
+    "mx",
+    backend=cast(Any, CACHE_BACKEND),
+    url=REDIS_URL,
+    max_size=CACHE_MAX_SIZE,
+    admission=CACHE_ADMISSION,
+    path=CACHE_SHARED_PATH,
+    slots=CACHE_SHARED_SLOTS,
+    slot_size=CACHE_SHARED_SLOT_SIZE,
+)
+
+RESULT_CACHE = build_cache(
+    "results",
+    backend=cast(Any, CACHE_BACKEND),
+    url=REDIS_URL,
+    max_size=CACHE_MAX_SIZE,
+    admission=CACHE_ADMISSION,
+    path=CACHE_SHARED_PATH,
+    slots=CACHE_SHARED_SLOTS,
+    slot_size=CACHE_SHARED_SLOT_SIZE,
+    encoder=lambda record: record.encode(),
+    decoder=lambda data: ResultRecord.decode(data),
+)
+
+VERDICT_CACHE = build_cache(
+    "verdicts",
+    backend=cast(Any, CACHE_BACKEND),
+    url=REDIS_URL,
+    max_size=CACHE_MAX_SIZE,
+    admission=CACHE_ADMISSION,
+    path=CACHE_SHARED_PATH,
+    slots=CACHE_SHARED_SLOTS,
+    slot_size=CACHE_SHARED_SLOT_SIZE,
+    encoder=Verdict.encode,
+    decoder=Verdict.decode,
+)
+
+# the verdicts on each domain (catch-all, reject-all, VRFY support and
+# tarpitting) let the domains whose answer is already known skip the
+# SMTP dialogue, with the verdicts older than the refresh interval
+# being probed again in the background
+VERDICTS = VerdictStore(
+    VERDICT_CACHE,
+    ttl=cast(float, conf("SMTP_VERDICT_TTL", 86400.0, cast=float)),
+    refresh=cast(float, conf("SMTP_VERDICT_REFRESH", 3600.0, cast=float)),
+)
+
+# the MX servers that refuse VRFY (never answering for the mailbox
+# itself) are remembered, so that the command is no longer sent to them
+VRFY_CACHE = build_cache(
+    "vrfy",
+    backend=cast(Any, CACHE_BACKEND),
+    url=REDIS_URL,
+    max_size=CACHE_MAX_SIZE,
+    admission=CACHE_ADMISSION,
+    path=CACHE_SHARED_PATH,
+    slots=4096,
+    slot_size=256,
+)
+
+VRFY_TTL = cast(float, conf("SMTP_VRFY_TTL", 86400.0, cast=float))
+
+# the TTL of each cached result depends on its status, with transient
+# failures expiring fast and hard bounces being kept for long, and may
+# be overridden per provider (for every status or per status)
+CACHE_TTL_STATUS = cast(
+    dict[str, float],
+    conf(
+        "CACHE_TTL_STATUS",
+        dict(undeliverable=86400.0, unknown=300.0, unavailable=60.0),
+        cast=lambda value: value if isinstance(value, dict) else loads(value),
+    ),
+)
+
+CACHE_TTL_PROVIDER = cast(
+    dict[str, float | dict[str, float]],
+    conf(
+        "CACHE_TTL_PROVIDER",
+        dict(),
+        cast=lambda value: value if isinstance(value, dict) else loads(value),
+    ),
+)
+
+# the expired results are kept (and served as stale) for this grace
+# period while being revalidated in the background, with at most
+# the refresh limit of revalidations running at the same time
+CACHE_STALE = cast(float, conf("CACHE_STALE", 0.0, cast=float))
+
+CACHE_REFRESH_LIMIT = cast(int, conf("CACHE_REFRESH_LIMIT", 16, cast=int))
+
+CACHE_SNAPSHOTS = CacheSnapshots(
+    cast(str | None, conf("CACHE_SNAPSHOT", None)),
+    interval=cast(float, conf("CACHE_SNAPSHOT_INTERVAL", 300.0, cast=float)),
+)
+CACHE_SNAPSHOTS.add("mx", MX_CACHE)
+CACHE_SNAPSHOTS.add(
+    "results",
+    RESULT_CACHE,
+    encoder=lambda record: record.encode(),
+    decoder=lambda data: ResultRecord.decode(data),
+)
+CACHE_SNAPSHOTS.add(
+    "verdicts",
+    VERDICT_CACHE,
+    encoder=Verdict.encode,
+    decoder=Verdict.decode,
+)
+CACHE_SNAPSHOTS.add("vrfy", VRFY_CACHE)
+
+# the provider rules bundled with the package may be extended (or
+# overridden per provider) with the ones of the configured files
+PROVIDER_INDEX = ProviderIndex.load(
+    RULES_PATH,
+    *cast(
+        list[str],
+        conf(
+            "PROVIDER_RULES",
+            [],
+            cast=lambda value: value if isinstance(value, list) else value.split(","),
+        ),
+    ),
+)
+
+# the addresses are parsed (and normalized) before any network work,
+# rejecting the invalid ones and the ones of disposable domains, that
+# may be extended with the ones of the configured files
+ADDRESS_PARSER = AddressParser.load(
+    DISPOSABLE_PATH,
+    *cast(
+        list[str],
+        conf(
+            "DISPOSABLE_DOMAINS",
+            [],
+            cast=lambda value: value if isinstance(value, list) else value.split(","),
+        ),
+    ),
+)
+
+MX_SCHEDULER = MXScheduler(
+    limits=Limits(
+        cast(int, conf("MX_CONCURRENCY", 8, cast=int)),
+        cast(float | None, conf("MX_RATE", None, cast=float)),
+        cast(int, conf("MX_BURST", 1, cast=int)),
+    ),
+    overrides=dict(
+        (provider, Limits(*limits))
+        for provider, limits in cast(
+            dict[str, list[Any]],
+            conf(
+                "MX_PROVIDER_LIMITS",
+                dict(google=[32, None, 1], microsoft=[16, None, 1]),
+                cast=lambda value: value if isinstance(value, dict) else loads(value),
+            ),
+        ).items()
+    ),
+    window=cast(float, conf("MX_BREAKER_WINDOW", 60.0, cast=float)),
+    threshold=cast(float, conf("MX_BREAKER_THRESHOLD", 0.5, cast=float)),
+    min_calls=cast(int, conf("MX_BREAKER_CALLS", 5, cast=int)),
+    backoff=cast(float, conf("MX_BREAKER_BACKOFF", 30.0, cast=float)),
+    max_backoff=cast(float, conf("MX_BREAKER_BACKOFF_MAX", 3600.0, cast=float)),
+    # with the shared backend the open circuits are shared among the
+    # worker processes so that a failing MX server is avoided by all
+    shared=(
+        build_cache(
+            "breakers",
+            backend="shared",
+            path=CACHE_SHARED_PATH,
+            slots=4096,
+            slot_size=256,
+        )
+        if CACHE_BACKEND == "shared"
+        else None
+    ),
+)
+
+MX_RESOLVER = MXResolver(
+    min_ttl=cast(float, conf("MX_CACHE_TTL_MIN", 60.0, cast=float)),
+    max_ttl=cast(float, conf("MX_CACHE_TTL", 3600.0, cast=float)),
+    negative_ttl=cast(float, conf("MX_CACHE_TTL_NEGATIVE", 300.0, cast=float)),
+)
+
+# the connect and command timeouts of each MX server are adapted to
+# its (rolling) latency, so that a tarpitting server is given up on
+# long before the (fixed) SMTP timeout is reached
+SMTP_LATENCY = (
+    LatencyEstimator(
+        deviations=cast(float, conf("SMTP_TIMEOUT_DEVIATIONS", 4.0, cast=float)),
+        min_timeout=cast(float, conf("SMTP_TIMEOUT_MIN", 1.0, cast=float)),
+    )
+    if cast(bool, conf("SMTP_TIMEOUT_ADAPTIVE", True, cast=bool))
+    else None
+)
+
+# the configuration of the validations is resolved once (at import)
+# instead of on every validation
+SMTP_SENDER = cast(str, conf("SMTP_SENDER", "noreply@bemisc.com"))
+
+SMTP_HOST = cast(str, conf("SMTP_HOST", "localhost"))
+
+SMTP_TIMEOUT = cast(float, conf("SMTP_TIMEOUT", 10.0, cast=float))
+
+SMTP_FAILOVER = cast(int, conf("SMTP_FAILOVER", 3, cast=int))
+
+SMTP_HEDGE_DELAY = cast(float | None, conf("SMTP_HEDGE_DELAY", None, cast=float))
+
+SMTP_DEADLINE = cast(float | None, conf("SMTP_DEADLINE", 20.0, cast=float))
+
+SMTP_BATCH_SIZE = cast(int, conf("SMTP_BATCH_SIZE", 50, cast=int))
+
+CACHE = cast(bool, conf("CACHE", True, cast=bool))
+
+CACHE_TTL = cast(float, conf("CACHE_TTL", 3600.0, cast=float))
+
+# when advertised by the MX server (RFC 2920) the MAIL FROM and RCPT TO
+# commands are pipelined, costing a single round-trip
+SMTP_PIPELINING = cast(bool, conf("SMTP_PIPELINING", True, cast=bool))
+
+
+def _observe_phase(mx_server: str, phase: str, elapsed: float):
+    # the histogram is only defined (with the other metrics) further down
+    # in the module, being resolved at call time
+    VALIDATION_TIME.observe(
+        elapsed, phase, PROVIDER_INDEX.classify(mx_server=mx_server), mx_server
+    )
+
+
+def _pool_size(mx_server: str) -> int:
+    # the sessions of each MX server are capped by the concurrency of
+    # its (per provider) scheduler limits, the single concurrency limit
+    provider = PROVIDER_INDEX.classify(mx_server=mx_server)
+    return MX_SCHEDULER.limits_for(provider).concurrency
+
+
+SMTP_POOL = SMTPPool(
+    sizes=_pool_size,
+    idle_timeout=cast(float, conf("SMTP_POOL_IDLE", 30.0, cast=float)),
+    max_commands=cast(int, conf("SMTP_POOL_COMMANDS", 100, cast=int)),
+    port=cast(int, conf("SMTP_PORT", 25, cast=int)),
+    latencies=SMTP_LATENCY,
+    observe=_observe_phase,
+)
+
+# the validations that require SMTP work are admitted by priority, with
+# at most ADMISSION_LIMIT of them in flight and the ones that would wait
+# for longer than ADMISSION_WAIT being shed
+ADMISSION = AdmissionController(
+    limit=cast(int, conf("ADMISSION_LIMIT", 256, cast=int)),
+    max_wait=cast(float, conf("ADMISSION_WAIT", 5.0, cast=float)),
+)
+
+# the validations may be profiled (per request or sampled) with the
+# trace of their phases and optionally the cProfile statistics
+PROFILER = Profiler(
+    sample=cast(float, conf("PROFILE_SAMPLE", 0.0, cast=float)),
+    mode=cast(Any, conf("PROFILE_MODE", "trace")),
+    path=cast(str | None, conf("PROFILE_PATH", None)),
+    limit=cast(int, conf("PROFILE_LIMIT", 25, cast=int)),
+)
+
+VALIDATION_FLIGHT: SingleFlight["ValidationResult"] = SingleFlight()
+
+CATCH_ALL_FLIGHT: SingleFlight[bool] = SingleFlight()
+
+MX_FLIGHT: SingleFlight[list[str]] = SingleFlight()
+
+REFRESHES: dict[Hashable, "asyncio.Future[Any]"] = dict()
+
+CACHES: dict[str, Cache] = dict(
+    results=RESULT_CACHE, verdicts=VERDICT_CACHE, mx=MX_CACHE, vrfy=VRFY_CACHE
+)
+
+BREAKER_STATES = {"closed": 0.0, "half-open": 1.0, "open": 2.0}
+
+
+def result_ttl(record: "ResultRecord", ttl: float = 3600.0) -> float:
+    """
+    Resolves the TTL of the provided result record, from the most to
+    the least specific, the one of the provider and status, the one
+    of the provider, the one of the status or the default one.
+
+    :param record: The result record to be cached.
+    :param ttl: The default TTL (in seconds).
+    :return: The TTL (in seconds) of the result record.
+    """
+
+    rule = CACHE_TTL_PROVIDER.get(record.provider or "", None)
+    if isinstance(rule, dict):
+        rule = rule.get(record.status, None)
+    if not rule is None:
+        return float(rule)
+    return float(CACHE_TTL_STATUS.get(record.status, ttl))
+
+
+def _local_caches() -> list[tuple[str, MemoryCache | SharedCache]]:
+    # only the in-process (or shared memory) caches have a known size
+    # and evictions, the Redis ones are accounted for by Redis itself
+    caches: list[tuple[str, MemoryCache | SharedCache]] = []
+    for name, cache in CACHES.items():
+        if isinstance(cache, TieredCache):
+            cache = cache.local
+        if isinstance(cache, (MemoryCache, SharedCache)):
+            caches.append((name, cache))
+    return caches
+
+
+def _breakers() -> list[Sample]:
+    return [
+        ((mx_server,), BREAKER_STATES[breaker.state])
+        for mx_server, breaker in list(MX_SCHEDULER.breakers.items())
+    ]
+
+
+VALIDATIONS = METRICS.counter(
+    "posterum_validations_total",
+    "Number of validations by status, SMTP code, provider and cache use",
+    labels=("status", "code", "provider", "cached"),
+)
+
+VALIDATION_TIME = METRICS.histogram(
+    "posterum_validation_duration_seconds",
+    "Duration of the validation phases (dns, smtp, catch_all, total and the "
+    "SMTP phases: queue, connect, banner, ehlo, rset, vrfy, mail, rcpt and quit)",
+    labels=("phase", "provider", "mx_server"),
+)
+
+CACHE_REQUESTS = METRICS.counter(
+    "posterum_cache_requests_total",
+    "Number of cache lookups by cache and result (hit, stale or miss)",
+    labels=("cache", "result"),
+)
+
+CACHE_EVICTIONS = METRICS.counter(
+    "posterum_cache_evictions_total",
+    "Number of entries evicted from the in-process caches",
+    labels=("cache",),
+    collect=lambda: [((name,), cache.evictions) for name, cache in _local_caches()],
+)
+
+CACHE_SIZE = METRICS.gauge(
+    "posterum_cache_size",
+    "Number of entries in the in-process caches",
+    labels=("cache",),
+    collect=lambda: [((name,), len(cache)) for name, cache in _local_caches()],
+)
+
+BREAKER_STATE = METRICS.gauge(
+    "posterum_breaker_state",
+    "State of the MX server circuit breakers (0 closed, 1 half-open, 2 open)",
+    labels=("mx_server",),
+    collect=_breakers,
+)
+
+BREAKER_OPENS = METRICS.counter(
+    "posterum_breaker_opens_total",
+    "Number of times the MX server circuit breakers opened",
+    labels=("mx_server",),
+    collect=lambda: [
+        ((mx_server,), breaker.opens)
+        for mx_server, breaker in list(MX_SCHEDULER.breakers.items())
+    ],
+)
+
+SMTP_SESSIONS = METRICS.gauge(
+    "posterum_smtp_sessions",
+    "Number of pooled SMTP sessions that are in use (active) or idle",
+    labels=("state",),
+    collect=lambda: [(("active",), SMTP_POOL.active), (("idle",), SMTP_POOL.size)],
+)
+
+IN_FLIGHT = METRICS.gauge(
+    "posterum_in_flight",
+    "Number of (coalesced) operations in flight by kind",
+    labels=("kind",),
+    collect=lambda: [
+        (("validation",), len(VALIDATION_FLIGHT)),
+        (("catch_all",), len(CATCH_ALL_FLIGHT)),
+        (("mx",), len(MX_FLIGHT)),
+        (("admitted",), ADMISSION.active),
+    ],
+)
+
+ADMISSION_QUEUED = METRICS.gauge(
+    "posterum_admission_queued",
+    "Number of validations waiting for their admission by priority",
+    labels=("priority",),
+    collect=lambda: [((name,), ADMISSION.queued(name)) for name in PRIORITIES],
+)
+
+ADMISSION_SHED = METRICS.counter(
+    "posterum_admission_shed_total",
+    "Number of validations shed (not admitted) by priority",
+    labels=("priority",),
+    collect=lambda: [((name,), ADMISSION.sheds[name]) for name in PRIORITIES],
+)
+
+Status = Literal[
+    "deliverable",
+    "undeliverable",
+    "risky",
+    "unknown",
+    "unavailable",
+    "invalid",
+    "disposable",
+]
+
+JSON_ENCODER = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+class ResultRecord:
+    """
+    Immutable (and compact) record with the cacheable part of a
+    validation result, shared by every request that hits the cache,
+    so that the per request data is kept in `ValidationResult` views.
+
+    The static part of the JSON representation of the record is
+    encoded once (on first use) and kept as bytes in the record.
+    """
+
+    __slots__ = (
+        "result",
+        "status",
+        "message",
+        "code",
+        "exception_name",
+        "provider",
+        "mx_server",
+        "catch_all",
+        "_json",
+    )
+
+    result: bool
+    status: Status
+    message: str | None
+    code: int | None
+    exception_name: str | None
+    provider: str | None
+    mx_server: str | None
+    catch_all: bool | None
+    _json: bytes | None
+
+    def __init__(
+        self,
+        result: bool = False,
+        status: Status = "undeliverable",
+        message: str | None = None,
+        code: int | None = None,
+        exception_name: str | None = None,
+        provider: str | None = None,
+        mx_server: str | None = None,
+        catch_all: bool | None = None,
+    ):
+        setter = object.__setattr__
+        setter(self, "result", result)
+        setter(self, "status", status)
+        setter(self, "message", message)
+        setter(self, "code", code)
+        setter(self, "exception_name", exception_name)
+        setter(self, "provider", provider)
+        setter(self, "mx_server", mx_server)
+        setter(self, "catch_all", catch_all)
+        setter(self, "_json", None)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"Cannot set '{name}', result record is immutable")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"Cannot delete '{name}', result record is immutable")
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ResultRecord) and self.encode() == other.encode()
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.encode()))
+
+    def __repr__(self) -> str:
+        return f"ResultRecord({self.encode()!r})"
+
+    @property
+    def json(self) -> bytes:
+        """
+        The static part of the JSON object of the record (without the
+        enclosing braces), encoded only once per record.
+        """
+
+        if self._json is None:
+            object.__setattr__(
+                self,
+                "_json",
+                JSON_ENCODER.encode(
+                    dict(
+                        result=self.result,
+                        status=self.status,
+                        message=self.message,
+                        code=self.code,
+                        exception=self.exception_name,
+                        provider=self.provider,
+                        mx_server=self.mx_server,
+                        catch_all=self.catch_all,
+                    )
+                )[1:-1].encode("utf-8"),
+            )
+        return cast(bytes, self._json)
+
+    def encode(self) -> list[Any]:
+        """
+        Encodes the record as a compact list of JSON values, to be
+        stored in shared caches and snapshots.
+
+        :return: The compact list representation of the record.
+        """
+
+        return [
+            self.result,
+            self.status,
+            self.message,
+            self.code,
+            self.exception_name,
+            self.provider,
+            self.mx_server,
+            self.catch_all,
+        ]
+
+    @classmethod
+    def decode(cls, data: list[Any]) -> "ResultRecord":
+        return cls(*data)
+
+    def replace(self, **kwargs: Any) -> "ResultRecord":
+        """
+        Creates a copy of the record with the provided fields replaced.
+
+        :return: The new record with the replaced fields.
+        """
+
+        return ResultRecord(
+            **dict(
+                zip(
+                    (
+                        "result",
+                        "status",
+                        "message",
+                        "code",
+                        "exception_name",
+                        "provider",
+                        "mx_server",
+                        "catch_all",
+                    ),
+                    self.encode(),
+                ),
+                **kwargs,
+            )
+        )
 
 
 class ValidationResult:
-    result: bool = False
-    status: Status = "undeliverable"
-    message: str | None = None
-    code: int | None = None
-    exception: Exception | None = None
-    provider: str | None = None
-    mx_server: str | None = None
-    catch_all: bool | None = None
-    cached: bool = False
-    cache_timestamp: float | None = None
-    cache_timeout: float | None = None
-    dns_time: float | None = None
-    smtp_time: float | None = None
-    total_time: float | None = None
+    """
+    Result of the validation of an e-mail address, made of a shared
+    (immutable) record and of the per request data (timings and cache
+    information), so that cached records are never mutated.
+    """
+
+    __slots__ = (
+        "record",
+        "exception",
+        "cached",
+        "coalesced",
+        "stale",
+        "cache_timestamp",
+        "cache_timeout",
+        "dns_time",
+        "smtp_time",
+        "catch_all_time",
+        "total_time",
+        "phases",
+        "profile",
+    )
+
+    record: ResultRecord
+    exception: Exception | None
+    cached: bool
+    coalesced: bool
+    stale: bool
+    cache_timestamp: float | None
+    cache_timeout: float | None
+    dns_time: float | None
+    smtp_time: float | None
+    catch_all_time: float | None
+    total_time: float | None
+    phases: dict[str, float] | None
+    profile: dict[str, Any] | None
 
     def __init__(
         self,
@@ -42,30 +650,90 @@ class ValidationResult:
         message: str | None = None,
         code: int | None = None,
         exception: Exception | None = None,
+        exception_name: str | None = None,
         provider: str | None = None,
         mx_server: str | None = None,
         catch_all: bool | None = None,
         cached: bool = False,
+        coalesced: bool = False,
+        stale: bool = False,
         cache_timestamp: float | None = None,
         cache_timeout: float | None = None,
         dns_time: float | None = None,
         smtp_time: float | None = None,
+        catch_all_time: float | None = None,
         total_time: float | None = None,
+        phases: dict[str, float] | None = None,
+        profile: dict[str, Any] | None = None,
+        record: ResultRecord | None = None,
     ):
-        self.result = result
-        self.status = status
-        self.message = message
-        self.code = code
+        self.record = record or ResultRecord(
+            result=result,
+            status=status,
+            message=message,
+            code=code,
+            exception_name=(
+                exception.__class__.__name__ if exception else exception_name
+            ),
+            provider=provider,
+            mx_server=mx_server,
+            catch_all=catch_all,
+        )
         self.exception = exception
-        self.provider = provider
-        self.mx_server = mx_server
-        self.catch_all = catch_all
         self.cached = cached
+        self.coalesced = coalesced
+        self.stale = stale
         self.cache_timestamp = cache_timestamp
         self.cache_timeout = cache_timeout
         self.dns_time = dns_time
         self.smtp_time = smtp_time
+        self.catch_all_time = catch_all_time
         self.total_time = total_time
+        self.phases = phases
+        self.profile = profile
+
+    @classmethod
+    def view(cls, record: ResultRecord, **kwargs: Any) -> "ValidationResult":
+        """
+        Creates a (cheap) per request view of the provided record.
+
+        :param record: The shared record of the result.
+        :return: The validation result view of the record.
+        """
+
+        return cls(record=record, **kwargs)
+
+    @property
+    def result(self) -> bool:
+        return self.record.result
+
+    @property
+    def status(self) -> Status:
+        return self.record.status
+
+    @property
+    def message(self) -> str | None:
+        return self.record.message
+
+    @property
+    def code(self) -> int | None:
+        return self.record.code
+
+    @property
+    def exception_name(self) -> str | None:
+        return self.record.exception_name
+
+    @property
+    def provider(self) -> str | None:
+        return self.record.provider
+
+    @property
+    def mx_server(self) -> str | None:
+        return self.record.mx_server
+
+    @property
+    def catch_all(self) -> bool | None:
+        return self.record.catch_all
 
     def to_dict(
         self,
@@ -75,13 +743,74 @@ class ValidationResult:
             status=self.status,
             message=self.message,
             code=self.code,
-            exception=self.exception.__class__.__name__ if self.exception else None,
+            exception=self.exception_name,
             provider=self.provider,
             mx_server=self.mx_server,
             catch_all=self.catch_all,
+            **self._overlay(),
+        )
+        return data
+
+    def to_json(self, address: str | None = None) -> bytes:
+        """
+        Serializes the result as a JSON object (the same as the one of
+        `to_dict`), re-using the pre-encoded static part of the record
+        and only encoding the per request data.
+
+        :param address: The e-mail address to be included in the object.
+        :return: The UTF-8 encoded JSON object.
+        """
+
+        overlay = JSON_ENCODER.encode(self._overlay())[1:-1].encode("utf-8")
+        if address is None:
+            return b"{" + self.record.json + b"," + overlay + b"}"
+        return (
+            b'{"address":'
+            + JSON_ENCODER.encode(address).encode("utf-8")
+            + b","
+            + self.record.json
+            + b","
+            + overlay
+            + b"}"
+        )
+
+    @classmethod
+    def serialize(cls, address: str, result: "ValidationResult | None") -> bytes:
+        """
+        Serializes the result of the validation of the provided address
+        as a JSON object, taking into account that there may be no
+        result (domain without MX servers).
+
+        :param address: The e-mail address that was validated.
+        :param result: The validation result, if any.
+        :return: The UTF-8 encoded JSON object.
+        """
+
+        if result is None:
+            return b'{"address":' + JSON_ENCODER.encode(address).encode("utf-8") + b"}"
+        return result.to_json(address)
+
+    def encode(self) -> list[Any]:
+        return self.record.encode()
+
+    @classmethod
+    def decode(cls, data: list[Any]) -> "ValidationResult":
+        return cls.view(ResultRecord.decode(data))
+
+    def _overlay(self) -> dict[str, Any]:
+        data: dict[str, Any] = dict(
             cached=self.cached,
-            times=dict(dns=self.dns_time, smtp=self.smtp_time, total=self.total_time),
+            coalesced=self.coalesced,
+            times=dict(
+                dns=self.dns_time,
+                smtp=self.smtp_time,
+                catch_all=self.catch_all_time,
+                total=self.total_time,
+                **(self.phases or {}),
+            ),
         )
+        if not self.profile is None:
+            data["profile"] = self.profile
         if self.cached:
             cache_ttl = (
                 (self.cache_timeout - self.cache_timestamp)
@@ -92,6 +821,7 @@ class ValidationResult:
                 timestamp=self.cache_timestamp,
                 timeout=self.cache_timeout,
                 ttl=cache_ttl,
+                stale=self.stale,
                 age=time() - self.cache_timestamp if self.cache_timestamp else None,
             )
         return data
@@ -100,63 +830,589 @@ class ValidationResult:
 class SMTPVerifier:
     @classmethod
     async def validate_email(
-        cls, email: str, cache: bool | None = None
+        cls,
+        email: str,
+        cache: bool | None = None,
+        profile: bool | None = None,
+        priority: Priority = "interactive",
     ) -> ValidationResult | None:
-        smtp_sender = cast(str, appier.conf("SMTP_SENDER", "noreply@bemisc.com"))
-        smtp_host = cast(str, appier.conf("SMTP_HOST", "localhost"))
-        smtp_timeout = cast(float, appier.conf("SMTP_TIMEOUT", 10.0, cast=float))
-        cache = (
-            cast(bool, appier.conf("CACHE", True, cast=bool))
-            if cache == None
-            else cache
-        )
-        cache_ttl = cast(float, appier.conf("CACHE_TTL", 3600.0, cast=float))
+        smtp_sender, smtp_host, smtp_timeout = SMTP_SENDER, SMTP_HOST, SMTP_TIMEOUT
+        smtp_failover, smtp_hedge_delay = SMTP_FAILOVER, SMTP_HEDGE_DELAY
+        smtp_deadline = SMTP_DEADLINE
+        cache = CACHE if cache == None else cache
+        cache_ttl = CACHE_TTL
 
-        domain = email.split("@")[1]
+        # parses and normalizes the address, rejecting it right away
+        # (with no network work) in case it's not valid or disposable
+        try:
+            address = ADDRESS_PARSER.parse(email)
+        except AddressError as exception:
+            rejected = cls._rejected(exception)
+            cls._observe(rejected)
+            return rejected
+
+        email, domain = address.address, address.domain
+
+        # the deadline bounds the whole validation (DNS included), with
+        # every wait and SMTP operation being capped by its remaining time
+        deadline = Deadline(smtp_deadline or None)
 
         start_dns = time()
         try:
-            mx_servers = await cls._mx_records(domain)
+            mx_servers = await deadline.wait_for(cls._mx_records(domain))
+        except asyncio.TimeoutError as exception:
+            expired = cls._expired(exception, time() - start_dns)
+            cls._observe(expired)
+            return expired
         finally:
             dns_time = time() - start_dns
 
-        # @TODO: need to determine if we should validate multiple servers
         if not mx_servers:
+            cls._observe(None, dns_time=dns_time)
             return None
 
+        # the (opt-in) profile traces the phases of the validation and
+        # runs cProfile in the corresponding mode, when not explicitly
+        # requested (nor refused) the validation may be sampled
+        profiling = PROFILER.start(profile)
+
         start_smtp = time()
         try:
             mx_server = mx_servers[0]
-            key = (email, mx_server, smtp_host)
+            key = (address.key, mx_server, smtp_host)
+            validate = cls._validator(
+                email,
+                key,
+                mx_servers,
+                cache_ttl,
+                sender_email=smtp_sender,
+                hostname=smtp_host,
+                timeout=smtp_timeout,
+                attempts=smtp_failover,
+                hedge_delay=smtp_hedge_delay,
+                deadline=deadline,
+                timings=None if profiling is None else profiling.timings,
+            )
             # @TODO make this a decorator supported cache
-            if cache and key in RESULT_CACHE:
-                cache_item = RESULT_CACHE.get_item(key)
-                result = cache_item.value
-                result.cached, result.cache_timestamp, result.cache_timeout = (
-                    True,
-                    cache_item.timestamp,
-                    cache_item.timeout,
+            cache_item = RESULT_CACHE.get_items([key])[0] if cache else None
+            result = cls._cached(cache_item) if cache_item else None
+            if cache:
+                CACHE_REQUESTS.inc(
+                    "results",
+                    ("stale" if result.stale else "hit") if result else "miss",
                 )
-            else:
-                result = await cls._validate_email_mx(
-                    email,
+            if result:
+                # the stale result is returned right away while being
+                # revalidated in the background
+                if result.stale:
+                    cls._refresh(key, validate)
+            elif cache:
+                # the verdict of the domain may answer the validation
+                # right away, with no SMTP dialogue
+                result = cls._verdict(
+                    domain,
                     mx_server,
                     sender_email=smtp_sender,
                     hostname=smtp_host,
                     timeout=smtp_timeout,
                 )
-                RESULT_CACHE.set(key, result, ttl=cache_ttl)
+            if not result:
+                # the validations that require SMTP work wait for their
+                # admission (and may be shed), unless they can join the
+                # one of the same address that is already in flight
+                slot = (
+                    nullcontext()
+                    if VALIDATION_FLIGHT.in_flight(key)
+                    else ADMISSION.slot(priority, deadline=deadline)
+                )
+                # concurrent validations of the same address share the
+                # same SMTP dialogue, the ones that joined an existing
+                # flight get their own view of the result
+                async with slot:
+                    result, coalesced = await VALIDATION_FLIGHT.run(key, validate)
+                if coalesced:
+                    result = ValidationResult.view(
+                        result.record,
+                        exception=result.exception,
+                        coalesced=True,
+                        catch_all_time=result.catch_all_time,
+                        phases=result.phases,
+                    )
         finally:
             smtp_time = time() - start_smtp
+            if not profiling is None:
+                profile_data = PROFILER.finish(profiling, email)
 
         result.dns_time, result.smtp_time, result.total_time = (
             dns_time,
             smtp_time,
             dns_time + smtp_time,
         )
+        if not profiling is None:
+            result.profile = profile_data
+        cls._observe(result)
 
         return result
 
+    @classmethod
+    async def validate_emails(
+        cls,
+        emails: Sequence[str],
+        cache: bool | None = None,
+        priority: Priority = "bulk",
+        shed: bool = True,
+        deadline: Deadline | None = None,
+    ) -> list[ValidationResult | None]:
+        """
+        Validates a batch of e-mail addresses, grouping them by the
+        MX server of their domain so that a single SMTP session is
+        used to check every address handled by the same server.
+
+        :param emails: The sequence of e-mail addresses to validate.
+        :param cache: If the result cache should be used, if not set
+        the value is obtained from the configuration.
+        :param priority: The priority of the admission of each of the
+        groups of addresses that require SMTP work.
+        :param shed: If the groups may be shed under overload, with
+        their addresses being reported as unknown (with the overloaded
+        error and message), otherwise they wait for their admission.
+        :param deadline: The deadline of the batch (DNS included), capping
+        every wait and SMTP operation, if not set the one of the configured
+        SMTP deadline is used.
+        :return: The list of validation results in the same order as
+        the provided e-mail addresses, with None for the addresses
+        whose domain has no MX servers.
+        """
+
+        smtp_sender, smtp_host, smtp_timeout = SMTP_SENDER, SMTP_HOST, SMTP_TIMEOUT
+        smtp_failover, smtp_batch_size = SMTP_FAILOVER, SMTP_BATCH_SIZE
+        cache = CACHE if cache == None else cache
+        cache_ttl = CACHE_TTL
+        if deadline is None:
+            deadline = Deadline(SMTP_DEADLINE or None)
+
+        # parses every address (rejecting the invalid and disposable
+        # ones) and de-duplicates them by their canonical form, so that
+        # equivalent addresses are validated (and cached) only once
+        results: dict[str, ValidationResult] = {}
+        rejected: dict[str, ValidationResult] = {}
+        addresses: dict[str, Address] = {}
+        for email in dict.fromkeys(emails):
+            try:
+                addresses[email] = ADDRESS_PARSER.parse(email)
+            except AddressError as exception:
+                rejected[email] = cls._rejected(exception)
+        unique = dict((address.key, address) for address in addresses.values())
+
+        domains = list(dict.fromkeys(address.domain for address in unique.values()))
+
+        # the domains that are not resolved before the deadline have
+        # their addresses reported as unknown, with no SMTP work
+        expired: dict[str, asyncio.TimeoutError] = {}
+
+        async def resolve(domain: str) -> list[str]:
+            try:
+                return await cast(Deadline, deadline).wait_for(cls._mx_records(domain))
+            except asyncio.TimeoutError as exception:
+                expired[domain] = exception
+                return []
+
+        start_dns = time()
+        try:
+            mx_records = dict(
+                zip(
+                    domains,
+                    await asyncio.gather(*(resolve(domain) for domain in domains)),
+                )
+            )
+        finally:
+            dns_time = time() - start_dns
+        for key, address in unique.items():
+            if address.domain in expired:
+                results[key] = cls._expired(expired[address.domain], dns_time)
+
+        # groups the (unique) addresses that are not present in the
+        # cache by their primary MX server, so that each group can be
+        # validated using a single SMTP session, the results are kept
+        # by the canonical form of the addresses
+        groups: dict[str, list[str]] = {}
+        keys: dict[str, str] = {}
+        candidates = [
+            (key, mx_records[address.domain][0])
+            for key, address in unique.items()
+            if mx_records[address.domain]
+        ]
+        cache_items = (
+            RESULT_CACHE.get_items(
+                [(key, mx_server, smtp_host) for key, mx_server in candidates]
+            )
+            if cache
+            else [None] * len(candidates)
+        )
+        hits, stales = 0, 0
+        for (key, mx_server), cache_item in zip(candidates, cache_items):
+            if cache_item:
+                results[key] = result = cls._cached(
+                    cache_item, dns_time=dns_time, smtp_time=0.0, total_time=dns_time
+                )
+                if result.stale:
+                    stales += 1
+                    address = unique[key]
+                    cls._refresh(
+                        (key, mx_server, smtp_host),
+                        cls._validator(
+                            address.address,
+                            (key, mx_server, smtp_host),
+                            mx_records[address.domain],
+                            cache_ttl,
+                            sender_email=smtp_sender,
+                            hostname=smtp_host,
+                            timeout=smtp_timeout,
+                            attempts=smtp_failover,
+                        ),
+                    )
+                else:
+                    hits += 1
+            else:
+                verdict = (
+                    cls._verdict(
+                        unique[key].domain,
+                        mx_server,
+                        sender_email=smtp_sender,
+                        hostname=smtp_host,
+                        timeout=smtp_timeout,
+                    )
+                    if cache
+                    else None
+                )
+                if verdict:
+                    verdict.dns_time, verdict.smtp_time, verdict.total_time = (
+                        dns_time,
+                        0.0,
+                        dns_time,
+                    )
+                    results[key] = verdict
+                    continue
+                email = unique[key].address
+                keys[email] = key
+                groups.setdefault(mx_server, []).append(email)
+
+        if cache:
+            CACHE_REQUESTS.inc("results", "hit", amount=hits)
+            CACHE_REQUESTS.inc("results", "stale", amount=stales)
+            CACHE_REQUESTS.inc(
+                "results", "miss", amount=len(cache_items) - hits - stales
+            )
+
+        async def validate_group(mx_server: str, group: list[str]):
+            start_smtp = time()
+            try:
+                async with ADMISSION.slot(priority, deadline=deadline, shed=shed):
+                    group_results = await cls._validate_emails_mx(
+                        group,
+                        mx_server,
+                        sender_email=smtp_sender,
+                        hostname=smtp_host,
+                        timeout=smtp_timeout,
+                        batch_size=smtp_batch_size,
+                        deadline=deadline,
+                    )
+            except OverloadedError as exception:
+                # a shed group only fails its own addresses, reported
+                # as unknown (and not cached), the other groups of the
+                # batch being validated as usual
+                for email in group:
+                    results[keys[email]] = cls._shed_result(exception, mx_server)
+                return
+            finally:
+                smtp_time = time() - start_smtp
+            # the results are cached in bulk, one bulk per distinct TTL
+            ttls: dict[float, list[tuple[tuple[str, str, str], ResultRecord]]] = {}
+            for email, result in group_results.items():
+                ttls.setdefault(result_ttl(result.record, cache_ttl), []).append(
+                    ((keys[email], mx_server, smtp_host), result.record)
+                )
+            for ttl, items in ttls.items():
+                RESULT_CACHE.set_items(items, ttl=ttl + CACHE_STALE)
+            for email, result in group_results.items():
+                result.dns_time, result.smtp_time, result.total_time = (
+                    dns_time,
+                    smtp_time,
+                    dns_time + smtp_time,
+                )
+                results[keys[email]] = result
+
+        await asyncio.gather(
+            *(validate_group(mx_server, group) for mx_server, group in groups.items())
+        )
+
+        ordered = [
+            (
+                rejected[email]
+                if email in rejected
+                else results.get(addresses[email].key, None)
+            )
+            for email in emails
+        ]
+        for _result in ordered:
+            cls._observe(_result, dns_time=dns_time)
+
+        return ordered
+
+    @classmethod
+    def _validator(
+        cls,
+        email: str,
+        key: Hashable,
+        mx_servers: Sequence[str],
+        cache_ttl: float,
+        **kwargs: Any,
+    ) -> Callable[[], Awaitable[ValidationResult]]:
+        async def validate() -> ValidationResult:
+            result = await cls._validate_email_failover(email, mx_servers, **kwargs)
+            RESULT_CACHE.set(
+                key,
+                result.record,
+                ttl=result_ttl(result.record, cache_ttl) + CACHE_STALE,
+            )
+            return result
+
+        return validate
+
+    @classmethod
+    def _cached(cls, cache_item: CacheItem, **kwargs: Any) -> ValidationResult:
+        # the cached record is shared, so the per request data is kept
+        # in a view of the record (never mutating it), the entry lives
+        # in the cache for the stale grace period past its timeout
+        timeout = (
+            cache_item.timeout - CACHE_STALE if not cache_item.timeout is None else None
+        )
+        return ValidationResult.view(
+            cache_item.value,
+            cached=True,
+            stale=not timeout is None and timeout <= time(),
+            cache_timestamp=cache_item.timestamp,
+            cache_timeout=timeout,
+            **kwargs,
+        )
+
+    @classmethod
+    def _refresh(
+        cls,
+        key: Hashable,
+        factory: Callable[[], Awaitable[Any]],
+        flight: SingleFlight[Any] = VALIDATION_FLIGHT,
+    ) -> bool:
+        """
+        Schedules the background revalidation of a stale cached result
+        (or verdict), unless it's already being revalidated (or validated)
+        or the limit of concurrent revalidations has been reached, in
+        which case a later request will schedule it.
+
+        :param key: The cache key of the result.
+        :param factory: The callable that validates (and caches) the
+        result, run through the provided flight.
+        :param flight: The flight that coalesces the validations.
+        :return: If the revalidation has been scheduled.
+        """
+
+        if key in REFRESHES or flight.in_flight(key):
+            return False
+        if len(REFRESHES) >= CACHE_REFRESH_LIMIT:
+            return False
+
+        def done(future: "asyncio.Future[Any]"):
+            if REFRESHES.get(key, None) is future:
+                del REFRESHES[key]
+            if not future.cancelled():
+                future.exception()
+
+        future = asyncio.ensure_future(flight.run(key, factory))
+        REFRESHES[key] = future
+        future.add_done_callback(done)
+        return True
+
+    @classmethod
+    def _verdict(
+        cls, domain: str, mx_server: str, **kwargs: Any
+    ) -> ValidationResult | None:
+        """
+        Answers the validation of an address of the provided domain from
+        its verdict, without any SMTP work, when the domain is known to
+        accept any recipient (risky) or to refuse every one (unknown).
+
+        The verdicts that are due to be refreshed are probed again in
+        the background, the probe being shared with the catch-all ones.
+
+        :param domain: The domain of the address.
+        :param mx_server: The (primary) MX server of the domain.
+        :return: The validation result, None if the SMTP dialogue is
+        required to answer it.
+        """
+
+        verdict, due = VERDICTS.lookup(domain, mx_server)
+        CACHE_REQUESTS.inc("verdicts", "miss" if verdict is None else "hit")
+        if verdict is None or not (verdict.catch_all or verdict.reject_all):
+            return None
+
+        if due:
+            cls._refresh(
+                (mx_server, domain),
+                lambda: cls._probe_verdict(mx_server, domain, **kwargs),
+                flight=CATCH_ALL_FLIGHT,
+            )
+
+        provider = PROVIDER_INDEX.classify(mx_server=mx_server)
+        if verdict.reject_all:
+            return ValidationResult(
+                result=False,
+                status="unknown",
+                message="MX server refuses every recipient (policy)",
+                provider=provider,
+                mx_server=mx_server,
+                cached=True,
+            )
+        return ValidationResult(
+            result=True,
+            status="risky",
+            message="Domain accepts any recipient (catch-all)",
+            provider=provider,
+            mx_server=mx_server,
+            catch_all=True,
+            cached=True,
+        )
+
+    @classmethod
+    def _rejected(cls, exception: AddressError) -> ValidationResult:
+        return ValidationResult(
+            result=False,
+            status=exception.status,
+            message=exception.message,
+            exception=exception,
+            dns_time=0.0,
+            smtp_time=0.0,
+            total_time=0.0,
+        )
+
+    @classmethod
+    def _observe(cls, result: ValidationResult | None, dns_time: float = 0.0):
+        """
+        Records the metrics of the provided validation result, the
+        SMTP and catch-all phases are only observed for results that
+        were effectively obtained from the MX server.
+
+        :param result: The validation result, None if there are no
+        MX servers for the domain.
+        :param dns_time: The DNS time, used when there's no result.
+        """
+
+        if result is None:
+            VALIDATIONS.inc("no_mx", "", "", "false")
+            VALIDATION_TIME.observe(dns_time, "dns", "", "")
+            VALIDATION_TIME.observe(dns_time, "total", "", "")
+            return
+
+        provider, mx_server = result.provider or "", result.mx_server or ""
+        VALIDATIONS.inc(
+            result.status,
+            str(result.code or ""),
+            provider,
+            "true" if result.cached else "false",
+        )
+        if not result.dns_time is None:
+            VALIDATION_TIME.observe(result.dns_time, "dns", provider, mx_server)
+        if not result.cached and not result.coalesced:
+            if not result.smtp_time is None:
+                VALIDATION_TIME.observe(result.smtp_time, "smtp", provider, mx_server)
+            for phase, elapsed in (result.phases or {}).items():
+                VALIDATION_TIME.observe(elapsed, phase, provider, mx_server)
+            if not result.catch_all_time is None:
+                VALIDATION_TIME.observe(
+                    result.catch_all_time, "catch_all", provider, mx_server
+                )
+        if not result.total_time is None:
+            VALIDATION_TIME.observe(result.total_time, "total", provider, mx_server)
+
+    @classmethod
+    async def _validate_email_failover(
+        cls,
+        email: str,
+        mx_servers: Sequence[str],
+        sender_email: str = "noreply@bemisc.com",
+        hostname: str | None = None,
+        timeout: float = 10.0,
+        attempts: int = 3,
+        hedge_delay: float | None = None,
+        deadline: Deadline | None = None,
+        timings: Timings | None = None,
+    ) -> ValidationResult:
+        """
+        Validates the e-mail address going through the (priority sorted)
+        MX servers until one of them provides an SMTP answer, skipping
+        the ones that are currently blacklisted, as long as the deadline
+        is not reached.
+
+        In hedged mode the connections to the MX servers are raced, with
+        each one being started after the hedge delay, and the first one
+        to be established is used.
+
+        :param email: The e-mail address to validate.
+        :param mx_servers: The MX servers sorted by preference.
+        :param sender_email: The e-mail address used in MAIL FROM.
+        :param hostname: The hostname to be used in the EHLO command.
+        :param timeout: The timeout for each of the SMTP operations.
+        :param attempts: The maximum number of MX servers to try.
+        :param hedge_delay: The delay (in seconds) before racing the next
+        MX server connection, disabling hedging if None.
+        :param deadline: The deadline of the validation.
+        :param timings: The timings where the time spent in each of the
+        phases of the validation (of every MX server tried) is added.
+        :return: The validation result from the first MX server that
+        answered, or the last failure if none of them did.
+        """
+
+        if timings is None:
+            timings = Timings()
+
+        candidates = [
+            mx_server for mx_server in mx_servers if not MX_SCHEDULER.is_open(mx_server)
+        ]
+        candidates = (candidates or list(mx_servers))[: max(attempts, 1)]
+
+        while True:
+            result = await cls._validate_email_mx(
+                email,
+                candidates[0],
+                sender_email=sender_email,
+                hostname=hostname,
+                timeout=timeout,
+                hedge=candidates[1:] if not hedge_delay is None else (),
+                hedge_delay=hedge_delay,
+                deadline=deadline,
+                timings=timings,
+            )
+            result.phases = timings.phases
+
+            # only failures without an SMTP answer (no connection or
+            # connection lost) are worth trying on another MX server
+            if not result.status == "unknown" or not result.code is None:
+                return result
+
+            # an hedged connection failure means that every one of the
+            # candidates has already been tried
+            if not hedge_delay is None and isinstance(
+                result.exception, SMTPConnectError
+            ):
+                return result
+
+            candidates = [
+                mx_server
+                for mx_server in candidates
+                if not mx_server in (candidates[0], result.mx_server)
+            ]
+            if not candidates or (deadline and deadline.expired):
+                return result
+
     @classmethod
     async def _validate_email_mx(
         cls,
@@ -165,93 +1421,194 @@ class SMTPVerifier:
         sender_email: str = "noreply@bemisc.com",
         hostname: str | None = None,
         timeout: float = 10.0,
+        hedge: Sequence[str] = (),
+        hedge_delay: float | None = None,
+        deadline: Deadline | None = None,
+        timings: Timings | None = None,
     ) -> ValidationResult:
-        if mx_server in BLACKLISTED:
+        if not MX_SCHEDULER.allow(mx_server):
             return ValidationResult(
                 result=True,
                 status="unknown",
-                message="MX server blacklisted (timeout?)",
+                message="MX server circuit open (too many failures)",
                 mx_server=mx_server,
             )
 
-        smtp_client = SMTP(hostname=mx_server, timeout=timeout)
+        # the outcome is recorded against the MX server the circuit was
+        # checked for (possibly a half-open probe), even if an hedged
+        # session to another MX server wins the race
+        requested = mx_server
+        domain = email.split("@")[1]
+        provider = PROVIDER_INDEX.classify(mx_server=mx_server)
+        if timings is None:
+            timings = Timings()
+
+        # the behaviour of the domain observed in the dialogue, to be
+        # recorded in its verdict once the dialogue is over
+        observed: dict[str, bool] = {}
+        success, acquired, policy = False, False, False
+        start = monotonic()
         try:
-            await smtp_client.connect(timeout=timeout)
-            await smtp_client.ehlo(hostname=hostname)
+            async with MX_SCHEDULER.slot(
+                mx_server, provider=provider, deadline=deadline
+            ):
+                acquired = True
+                async with SMTP_POOL.session(
+                    mx_server,
+                    hostname=hostname,
+                    timeout=timeout,
+                    hedge=hedge,
+                    hedge_delay=hedge_delay,
+                    deadline=deadline,
+                ) as smtp_client:
+                    # in case of an hedged session the MX server that won
+                    # the race may not be the requested one
+                    mx_server = cast(str, smtp_client.hostname)
+                    timings.session(start, smtp_client.spans)
 
-            try:
-                code, message = await smtp_client.vrfy(email, timeout=timeout)
-                if code == 250:
-                    return ValidationResult(
-                        result=True,
-                        status="deliverable",
-                        message=message,
-                        code=code,
-                        provider=await cls.guess_provider(
-                            mx_server=mx_server, message=message
-                        ),
-                        mx_server=mx_server,
-                        catch_all=await cls.is_catch_all(
-                            mx_server,
-                            domain=email.split("@")[1],
-                            sender_email=sender_email,
-                            hostname=hostname,
-                            timeout=timeout,
-                        ),
-                    )
-            except SMTPResponseException:
-                pass
-
-            await smtp_client.mail(sender_email)
-            code, message = await smtp_client.rcpt(email, timeout=timeout)
-            if code == 250:
-                return ValidationResult(
-                    result=True,
-                    status="deliverable",
-                    message=message,
-                    code=code,
-                    provider=await cls.guess_provider(
-                        mx_server=mx_server, message=message
-                    ),
-                    mx_server=mx_server,
-                    catch_all=await cls.is_catch_all(
-                        mx_server,
-                        domain=email.split("@")[1],
-                        sender_email=sender_email,
-                        hostname=hostname,
-                        timeout=timeout,
-                    ),
-                )
+                    # a tarpitting server is not sent VRFY, saving a (slow)
+                    # round-trip that is most of the times inconclusive
+                    verdict = VERDICTS.get(domain, mx_server)
+                    code, message = None, None
+                    if not VRFY_CACHE.get(mx_server, False) and not verdict.tarpit:
+                        try:
+                            code, message = await timings.measure(
+                                "vrfy",
+                                smtp_client.vrfy(
+                                    email,
+                                    timeout=cls._timeout(mx_server, timeout, deadline),
+                                ),
+                            )
+                        except SMTPResponseException as _exception:
+                            code = _exception.code
+                        # a server that never answers for the mailbox itself
+                        # (eg: 252 cannot verify or 502 not implemented) is
+                        # remembered so that VRFY is no longer sent to it
+                        if code == 252 or (code >= 500 and not code in (550, 551, 553)):
+                            VRFY_CACHE.set(mx_server, True, ttl=VRFY_TTL)
+                            observed.update(vrfy=False)
+                        elif code == 250:
+                            observed.update(vrfy=True)
+                        if not code == 250:
+                            code, message = None, None
 
-            return ValidationResult(
-                result=False,
-                status="undeliverable",
-                message=message,
-                code=code,
-                provider=await cls.guess_provider(mx_server=mx_server, message=message),
-                mx_server=mx_server,
-            )
+                    mail = not code == 250
+                    pipelined = mail and SMTP_PIPELINING and smtp_client.pipelining
+                    catch_all, catch_all_time = verdict.catch_all, None
+                    if pipelined:
+                        # MAIL FROM, the RCPT TO of the address and (when the
+                        # catch-all status is unknown) the RCPT TO of the probe
+                        # are sent together, in a single round-trip, with the
+                        # probe time being part of the SMTP (and RCPT) time
+                        rcpt_code, rcpt_message, probe_code = await timings.measure(
+                            "rcpt",
+                            cls._pipeline_rcpt(
+                                smtp_client,
+                                sender_email,
+                                email,
+                                probe=domain if catch_all is None else None,
+                                timeout=cls._timeout(mx_server, timeout, deadline),
+                            ),
+                        )
+                        policy = cls._policy(rcpt_code, rcpt_message)
+                        if not policy:
+                            observed.update(reject_all=False)
+                        if not rcpt_code in (250, 251):
+                            success = True
+                            return await cls._exception_result(
+                                SMTPRecipientRefused(rcpt_code, rcpt_message, email),
+                                mx_server,
+                            )
+                        code, message = rcpt_code, rcpt_message
+                        if code in (250, 251) and not probe_code is None:
+                            catch_all = probe_code == 250
+                            observed.update(catch_all=catch_all)
+                    elif mail:
+                        await timings.measure(
+                            "mail",
+                            smtp_client.mail(
+                                sender_email,
+                                timeout=cls._timeout(mx_server, timeout, deadline),
+                            ),
+                        )
+                        try:
+                            code, message = await timings.measure(
+                                "rcpt",
+                                smtp_client.rcpt(
+                                    email,
+                                    timeout=cls._timeout(mx_server, timeout, deadline),
+                                ),
+                            )
+                        except SMTPRecipientRefused as _exception:
+                            # a refused recipient is a regular answer that
+                            # leaves the session usable, so it's kept in the
+                            # pool and only the result is built from it
+                            success = True
+                            policy = cls._policy(_exception.code, _exception.message)
+                            if not policy:
+                                observed.update(reject_all=False)
+                            return await cls._exception_result(_exception, mx_server)
+                        observed.update(reject_all=False)
+
+                    # the catch-all probe is sent as an extra recipient in
+                    # the already open session, avoiding a second session
+                    if code in (250, 251) and not pipelined and catch_all is None:
+                        start_catch_all = time()
+                        try:
+                            if not mail:
+                                await smtp_client.mail(
+                                    sender_email,
+                                    timeout=cls._timeout(mx_server, timeout, deadline),
+                                )
+                            catch_all = await cls._probe_catch_all(
+                                smtp_client,
+                                domain,
+                                timeout=cls._timeout(mx_server, timeout, deadline),
+                            )
+                        except (SMTPTimeoutError, asyncio.TimeoutError):
+                            # a timed out probe is inconclusive, so the
+                            # catch-all status is left unknown (not cached)
+                            pass
+                        except Exception:
+                            catch_all = False
+                        finally:
+                            catch_all_time = time() - start_catch_all
+                        if not catch_all is None:
+                            observed.update(catch_all=catch_all)
+
+                    success = True
+                    observed.update(tarpit=False)
         except SMTPResponseException as _exception:
+            # a 421 answer means that the service is (temporarily) not
+            # available, which should count as a failure of the server,
+            # while a refused sender means every recipient is refused
+            success = not _exception.code == 421
+            if isinstance(_exception, SMTPSenderRefused) and _exception.code >= 500:
+                observed.update(reject_all=True)
+            return await cls._exception_result(_exception, mx_server)
+        except SMTPConnectTimeoutError as _exception:
+            # the failed session is accounted for as connect time (with
+            # any wait for the MX slot included)
+            timings.add("connect", start)
             return ValidationResult(
                 result=False,
-                status="undeliverable" if _exception.code == 550 else "unknown",
-                message=_exception.message,
-                code=_exception.code,
+                status="unknown",
+                message="MX server connection timeout",
                 exception=_exception,
-                provider=await cls.guess_provider(
-                    mx_server=mx_server, message=_exception.message
-                ),
+                provider=PROVIDER_INDEX.classify(mx_server=mx_server),
                 mx_server=mx_server,
             )
-        except SMTPConnectTimeoutError as _exception:
-            # blacklists the MX server for 1 hour
-            BLACKLISTED.set(mx_server, True, ttl=3600)
+        except (SMTPTimeoutError, asyncio.TimeoutError) as _exception:
+            # only a command that timed out on the server is a sign of
+            # tarpitting, unlike the deadline expiring while queued
+            if isinstance(_exception, SMTPTimeoutError):
+                observed.update(tarpit=True)
             return ValidationResult(
                 result=False,
                 status="unknown",
-                message="MX server blacklisted (timeout?)",
+                message=str(_exception) or "Validation deadline exceeded",
                 exception=_exception,
-                provider=await cls.guess_provider(mx_server=mx_server),
+                provider=PROVIDER_INDEX.classify(mx_server=mx_server),
                 mx_server=mx_server,
             )
         except Exception as _exception:
@@ -260,14 +1617,219 @@ class SMTPVerifier:
                 status="unknown",
                 message=str(_exception),
                 exception=_exception,
-                provider=await cls.guess_provider(mx_server=mx_server),
+                provider=PROVIDER_INDEX.classify(mx_server=mx_server),
                 mx_server=mx_server,
             )
         finally:
-            try:
-                await smtp_client.quit(timeout=timeout)
-            except Exception:
-                pass
+            # a deadline expiring (or a cancellation) while waiting for
+            # the MX slot says nothing about the MX server
+            if acquired:
+                MX_SCHEDULER.record(requested, success)
+            if observed:
+                VERDICTS.update(domain, mx_server, **observed)
+            # a policy refusal may be specific to the recipient, so the
+            # domain is only recorded as refusing every recipient once
+            # the (unlikely) address of the probe is refused as well
+            if policy:
+                cls._refresh(
+                    (mx_server, domain),
+                    lambda: cls._probe_verdict(
+                        mx_server,
+                        domain,
+                        sender_email=sender_email,
+                        hostname=hostname,
+                        timeout=timeout,
+                    ),
+                    flight=CATCH_ALL_FLIGHT,
+                )
+
+        return cls._deliverable(
+            cast(int, code),
+            cast(str, message),
+            mx_server,
+            catch_all=catch_all,
+            catch_all_time=catch_all_time,
+        )
+
+    @classmethod
+    async def _validate_emails_mx(
+        cls,
+        emails: Sequence[str],
+        mx_server: str,
+        sender_email: str = "noreply@bemisc.com",
+        hostname: str | None = None,
+        timeout: float = 10.0,
+        batch_size: int = 50,
+        deadline: Deadline | None = None,
+    ) -> dict[str, ValidationResult]:
+        """
+        Validates multiple e-mail addresses against the same MX server
+        re-using a single SMTP session, sending one RCPT TO command per
+        address and resetting the mail transaction (RSET) every
+        `batch_size` recipients to respect server recipient limits.
+
+        :param emails: The e-mail addresses to validate, all of them
+        should be handled by the provided MX server.
+        :param mx_server: The MX server to validate the addresses against.
+        :param sender_email: The e-mail address used in MAIL FROM.
+        :param hostname: The hostname to be used in the EHLO command.
+        :param timeout: The timeout for each of the SMTP operations.
+        :param batch_size: The maximum number of recipients per mail
+        transaction before a RSET is issued.
+        :param deadline: The deadline of the validations, capping the
+        wait for the MX slot and the session and every SMTP operation.
+        :return: The map associating each e-mail address with its
+        validation result.
+        """
+
+        if not MX_SCHEDULER.allow(mx_server):
+            return dict(
+                (
+                    email,
+                    ValidationResult(
+                        result=True,
+                        status="unknown",
+                        message="MX server circuit open (too many failures)",
+                        mx_server=mx_server,
+                    ),
+                )
+                for email in emails
+            )
+
+        provider = PROVIDER_INDEX.classify(mx_server=mx_server)
+
+        results: dict[str, ValidationResult] = {}
+        catch_all_times: dict[str, float] = {}
+        success, acquired = False, False
+        try:
+            async with MX_SCHEDULER.slot(
+                mx_server, provider=provider, deadline=deadline
+            ):
+                acquired = True
+                async with SMTP_POOL.session(
+                    mx_server, hostname=hostname, timeout=timeout, deadline=deadline
+                ) as smtp_client:
+                    # with pipelining each batch (RSET, MAIL FROM and every
+                    # RCPT TO) is sent in a single round-trip
+                    pipelined = SMTP_PIPELINING and smtp_client.pipelining
+                    for index in range(0, len(emails), batch_size):
+                        batch = emails[index : index + batch_size]
+                        if pipelined:
+                            await cls._pipeline_batch(
+                                smtp_client,
+                                batch,
+                                results,
+                                sender_email,
+                                reset=index > 0,
+                                timeout=cls._timeout(mx_server, timeout),
+                                deadline=deadline,
+                            )
+                            continue
+                        if index > 0:
+                            await smtp_client.rset(
+                                timeout=cls._timeout(mx_server, timeout, deadline)
+                            )
+                        await smtp_client.mail(
+                            sender_email,
+                            timeout=cls._timeout(mx_server, timeout, deadline),
+                        )
+                        for email in batch:
+                            try:
+                                code, message = await smtp_client.rcpt(
+                                    email,
+                                    timeout=cls._timeout(mx_server, timeout, deadline),
+                                )
+                                results[email] = cls._deliverable(
+                                    code, message, mx_server
+                                )
+                            except SMTPRecipientRefused as _exception:
+                                results[email] = await cls._exception_result(
+                                    _exception, mx_server
+                                )
+
+                    # probes the domains with deliverable addresses whose
+                    # catch-all status is not yet known, sending the probe
+                    # as an extra recipient in the same session
+                    domains = dict.fromkeys(
+                        email.split("@")[1]
+                        for email, result in results.items()
+                        if result.status == "deliverable"
+                        and VERDICTS.get(email.split("@")[1], mx_server).catch_all
+                        is None
+                    )
+                    for index, domain in enumerate(domains, start=len(emails)):
+                        if index % batch_size == 0:
+                            await smtp_client.rset(
+                                timeout=cls._timeout(mx_server, timeout, deadline)
+                            )
+                            await smtp_client.mail(
+                                sender_email,
+                                timeout=cls._timeout(mx_server, timeout, deadline),
+                            )
+                        start_catch_all = time()
+                        catch_all = await cls._probe_catch_all(
+                            smtp_client,
+                            domain,
+                            timeout=cls._timeout(mx_server, timeout, deadline),
+                        )
+                        catch_all_times[domain] = time() - start_catch_all
+                        VERDICTS.update(domain, mx_server, catch_all=catch_all)
+
+                    success = True
+        except SMTPConnectTimeoutError as _exception:
+            for email in emails:
+                results.setdefault(
+                    email,
+                    ValidationResult(
+                        result=False,
+                        status="unknown",
+                        message="MX server connection timeout",
+                        exception=_exception,
+                        provider=PROVIDER_INDEX.classify(mx_server=mx_server),
+                        mx_server=mx_server,
+                    ),
+                )
+        except Exception as _exception:
+            # marks every address that was not yet checked as unknown
+            # as the session is no longer usable (or the deadline expired)
+            for email in emails:
+                results.setdefault(
+                    email,
+                    ValidationResult(
+                        result=False,
+                        status="unknown",
+                        message=str(_exception) or "Validation deadline exceeded",
+                        exception=_exception,
+                        provider=PROVIDER_INDEX.classify(mx_server=mx_server),
+                        mx_server=mx_server,
+                    ),
+                )
+        finally:
+            if acquired:
+                MX_SCHEDULER.record(mx_server, success)
+
+        # the catch-all status should by now be known for every domain
+        # with deliverable addresses, unless the in-session probe failed
+        # in which case a dedicated verification is run, the addresses
+        # of catch-all domains being only risky ones
+        for email, result in results.items():
+            if not result.status == "deliverable":
+                continue
+            domain = email.split("@")[1]
+            catch_all = await cls.is_catch_all(
+                mx_server,
+                domain=domain,
+                sender_email=sender_email,
+                hostname=hostname,
+                timeout=timeout,
+                deadline=deadline,
+            )
+            result.record = result.record.replace(
+                status="risky" if catch_all else result.status, catch_all=catch_all
+            )
+            result.catch_all_time = catch_all_times.get(domain, None)
+
+        return results
 
     @classmethod
     async def is_catch_all(
@@ -278,68 +1840,376 @@ class SMTPVerifier:
         sender_email: str = "noreply@bemisc.com",
         hostname: str | None = None,
         timeout: float = 10.0,
-        cache_ttl: float = 3600.0,
+        deadline: Deadline | None = None,
+        timings: Timings | None = None,
+    ) -> bool:
+        catch_all = VERDICTS.get(domain, mx_server).catch_all
+        CACHE_REQUESTS.inc("verdicts", "miss" if catch_all is None else "hit")
+        if not catch_all is None:
+            return catch_all
+
+        result, _ = await CATCH_ALL_FLIGHT.run(
+            (mx_server, domain),
+            lambda: cls._probe_verdict(
+                mx_server,
+                domain,
+                test_prefix=test_prefix,
+                sender_email=sender_email,
+                hostname=hostname,
+                timeout=timeout,
+                deadline=deadline,
+                timings=timings,
+            ),
+        )
+        return result
+
+    @classmethod
+    async def _probe_verdict(
+        cls,
+        mx_server: str,
+        domain: str,
+        test_prefix: str = "averylargemail1234",
+        sender_email: str = "noreply@bemisc.com",
+        hostname: str | None = None,
+        timeout: float = 10.0,
+        deadline: Deadline | None = None,
+        timings: Timings | None = None,
     ) -> bool:
-        cache_key = (mx_server, domain)
-        if cache_key in CATCH_ALL_CACHE:
-            return CATCH_ALL_CACHE[(mx_server, domain)]
+        """
+        Probes the domain with an (unlikely) recipient in a dedicated
+        SMTP session, recording (and renewing) the verdict of the domain
+        from the answer: catch-all, reject-all or tarpitting.
+
+        :param mx_server: The MX server that handles the domain.
+        :param domain: The domain to be probed.
+        :param test_prefix: The local part of the (unlikely) probe address.
+        :param sender_email: The e-mail address used in MAIL FROM.
+        :param hostname: The hostname to be used in the EHLO command.
+        :param timeout: The timeout for each of the SMTP operations.
+        :param deadline: The deadline of the probe.
+        :param timings: The timings where the time spent in each of the
+        phases of the probe is added, if not set the phases are observed
+        in the metrics by the probe itself.
+        :return: If the domain accepts the probe address (catch-all).
+        """
 
-        smtp_client = SMTP(hostname=mx_server, timeout=timeout)
+        if not MX_SCHEDULER.allow(mx_server):
+            return False
+        provider = PROVIDER_INDEX.classify(mx_server=mx_server)
+        observe = timings is None
+        if timings is None:
+            timings = Timings()
+        observed: dict[str, bool] = {}
+        success, acquired = False, False
+        start = monotonic()
         try:
-            await smtp_client.connect(timeout=timeout)
-            await smtp_client.ehlo(hostname=hostname)
-            await smtp_client.mail(sender_email)
-            code, _ = await smtp_client.rcpt(f"{test_prefix}@{domain}", timeout=timeout)
-            result = code == 250
-            CATCH_ALL_CACHE.set(cache_key, result, ttl=cache_ttl)
-            return result
+            async with MX_SCHEDULER.slot(
+                mx_server, provider=provider, deadline=deadline
+            ):
+                acquired = True
+                async with SMTP_POOL.session(
+                    mx_server, hostname=hostname, timeout=timeout, deadline=deadline
+                ) as smtp_client:
+                    timings.session(start, smtp_client.spans)
+                    await timings.measure(
+                        "mail",
+                        smtp_client.mail(
+                            sender_email,
+                            timeout=cls._timeout(mx_server, timeout, deadline),
+                        ),
+                    )
+                    try:
+                        code, message = await timings.measure(
+                            "rcpt",
+                            smtp_client.rcpt(
+                                f"{test_prefix}@{domain}",
+                                timeout=cls._timeout(mx_server, timeout, deadline),
+                            ),
+                        )
+                    except SMTPRecipientRefused as _exception:
+                        code, message = _exception.code, _exception.message
+            success = True
+            observed.update(
+                catch_all=code == 250,
+                reject_all=cls._policy(code, message),
+                tarpit=False,
+            )
+            return code == 250
+        except SMTPSenderRefused as _exception:
+            success = True
+            observed.update(catch_all=False, reject_all=_exception.code >= 500)
+            return False
+        except (SMTPTimeoutError, asyncio.TimeoutError) as _exception:
+            # a timed out probe is inconclusive, so the catch-all status
+            # is left as it is, only the tarpitting is recorded
+            if isinstance(_exception, SMTPTimeoutError) and not isinstance(
+                _exception, SMTPConnectTimeoutError
+            ):
+                observed.update(tarpit=True)
+            return False
         except Exception:
-            CATCH_ALL_CACHE.set(cache_key, False, ttl=cache_ttl)
+            observed.update(catch_all=False)
             return False
         finally:
-            try:
-                await smtp_client.quit(timeout=timeout)
-            except Exception:
-                pass
+            if acquired:
+                MX_SCHEDULER.record(mx_server, success)
+            if observed:
+                VERDICTS.update(domain, mx_server, renew=True, **observed)
+            if observe:
+                for phase, elapsed in timings.phases.items():
+                    VALIDATION_TIME.observe(elapsed, phase, provider, mx_server)
+
+    @classmethod
+    async def _probe_catch_all(
+        cls,
+        smtp_client: SMTP,
+        domain: str,
+        test_prefix: str = "averylargemail1234",
+        timeout: float = 10.0,
+    ) -> bool:
+        """
+        Sends the catch-all probe recipient in the currently open mail
+        transaction of the provided SMTP client (MAIL FROM must have
+        already been sent).
+
+        :param smtp_client: The SMTP client with an open mail transaction.
+        :param domain: The domain to be tested for catch-all.
+        :param test_prefix: The local part of the (unlikely) probe address.
+        :param timeout: The timeout for the RCPT operation.
+        :return: If the domain accepts the probe address (catch-all).
+        """
+
+        try:
+            code, _ = await smtp_client.rcpt(f"{test_prefix}@{domain}", timeout=timeout)
+        except SMTPRecipientRefused:
+            return False
+        return code == 250
+
+    @classmethod
+    def _timeout(
+        cls, mx_server: str, timeout: float, deadline: Deadline | None = None
+    ) -> float:
+        """
+        Obtains the timeout of the next command sent to the provided MX
+        server, adapted to its latency and capped by the deadline.
+
+        :param mx_server: The MX server the command is sent to.
+        :param timeout: The default (and maximum) timeout in seconds.
+        :param deadline: The deadline of the validation.
+        :return: The timeout (in seconds) of the command.
+        """
+
+        if not SMTP_LATENCY is None:
+            timeout = SMTP_LATENCY.timeout((mx_server, "command"), timeout)
+        return timeout if deadline is None else deadline.cap(timeout)
+
+    @classmethod
+    async def _pipeline_rcpt(
+        cls,
+        smtp_client: PooledSMTP,
+        sender_email: str,
+        email: str,
+        probe: str | None = None,
+        test_prefix: str = "averylargemail1234",
+        timeout: float = 10.0,
+    ) -> tuple[int, str, int | None]:
+        """
+        Sends the MAIL FROM, the RCPT TO of the address and optionally
+        the RCPT TO of the catch-all probe as a single pipelined write.
+
+        :param smtp_client: The SMTP client of a server with pipelining.
+        :param sender_email: The e-mail address used in MAIL FROM.
+        :param email: The e-mail address to validate.
+        :param probe: The domain to be tested for catch-all, if any.
+        :param test_prefix: The local part of the (unlikely) probe address.
+        :param timeout: The timeout for each of the responses.
+        :return: The tuple with the code and message of the RCPT of the
+        address and the code of the RCPT of the probe (None if not sent).
+        """
+
+        commands = [
+            b"MAIL FROM:" + quote_address(sender_email).encode("ascii"),
+            b"RCPT TO:" + quote_address(email).encode("ascii"),
+        ]
+        if probe:
+            commands.append(
+                b"RCPT TO:" + quote_address(f"{test_prefix}@{probe}").encode("ascii")
+            )
+        responses = await smtp_client.pipeline(*commands, timeout=timeout)
+        mail, rcpt = responses[0], responses[1]
+        if not mail.code == 250:
+            raise SMTPSenderRefused(mail.code, mail.message, sender_email)
+        return rcpt.code, rcpt.message, responses[2].code if probe else None
+
+    @classmethod
+    async def _pipeline_batch(
+        cls,
+        smtp_client: PooledSMTP,
+        emails: Sequence[str],
+        results: dict[str, ValidationResult],
+        sender_email: str,
+        reset: bool = False,
+        timeout: float = 10.0,
+        deadline: Deadline | None = None,
+    ):
+        """
+        Sends a batch of recipients (preceded by MAIL FROM and, if
+        requested, by RSET) as a single pipelined write, storing the
+        result of each address in the provided results.
+
+        :param smtp_client: The SMTP client of a server with pipelining.
+        :param emails: The e-mail addresses of the batch.
+        :param results: The map where the results are stored.
+        :param sender_email: The e-mail address used in MAIL FROM.
+        :param reset: If the previous mail transaction should be reset.
+        :param timeout: The timeout for each of the responses.
+        :param deadline: The deadline of the validations, capping the
+        timeout of the responses.
+        """
+
+        mx_server = cast(str, smtp_client.hostname)
+        if not deadline is None:
+            timeout = deadline.cap(timeout)
+        responses = await smtp_client.pipeline(
+            *((b"RSET",) if reset else ()),
+            b"MAIL FROM:" + quote_address(sender_email).encode("ascii"),
+            *(b"RCPT TO:" + quote_address(email).encode("ascii") for email in emails),
+            timeout=timeout,
+        )
+        if reset:
+            response = responses.pop(0)
+            if not response.code == 250:
+                raise SMTPResponseException(response.code, response.message)
+        response = responses.pop(0)
+        if not response.code == 250:
+            raise SMTPSenderRefused(response.code, response.message, sender_email)
+        for email, (code, message) in zip(emails, responses):
+            results[email] = (
+                cls._deliverable(code, message, mx_server)
+                if code in (250, 251)
+                else await cls._exception_result(
+                    SMTPRecipientRefused(code, message, email), mx_server
+                )
+            )
+
+    @classmethod
+    def _deliverable(
+        cls,
+        code: int,
+        message: str,
+        mx_server: str,
+        catch_all: bool | None = None,
+        catch_all_time: float | None = None,
+    ) -> ValidationResult:
+        # a recipient accepted as is (250) or to be forwarded (251) is
+        # deliverable, unless accepted by a catch-all domain, in which
+        # case it may as well not exist, so it's only a risky one
+        if not code in (250, 251):
+            return ValidationResult(
+                result=False,
+                status="undeliverable",
+                message=message,
+                code=code,
+                provider=PROVIDER_INDEX.classify(mx_server=mx_server, message=message),
+                mx_server=mx_server,
+            )
+        return ValidationResult(
+            result=True,
+            status="risky" if catch_all else "deliverable",
+            message=message,
+            code=code,
+            provider=PROVIDER_INDEX.classify(mx_server=mx_server, message=message),
+            mx_server=mx_server,
+            catch_all=catch_all,
+            catch_all_time=catch_all_time,
+        )
+
+    @classmethod
+    def _policy(cls, code: int, message: str) -> bool:
+        # an enhanced status code of the security or policy class (5.7)
+        # refuses the sender (or its host) rather than the mailbox
+        return code >= 500 and message.startswith("5.7.")
+
+    @classmethod
+    async def _exception_result(
+        cls, exception: SMTPResponseException, mx_server: str
+    ) -> ValidationResult:
+        return ValidationResult(
+            result=False,
+            status="undeliverable" if exception.code == 550 else "unknown",
+            message=exception.message,
+            code=exception.code,
+            exception=exception,
+            provider=PROVIDER_INDEX.classify(
+                mx_server=mx_server, message=exception.message
+            ),
+            mx_server=mx_server,
+        )
+
+    @classmethod
+    def _expired(
+        cls, exception: asyncio.TimeoutError, dns_time: float
+    ) -> ValidationResult:
+        # the deadline expired while resolving the MX servers, the
+        # (shared) query is left running so that its answer is cached
+        return ValidationResult(
+            result=False,
+            status="unknown",
+            message="Validation deadline exceeded (DNS)",
+            exception=exception,
+            dns_time=dns_time,
+            smtp_time=0.0,
+            total_time=dns_time,
+        )
+
+    @classmethod
+    def _shed_result(
+        cls, exception: OverloadedError, mx_server: str
+    ) -> ValidationResult:
+        # the code is the one of an SMTP reply, so the HTTP status of
+        # the overload is left out, with the retry time in the message
+        retry_after = exception.headers["Retry-After"]
+        return ValidationResult(
+            result=False,
+            status="unknown",
+            message=f"{exception.message} (retry after {retry_after}s)",
+            exception=exception,
+            provider=PROVIDER_INDEX.classify(mx_server=mx_server),
+            mx_server=mx_server,
+        )
 
     @classmethod
     async def guess_provider(
         cls, mx_server: str | None = None, message: str | None = None
     ) -> str:
-        if mx_server:
-            if mx_server.endswith(".google.com"):
-                return "google"
-            if mx_server.endswith(".outlook.com"):
-                return "microsoft"
-        if message:
-            if "gsmtp" in message:
-                return "google"
-            if "outlook" in message:
-                return "microsoft"
-            if "yahoo" in message:
-                return "yahoo"
-        return "unknown"
+        return PROVIDER_INDEX.classify(mx_server=mx_server, message=message)
 
     @classmethod
     async def _mx_records(cls, domain: str) -> list[str]:
         """
-        Obtains the MX records for the provided domain, using an
-        asynchronous DNS resolver.
+        Obtains the MX records for the provided domain, sorted by
+        preference, using the shared asynchronous DNS resolver.
+
+        Both positive and negative answers are cached for the TTL
+        derived from the DNS answer, transient failures are not.
 
         :param domain: The domain for which the MX records are going
         to be retrieved.
         :return: The list of MX records for the provided domain.
         """
 
-        if domain in MX_CACHE:
-            return MX_CACHE[domain]
+        mx_records = MX_CACHE.get(domain, None)
+        CACHE_REQUESTS.inc("mx", "miss" if mx_records is None else "hit")
+        if not mx_records is None:
+            return mx_records
 
-        resolver = DNSResolver()
-        try:
-            result = await resolver.query(domain, "MX")
-            mx_records = [str(mx.host) for mx in result]
-            MX_CACHE[domain] = mx_records
-        except DNSError:
-            mx_records = []
+        async def query() -> list[str]:
+            try:
+                mx_records, mx_ttl = await MX_RESOLVER.resolve(domain)
+                MX_CACHE.set(domain, mx_records, ttl=mx_ttl)
+            except DNSError:
+                mx_records = []
+            return mx_records
 
+        mx_records, _ = await MX_FLIGHT.run(domain, query)
         return mx_records
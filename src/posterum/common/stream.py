@@ -0,0 +1,243 @@
+import asyncio
+
+from csv import reader
+from json import JSONDecodeError, loads
+from collections import deque
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Literal, cast
+
+from .errors import OverloadedError, UserError
+from .smtp import SMTPVerifier
+
+Format = Literal["ndjson", "csv"]
+
+ADDRESS_COLUMNS = ("address", "email", "e-mail", "mail")
+
+
+async def validate_stream(
+    addresses: AsyncIterable[str],
+    concurrency: int = 32,
+    ordered: bool = False,
+    cache: bool | None = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Validates the e-mail addresses of the provided (possibly unbounded)
+    stream, with at most `concurrency` validations running at a time.
+
+    The next address is only read from the input once there's room for
+    a new validation, and no new validations are started while the
+    caller is not consuming the results, so both memory usage and the
+    input rate are bounded by the consumer (backpressure).
+
+    The same applies under overload, a validation that is shed is
+    retried once its retry time elapses, with no new addresses being
+    read from the input in the meantime.
+
+    :param addresses: The asynchronous iterable of e-mail addresses.
+    :param concurrency: The maximum number of concurrent validations.
+    :param ordered: If the results should be yielded in the input order,
+    instead of the order in which the validations complete.
+    :param cache: If the result cache should be used, if not set the
+    value is obtained from the configuration.
+    :return: The asynchronous iterator of result dictionaries, with
+    an `error` field for the addresses that could not be validated.
+    """
+
+    iterator = addresses.__aiter__()
+    queue: deque[tuple[str, asyncio.Future[dict[str, Any]]]] = deque()
+    reading: asyncio.Future[str] | None = None
+    retrying: set[asyncio.Future[dict[str, Any]]] = set()
+    exhausted = False
+
+    try:
+        while True:
+            # the shed validations are retried (keeping their position)
+            # after the time requested by the admission control
+            retrying = set(task for task in retrying if not task.done())
+            for index, (address, task) in enumerate(queue):
+                if not _shed(task):
+                    continue
+                delay = cast(OverloadedError, task.exception()).retry_after
+                task = asyncio.ensure_future(_validate(address, cache, delay=delay))
+                queue[index] = (address, task)
+                retrying.add(task)
+
+            # yields every result that is ready (respecting the order of
+            # the input in ordered mode) before waiting for more work
+            while queue and queue[0][1].done() and not _shed(queue[0][1]):
+                yield queue.popleft()[1].result()
+            if not ordered:
+                ready = [
+                    item for item in queue if item[1].done() and not _shed(item[1])
+                ]
+                for item in ready:
+                    queue.remove(item)
+                    yield item[1].result()
+
+            if (
+                reading is None
+                and not exhausted
+                and not retrying
+                and len(queue) < concurrency
+            ):
+                reading = asyncio.ensure_future(iterator.__anext__())
+
+            waitables: set[asyncio.Future[Any]] = set(
+                [queue[0][1]] if ordered and queue else [task for _, task in queue]
+            )
+            if reading:
+                waitables.add(reading)
+            if not waitables:
+                break
+
+            done, _ = await asyncio.wait(waitables, return_when=asyncio.FIRST_COMPLETED)
+
+            if reading and reading in done:
+                try:
+                    address = reading.result().strip()
+                    if address:
+                        queue.append(
+                            (address, asyncio.ensure_future(_validate(address, cache)))
+                        )
+                except StopAsyncIteration:
+                    exhausted = True
+                reading = None
+    finally:
+        if reading:
+            reading.cancel()
+        for _, task in queue:
+            task.cancel()
+
+
+async def parse_lines(
+    lines: AsyncIterable[str], input_format: Format = "ndjson"
+) -> AsyncIterator[str]:
+    """
+    Extracts the e-mail addresses from the lines of an NDJSON or CSV
+    input, in NDJSON each line is either a JSON string or an object
+    with an `address` (or `email`) field, in CSV the address column is
+    detected from the header, defaulting to the first column.
+
+    :param lines: The asynchronous iterable of text lines.
+    :param input_format: The format of the input lines.
+    :return: The asynchronous iterator of e-mail addresses.
+    """
+
+    column: int | None = None
+    async for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if input_format == "ndjson":
+            try:
+                value = loads(line)
+            except JSONDecodeError:
+                value = line
+            if isinstance(value, dict):
+                value = value.get("address", value.get("email", None))
+            if isinstance(value, str):
+                yield value
+            continue
+        row = next(reader([line]))
+        if column is None:
+            header = [value.strip().lower() for value in row]
+            matches = [
+                index for index, name in enumerate(header) if name in ADDRESS_COLUMNS
+            ]
+            column = matches[0] if matches else 0
+            if matches or not "@" in row[column]:
+                continue
+        if column < len(row):
+            yield row[column].strip()
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """
+    Splits the provided stream of byte chunks into (decoded) text lines
+    without buffering more than a single line.
+
+    :param chunks: The asynchronous iterable of byte chunks.
+    :return: The asynchronous iterator of text lines.
+    """
+
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buffer:
+        yield buffer.decode("utf-8")
+
+
+async def read_addresses(data: bytes, input_format: Format = "ndjson") -> list[str]:
+    """
+    Extracts the e-mail addresses from a complete (in memory) NDJSON
+    or CSV input, as the ones of uploaded files.
+
+    :param data: The raw (UTF-8 encoded) input data.
+    :param input_format: The format of the input.
+    :return: The list of e-mail addresses.
+    """
+
+    lines = data.decode("utf-8-sig").splitlines()
+    return [address async for address in parse_lines(aiter_sync(lines), input_format)]
+
+
+def extract_addresses(data: Any, limit: int | None = None) -> list[str]:
+    """
+    Extracts the e-mail addresses of a (parsed) JSON body, either the
+    plain list of addresses or an object containing them under the
+    addresses (or emails) key, so that every entry point accepts the
+    same body shape.
+
+    :param data: The parsed JSON body.
+    :param limit: The maximum number of addresses, unbounded if None.
+    :return: The list of e-mail addresses.
+    :raises UserError: If the body is malformed, has no addresses or
+    has more addresses than the limit.
+    """
+
+    if isinstance(data, dict):
+        data = data.get("addresses", data.get("emails", None))
+    if not data:
+        raise UserError("Missing email addresses")
+    if not isinstance(data, list) or not all(
+        isinstance(address, str) for address in data
+    ):
+        raise UserError("Invalid email addresses (expected a list of strings)")
+    if not limit is None and len(data) > limit:
+        raise UserError(f"Too many email addresses (limit is {limit})")
+    return data
+
+
+async def aiter_sync(iterable: Iterable[str]) -> AsyncIterator[str]:
+    for item in iterable:
+        yield item
+
+
+def _shed(task: asyncio.Future[dict[str, Any]]) -> bool:
+    return (
+        task.done()
+        and not task.cancelled()
+        and isinstance(task.exception(), OverloadedError)
+    )
+
+
+async def _validate(
+    address: str, cache: bool | None = None, delay: float = 0.0
+) -> dict[str, Any]:
+    if delay:
+        await asyncio.sleep(delay)
+    try:
+        result = await SMTPVerifier.validate_email(
+            address, cache=cache, priority="bulk"
+        )
+    except OverloadedError:
+        # the shed validations are not reported as errors, being left
+        # for the stream to retry (and slow down) instead
+        raise
+    except Exception as exception:
+        return dict(
+            address=address, error=str(exception) or exception.__class__.__name__
+        )
+    return dict(address=address, **(result.to_dict() if result else {}))
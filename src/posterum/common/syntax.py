@@ -0,0 +1,195 @@
+import os
+import re
+
+from typing import Iterable, Literal, NamedTuple
+
+from .providers import SuffixTrie
+
+Rejection = Literal["invalid", "disposable"]
+
+DISPOSABLE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "disposable.txt"
+)
+
+RESERVED_DOMAINS = (
+    # special use names (RFC 2606, RFC 6761, RFC 6762 and RFC 7686)
+    "test",
+    "example",
+    "invalid",
+    "localhost",
+    "local",
+    "onion",
+    "internal",
+    "home.arpa",
+    "example.com",
+    "example.net",
+    "example.org",
+)
+
+# the atext chars of RFC 5322 extended with any non ASCII char, as
+# allowed by RFC 6531 for internationalized local parts
+ATEXT = r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~\-\u0080-\U0010ffff]"
+
+QTEXT = r"[\x20\x21\x23-\x5b\x5d-\x7e\u0080-\U0010ffff]"
+
+DOT_ATOM = re.compile(rf"^{ATEXT}+(\.{ATEXT}+)*\Z")
+
+QUOTED_STRING = re.compile(rf'^"({QTEXT}|\\[\x20-\x7e])*"\Z')
+
+LABEL = re.compile(r"^[a-z0-9]([a-z0-9\-]{0,61}[a-z0-9])?\Z")
+
+# the local part rules of the providers that ignore dots and/or have
+# sub-addressing, mapping each domain to its canonical domain, if the
+# dots are ignored and the sub-address (tag) separator
+LOCAL_RULES: dict[str, tuple[str, bool, str | None]] = {
+    "gmail.com": ("gmail.com", True, "+"),
+    "googlemail.com": ("gmail.com", True, "+"),
+    "outlook.com": ("outlook.com", False, "+"),
+    "hotmail.com": ("hotmail.com", False, "+"),
+    "live.com": ("live.com", False, "+"),
+    "icloud.com": ("icloud.com", False, "+"),
+    "me.com": ("me.com", False, "+"),
+    "protonmail.com": ("protonmail.com", False, "+"),
+    "proton.me": ("proton.me", False, "+"),
+    "fastmail.com": ("fastmail.com", False, "+"),
+}
+
+
+class AddressError(ValueError):
+    """
+    Error raised when an e-mail address is rejected without any
+    network work, either for its syntax or for its domain.
+    """
+
+    def __init__(self, message: str, status: Rejection = "invalid") -> None:
+        super().__init__(message)
+        self.message = message
+        self.status: Rejection = status
+
+
+class Address(NamedTuple):
+    local: str
+    """ The local part of the address, as provided """
+
+    domain: str
+    """ The (case folded and IDNA encoded) domain of the address """
+
+    key: str
+    """ The canonical form of the address, to be used as cache key """
+
+    @property
+    def address(self) -> str:
+        """
+        The normalized address, with the original local part and the
+        normalized domain, to be used in the SMTP dialogue.
+        """
+
+        return self.local + "@" + self.domain
+
+
+class AddressParser:
+    """
+    Parser of (RFC 5321 and RFC 5322) e-mail addresses that runs before
+    any DNS or SMTP work, normalizing the valid ones and rejecting the
+    invalid ones, the ones with reserved domains and the ones of known
+    disposable e-mail services.
+
+    :param disposable: The disposable e-mail domains, any sub-domain of
+    them is also considered disposable.
+    :param reserved: The reserved (special use) domains.
+    """
+
+    def __init__(
+        self,
+        disposable: Iterable[str] = (),
+        reserved: Iterable[str] = RESERVED_DOMAINS,
+    ) -> None:
+        self._domains = SuffixTrie()
+        for domain in reserved:
+            self._domains.add(domain, "invalid")
+        for domain in disposable:
+            self._domains.add(domain, "disposable")
+
+    def parse(self, email: str) -> Address:
+        """
+        Parses the provided e-mail address, normalizing it.
+
+        :param email: The e-mail address to be parsed.
+        :return: The parsed (and normalized) address.
+        """
+
+        email = email.strip()
+        local, separator, domain = email.rpartition("@")
+        if not separator or not local or not domain:
+            raise AddressError("Invalid address syntax, missing local part or domain")
+        if len(local.encode("utf-8")) > 64:
+            raise AddressError("Invalid address syntax, local part too long")
+        if not DOT_ATOM.match(local) and not QUOTED_STRING.match(local):
+            raise AddressError("Invalid address syntax, invalid local part")
+
+        domain = self._domain(domain)
+        if len(local.encode("utf-8")) + 1 + len(domain) > 254:
+            raise AddressError("Invalid address syntax, address too long")
+
+        status = self._domains.find(domain)
+        if status == "invalid":
+            raise AddressError(f"Reserved domain: {domain}")
+        if status == "disposable":
+            raise AddressError(f"Disposable domain: {domain}", status="disposable")
+
+        return Address(local, domain, self._key(local, domain))
+
+    def _domain(self, domain: str) -> str:
+        if domain.startswith("["):
+            raise AddressError("Address literals are not supported")
+        domain = domain.rstrip(".")
+        try:
+            domain = domain.encode("idna").decode("ascii").lower()
+        except UnicodeError as exception:
+            raise AddressError("Invalid domain, cannot be IDNA encoded") from exception
+        if len(domain) > 253:
+            raise AddressError("Invalid domain, too long")
+        labels = domain.split(".")
+        if len(labels) < 2:
+            raise AddressError("Invalid domain, not fully qualified")
+        for label in labels:
+            if not LABEL.match(label):
+                raise AddressError(f"Invalid domain, invalid label: {label}")
+        if labels[-1].isdigit():
+            raise AddressError("Invalid domain, numeric top level domain")
+        return domain
+
+    def _key(self, local: str, domain: str) -> str:
+        # the local part is case folded as (in practice) mailboxes are
+        # case insensitive, the quoted ones are kept as they are
+        if local.startswith('"'):
+            return local + "@" + domain
+        local = local.lower()
+        rule = LOCAL_RULES.get(domain, None)
+        if rule:
+            domain, dots, separator = rule
+            if separator:
+                local = local.split(separator, 1)[0] or local
+            if dots:
+                local = local.replace(".", "")
+        return local + "@" + domain
+
+    @classmethod
+    def load(cls, *paths: str) -> "AddressParser":
+        """
+        Loads the parser with the disposable domains of the provided
+        files (one domain per line, with `#` comments).
+
+        :param paths: The paths of the disposable domain files, defaulting
+        to the list bundled with the package.
+        :return: The loaded address parser.
+        """
+
+        domains: list[str] = []
+        for path in paths or (DISPOSABLE_PATH,):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    line = line.split("#", 1)[0].strip()
+                    if line:
+                        domains.append(line)
+        return cls(disposable=domains)
@@ -0,0 +1,140 @@
+import math
+import asyncio
+
+from typing import Awaitable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """
+    Deadline (in the clock of the event loop) of an operation that is
+    made of multiple steps, the waits and the timeouts of each of the
+    steps are capped by the time remaining until the deadline.
+
+    Must be created from within a running event loop.
+
+    :param budget: The time budget (in seconds) of the operation, there's
+    no deadline if not set.
+    """
+
+    def __init__(self, budget: float | None = None) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.when = None if budget is None else self._loop.time() + budget
+
+    @property
+    def remaining(self) -> float | None:
+        if self.when is None:
+            return None
+        return max(self.when - self._loop.time(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return not self.when is None and self._loop.time() >= self.when
+
+    def cap(self, timeout: float) -> float:
+        """
+        Caps the provided timeout by the time remaining until the deadline.
+
+        :param timeout: The timeout (in seconds) to be capped.
+        :return: The capped timeout (in seconds).
+        """
+
+        remaining = self.remaining
+        return timeout if remaining is None else min(timeout, remaining)
+
+    async def wait_for(self, awaitable: Awaitable[T]) -> T:
+        """
+        Waits for the provided awaitable until the deadline, raising
+        a timeout error (and cancelling it) once the deadline is reached.
+
+        :param awaitable: The awaitable to wait for.
+        :return: The result of the awaitable.
+        """
+
+        if self.when is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, self.remaining)
+
+
+class LatencyEstimator:
+    """
+    Rolling estimate of the latency of each key (eg: the commands sent
+    to an MX server) as exponentially weighted moving average and variance,
+    from which adaptive timeouts are derived as the average plus a number
+    of standard deviations.
+
+    Timed out operations are observed as (censored) samples of at least
+    their elapsed time, only raising the estimate.
+
+    :param alpha: The weight of each new sample (0.0 to 1.0).
+    :param deviations: The number of standard deviations added to the
+    average latency to obtain the timeout.
+    :param min_samples: The number of samples required before the
+    adaptive timeout is used instead of the default one.
+    :param min_timeout: The minimum (floor) adaptive timeout in seconds.
+    :param max_size: The maximum number of keys being estimated.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.1,
+        deviations: float = 4.0,
+        min_samples: int = 5,
+        min_timeout: float = 1.0,
+        max_size: int = 65536,
+    ) -> None:
+        self.alpha = alpha
+        self.deviations = deviations
+        self.min_samples = min_samples
+        self.min_timeout = min_timeout
+        self.max_size = max_size
+        self._estimates: dict[Hashable, list[float]] = {}
+
+    def observe(self, key: Hashable, latency: float, censored: bool = False):
+        estimate = self._estimates.get(key, None)
+        if estimate is None:
+            if len(self._estimates) >= self.max_size:
+                self._estimates.clear()
+            self._estimates[key] = [1.0, latency, 0.0]
+            return
+
+        count, mean, variance = estimate
+        if censored and latency < mean:
+            return
+        delta = latency - mean
+        estimate[0] = count + 1.0
+        estimate[1] = mean + self.alpha * delta
+        estimate[2] = (1.0 - self.alpha) * (variance + self.alpha * delta * delta)
+
+    def estimate(self, key: Hashable) -> tuple[float, float] | None:
+        """
+        Obtains the current estimate of the latency of the provided key.
+
+        :param key: The key of the latency estimate.
+        :return: The tuple with the average and the standard deviation
+        of the latency, None if there are no samples for the key.
+        """
+
+        estimate = self._estimates.get(key, None)
+        if estimate is None:
+            return None
+        return estimate[1], math.sqrt(estimate[2])
+
+    def timeout(self, key: Hashable, timeout: float) -> float:
+        """
+        Derives the adaptive timeout of the provided key, bounded by the
+        minimum timeout and by the provided (default) timeout, which is
+        used as is while there are not enough samples.
+
+        :param key: The key of the latency estimate.
+        :param timeout: The default (and maximum) timeout in seconds.
+        :return: The adaptive timeout in seconds.
+        """
+
+        estimate = self._estimates.get(key, None)
+        if estimate is None or estimate[0] < self.min_samples:
+            return timeout
+        _, mean, variance = estimate
+        adaptive = mean + self.deviations * math.sqrt(variance)
+        return min(max(adaptive, self.min_timeout), timeout)
@@ -0,0 +1,96 @@
+from time import time
+from typing import Any, NamedTuple
+
+from .cache import Cache
+
+
+class Verdict(NamedTuple):
+    catch_all: bool | None = None
+    """ If the domain accepts any recipient, None if not yet probed """
+
+    reject_all: bool | None = None
+    """ If the MX server refuses every recipient (by policy) """
+
+    vrfy: bool | None = None
+    """ If the MX server answers VRFY for the mailbox itself """
+
+    tarpit: bool | None = None
+    """ If the MX server delays its answers until they time out """
+
+    def encode(self) -> list[bool | None]:
+        return list(self)
+
+    @classmethod
+    def decode(cls, data: list[bool | None]) -> "Verdict":
+        return cls(*data)
+
+
+class VerdictStore:
+    """
+    Store of the verdicts on the behaviour of each domain (and of the
+    MX server that handles it), learned from the SMTP dialogues, so
+    that the domains whose answer is already known (eg: catch-all
+    ones) can be answered without any SMTP work.
+
+    Each verdict is refreshed by new observations, the verdicts that
+    are older than the refresh interval are due to be probed again.
+
+    :param cache: The cache where the verdicts are stored.
+    :param ttl: The TTL (in seconds) of each verdict.
+    :param refresh: The age (in seconds) after which a verdict is
+    due to be refreshed.
+    """
+
+    def __init__(self, cache: Cache, ttl: float = 86400.0, refresh: float = 3600.0):
+        self.cache = cache
+        self.ttl = ttl
+        self.refresh = refresh
+
+    def get(self, domain: str, mx_server: str) -> Verdict:
+        """
+        Obtains the verdict of the provided domain and MX server, with
+        every field unknown (None) if there's no verdict yet.
+
+        :param domain: The domain of the verdict.
+        :param mx_server: The MX server that handles the domain.
+        :return: The verdict of the domain and MX server.
+        """
+
+        return self.cache.get((domain, mx_server), None) or Verdict()
+
+    def lookup(self, domain: str, mx_server: str) -> tuple[Verdict | None, bool]:
+        """
+        Obtains the verdict of the provided domain and MX server and if
+        it's due to be refreshed.
+
+        :param domain: The domain of the verdict.
+        :param mx_server: The MX server that handles the domain.
+        :return: The tuple with the verdict (None if unknown) and if
+        the verdict is older than the refresh interval.
+        """
+
+        item = self.cache.get_items([(domain, mx_server)])[0]
+        if item is None:
+            return None, False
+        return item.value, time() - item.timestamp >= self.refresh
+
+    def update(
+        self, domain: str, mx_server: str, renew: bool = False, **kwargs: Any
+    ) -> Verdict:
+        """
+        Updates the verdict of the provided domain and MX server with
+        the provided (observed) fields, the verdict is only written
+        (and its age reset) when it changes or when renewed.
+
+        :param domain: The domain of the verdict.
+        :param mx_server: The MX server that handles the domain.
+        :param renew: If the verdict should be written even if it did
+        not change, as when it has just been probed again.
+        :return: The updated verdict.
+        """
+
+        verdict = self.get(domain, mx_server)
+        updated = verdict._replace(**kwargs)
+        if renew or not updated == verdict:
+            self.cache.set((domain, mx_server), updated, ttl=self.ttl)
+        return updated
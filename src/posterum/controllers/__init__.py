@@ -1,3 +1,5 @@
 from .address import AddressController
 from .base import BaseController
+from .job import JobController
+from .metrics import MetricsController
 from .root import RootController
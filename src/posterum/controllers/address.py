@@ -1,9 +1,10 @@
 import appier
 
-from json import dumps
 from typing import cast
 
-from posterum.common import SMTPVerifier
+from posterum.common import SMTPVerifier, ValidationResult
+from posterum.common.admission import PRIORITIES
+from posterum.common.stream import extract_addresses
 
 from .root import RootController
 
@@ -16,6 +17,8 @@ class AddressController(RootController):
         address = self.field("email")
         address = self.field("address", address)
         cache = self.field("cache", None, cast=bool)
+        profile = self.field("profile", None, cast=bool)
+        priority = self.field("priority", "interactive")
         key = self.field("key")
 
         if secret_key and not key == secret_key:
@@ -24,10 +27,45 @@ class AddressController(RootController):
         if not address:
             raise appier.OperationalError(message="Missing email address")
 
+        if not priority in PRIORITIES:
+            raise appier.OperationalError(message=f"Invalid priority {priority}")
+
         # runs the effective SMTP validation test for the address
         # and obtains the result of the validation, to be used in
         # the sending of the response
-        result = await SMTPVerifier.validate_email(address, cache=cache)
+        result = await SMTPVerifier.validate_email(
+            address, cache=cache, profile=profile, priority=priority
+        )
+
+        self.content_type("application/json")
+        return ValidationResult.serialize(address, result)
+
+    @appier.route("/v1/addresses/validate/batch", "POST", json=True)
+    async def validate_batch(self):
+        secret_key = cast(str | None, appier.conf("SECRET_KEY", None))
+        batch_limit = cast(int, appier.conf("BATCH_LIMIT", 10000, cast=int))
+
+        cache = self.field("cache", None, cast=bool)
+        key = self.field("key")
+
+        if secret_key and not key == secret_key:
+            raise appier.SecurityError(message="Invalid key")
+
+        # the body may be either the plain list of addresses or an
+        # object containing them under the addresses (or emails) key,
+        # its errors being user errors (400) honored by appier
+        addresses = extract_addresses(appier.request_json(), limit=batch_limit)
+
+        # runs the SMTP validation for the complete set of addresses
+        # grouping them by MX server to re-use the SMTP sessions
+        results = await SMTPVerifier.validate_emails(addresses, cache=cache)
 
         self.content_type("application/json")
-        return dumps(dict(address=address, **(result.to_dict() if result else {})))
+        return (
+            b"["
+            + b",".join(
+                ValidationResult.serialize(address, result)
+                for address, result in zip(addresses, results)
+            )
+            + b"]"
+        )
@@ -0,0 +1,98 @@
+import json
+import appier
+
+from typing import cast
+
+from posterum.common import JOB_MANAGER, JOBS_LIMIT
+from posterum.common.stream import extract_addresses, read_addresses
+
+from .root import RootController
+
+
+class JobController(RootController):
+    @appier.route("/v1/jobs", "POST", json=True)
+    async def create(self):
+        secret_key = cast(str | None, appier.conf("SECRET_KEY", None))
+
+        cache = self.field("cache", None, cast=bool)
+        key = self.field("key")
+        file = self.field("file", None)
+
+        if secret_key and not key == secret_key:
+            raise appier.SecurityError(message="Invalid key")
+
+        # the addresses may come from an uploaded (CSV or NDJSON) file,
+        # from a JSON list (or object with the addresses key) or from
+        # the raw CSV or NDJSON body, with the format being inferred
+        # from the file name or from the content type
+        content_type = self.request.get_header("Content-Type") or ""
+        if file:
+            name, mime, data = file[0] or "", file[1] or "", file[2]
+            is_csv = name.lower().endswith(".csv") or "csv" in mime
+            addresses = await read_addresses(
+                data, input_format="csv" if is_csv else "ndjson"
+            )
+        elif "json" in content_type and not "ndjson" in content_type:
+            addresses = extract_addresses(appier.request_json())
+        else:
+            addresses = await read_addresses(
+                self.request.get_data() or b"",
+                input_format="csv" if "csv" in content_type else "ndjson",
+            )
+
+        if not addresses:
+            raise appier.OperationalError(message="Missing email addresses")
+
+        if len(addresses) > JOBS_LIMIT:
+            raise appier.OperationalError(
+                message=f"Too many email addresses (limit is {JOBS_LIMIT})"
+            )
+
+        job = JOB_MANAGER.submit(addresses, cache=cache)
+
+        self.request.set_code(202)
+        return job.to_dict()
+
+    @appier.route("/v1/jobs/<str:job_id>", "GET", json=True)
+    async def show(self, job_id: str):
+        secret_key = cast(str | None, appier.conf("SECRET_KEY", None))
+
+        offset = self.field("offset", 0, cast=int)
+        limit = self.field("limit", 1000, cast=int)
+        key = self.field("key")
+
+        if secret_key and not key == secret_key:
+            raise appier.SecurityError(message="Invalid key")
+
+        job = JOB_MANAGER.store.get(job_id)
+        if not job:
+            raise appier.NotFoundError(message=f"Job not found: {job_id}")
+
+        # the (pre-serialized) results are paginated in completion order
+        # so that they can be retrieved while the job is still running
+        results = JOB_MANAGER.store.results(
+            job_id, offset=offset, limit=min(limit, 10000)
+        )
+
+        self.content_type("application/json")
+        return (
+            json.dumps(dict(job.to_dict(), offset=offset))[:-1].encode("utf-8")
+            + b',"results":['
+            + ",".join(results).encode("utf-8")
+            + b"]}"
+        )
+
+    @appier.route("/v1/jobs/<str:job_id>", "DELETE", json=True)
+    async def cancel(self, job_id: str):
+        secret_key = cast(str | None, appier.conf("SECRET_KEY", None))
+
+        key = self.field("key")
+
+        if secret_key and not key == secret_key:
+            raise appier.SecurityError(message="Invalid key")
+
+        job = JOB_MANAGER.cancel(job_id)
+        if not job:
+            raise appier.NotFoundError(message=f"Job not found: {job_id}")
+
+        return job.to_dict()
@@ -0,0 +1,12 @@
+import appier
+
+from posterum.common import METRICS
+
+from .root import RootController
+
+
+class MetricsController(RootController):
+    @appier.route("/metrics", "GET")
+    async def metrics(self):
+        self.content_type("text/plain; version=0.0.4; charset=utf-8")
+        return METRICS.render()
@@ -17,6 +17,17 @@ class PosterumApp(appier.WebApp):
         if os.name == "nt":
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
+        from .common import CACHE_SNAPSHOTS
+
+        CACHE_SNAPSHOTS.start()
+
+    def stop(self, refresh=True):
+        from .common import CACHE_SNAPSHOTS, JOB_MANAGER
+
+        JOB_MANAGER.stop()
+        CACHE_SNAPSHOTS.stop()
+        appier.WebApp.stop(self, refresh=refresh)
+
     def _version(self):
         return "0.1.1"
 
@@ -0,0 +1,166 @@
+import os
+import asyncio
+
+from json import loads
+from typing import Any
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+from starlette.types import Message
+
+import app
+
+from posterum.common.jobs import JobManager, MemoryJobStore
+
+
+class AppTest(IsolatedAsyncioTestCase):
+    """
+    Runs the endpoints of the FastAPI app through its ASGI interface.
+    """
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        body: bytes = b"",
+        content_type: str = "application/json",
+    ) -> tuple[int, Any]:
+        path, _, query = path.partition("?")
+        scope = dict(
+            type="http",
+            asgi=dict(version="3.0"),
+            http_version="1.1",
+            method=method,
+            scheme="http",
+            path=path,
+            raw_path=path.encode("utf-8"),
+            query_string=query.encode("utf-8"),
+            root_path="",
+            headers=[(b"content-type", content_type.encode("utf-8"))],
+            client=("127.0.0.1", 8080),
+            server=("localhost", 8080),
+        )
+        messages = [dict(type="http.request", body=body, more_body=False)]
+        sent: list[Message] = []
+
+        async def receive() -> Message:
+            return messages.pop(0) if messages else dict(type="http.disconnect")
+
+        async def send(message: Message):
+            sent.append(message)
+
+        await app.app(scope, receive, send)
+        data = b"".join(message.get("body", b"") for message in sent[1:])
+        return sent[0]["status"], loads(data)
+
+
+class TestAddresses(AppTest):
+    async def test_batch(self):
+        # the invalid addresses are validated with no network work
+        for body in (b'["joao", "maria@"]', b'{"addresses": ["joao", "maria@"]}'):
+            code, results = await self.request(
+                "POST", "/v1/addresses/validate/batch", body
+            )
+            self.assertEqual(code, 200)
+            self.assertEqual(
+                [result["address"] for result in results], ["joao", "maria@"]
+            )
+
+    async def test_batch_errors(self):
+        for body, message in (
+            (b"[]", "Missing email addresses"),
+            (b'{"emails": []}', "Missing email addresses"),
+            (b'"joao@a.com"', "Invalid email addresses (expected a list of strings)"),
+            (
+                b'{"addresses": [1]}',
+                "Invalid email addresses (expected a list of strings)",
+            ),
+            (b"[", "Invalid JSON body"),
+        ):
+            code, error = await self.request(
+                "POST", "/v1/addresses/validate/batch", body
+            )
+            self.assertEqual(code, 400)
+            self.assertEqual(error["name"], "UserError")
+            self.assertEqual(error["message"], message)
+
+        with patch.dict(os.environ, BATCH_LIMIT="1"):
+            code, error = await self.request(
+                "POST", "/v1/addresses/validate/batch", b'["joao", "maria@"]'
+            )
+        self.assertEqual(code, 400)
+        self.assertEqual(error["message"], "Too many email addresses (limit is 1)")
+
+
+class TestJobs(AppTest):
+    """
+    Runs the jobs endpoints of the FastAPI app against a job manager
+    with a single worker process.
+    """
+
+    async def asyncSetUp(self):
+        self.manager = JobManager(store=MemoryJobStore(), workers=1)
+        patcher = patch.object(app, "JOB_MANAGER", self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        self.manager.stop()
+
+    async def wait(self, job_id: str) -> dict[str, Any]:
+        for _ in range(600):
+            code, job = await self.request("GET", f"/v1/jobs/{job_id}")
+            self.assertEqual(code, 200)
+            if not job["status"] == "running":
+                return job
+            await asyncio.sleep(0.05)
+        self.fail("job not finished")
+
+    async def test_create(self):
+        # the invalid addresses are validated with no network work
+        code, job = await self.request("POST", "/v1/jobs", b'["joao", "maria@"]')
+        self.assertEqual(code, 202)
+        self.assertEqual(job["total"], 2)
+
+        job = await self.wait(job["id"])
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["processed"], 2)
+        self.assertEqual(
+            sorted((result["index"], result["status"]) for result in job["results"]),
+            [(0, "invalid"), (1, "invalid")],
+        )
+
+        code, page = await self.request("GET", f"/v1/jobs/{job['id']}?offset=1&limit=5")
+        self.assertEqual(code, 200)
+        self.assertEqual(page["offset"], 1)
+        self.assertEqual(len(page["results"]), 1)
+
+        # a finished job is no longer cancelled
+        code, cancelled = await self.request("DELETE", f"/v1/jobs/{job['id']}")
+        self.assertEqual(code, 200)
+        self.assertEqual(cancelled["status"], "completed")
+
+    async def test_csv(self):
+        code, job = await self.request(
+            "POST", "/v1/jobs", b"email\njoao\nmaria@\n@\n", content_type="text/csv"
+        )
+        self.assertEqual(code, 202)
+        self.assertEqual(job["total"], 3)
+        job = await self.wait(job["id"])
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(len(job["results"]), 3)
+
+    async def test_errors(self):
+        code, error = await self.request("POST", "/v1/jobs", b"[]")
+        self.assertEqual(code, 400)
+        self.assertEqual(error["name"], "UserError")
+
+        code, error = await self.request("POST", "/v1/jobs", b'{"addresses": "joao"}')
+        self.assertEqual(code, 400)
+        self.assertEqual(error["name"], "UserError")
+
+        code, error = await self.request("GET", "/v1/jobs/unknown")
+        self.assertEqual(code, 404)
+        self.assertEqual(error["name"], "NotFoundError")
+
+        code, error = await self.request("DELETE", "/v1/jobs/unknown")
+        self.assertEqual(code, 404)
@@ -0,0 +1,101 @@
+import asyncio
+
+from unittest import IsolatedAsyncioTestCase
+
+from posterum.common.admission import AdmissionController
+from posterum.common.errors import OverloadedError
+
+
+class TestAdmissionController(IsolatedAsyncioTestCase):
+    async def test_priority(self):
+        admission = AdmissionController(limit=1, max_wait=5.0)
+        order: list[str] = []
+        release = asyncio.Event()
+
+        async def run(name: str, priority):
+            async with admission.slot(priority):
+                order.append(name)
+                await release.wait()
+
+        first = asyncio.ensure_future(run("first", "interactive"))
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.ensure_future(run("bulk", "bulk")),
+            asyncio.ensure_future(run("interactive", "interactive")),
+        ]
+        await asyncio.sleep(0)
+        self.assertEqual(admission.active, 1)
+        self.assertEqual(admission.queued(), 2)
+
+        release.set()
+        await asyncio.gather(first, *tasks)
+        self.assertEqual(order, ["first", "interactive", "bulk"])
+        self.assertEqual(admission.active, 0)
+        self.assertEqual(admission.queued(), 0)
+
+    async def test_shed(self):
+        admission = AdmissionController(limit=1, max_wait=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.slot():
+                await release.wait()
+
+        task = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+
+        # the wait is given up once it exceeds the maximum wait
+        with self.assertRaises(OverloadedError) as context:
+            async with admission.slot("bulk"):
+                pass
+        self.assertEqual(context.exception.code, 429)
+        self.assertEqual(context.exception.headers, {"Retry-After": "1"})
+        self.assertEqual(admission.queued(), 0)
+
+        # with a known hold time the estimated wait sheds right away
+        admission._service = 10.0
+        with self.assertRaises(OverloadedError) as context:
+            async with admission.slot("interactive"):
+                pass
+        self.assertEqual(context.exception.code, 503)
+        self.assertEqual(context.exception.retry_after, 10.0)
+        self.assertEqual(admission.sheds, dict(interactive=1, bulk=1))
+
+        # the operations that may not be shed wait for their admission
+        admitted = asyncio.Event()
+
+        async def wait():
+            async with admission.slot("bulk", shed=False):
+                admitted.set()
+
+        waiter = asyncio.ensure_future(wait())
+        await asyncio.sleep(0.1)
+        self.assertFalse(admitted.is_set())
+        release.set()
+        await asyncio.gather(task, waiter)
+        self.assertTrue(admitted.is_set())
+        self.assertEqual(admission.active, 0)
+
+    async def test_cancel(self):
+        admission = AdmissionController(limit=1, max_wait=5.0)
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.slot():
+                await release.wait()
+
+        task = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        self.assertEqual(admission.queued(), 1)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual(admission.queued(), 0)
+
+        release.set()
+        await task
+        self.assertEqual(admission.active, 0)
+        async with admission.slot():
+            self.assertEqual(admission.active, 1)
@@ -1,6 +1,27 @@
-from unittest import IsolatedAsyncioTestCase
+import os
+import asyncio
+import tempfile
 
-from posterum import MemoryCache
+from time import sleep, time
+from threading import Thread
+from types import ModuleType
+from unittest import IsolatedAsyncioTestCase, TestCase, skipIf
+
+from posterum import (
+    CacheSnapshots,
+    MemoryCache,
+    RedisCache,
+    SharedCache,
+    Snapshot,
+    TieredCache,
+)
+from posterum.common.cache import CacheItem
+
+fakeredis: ModuleType | None
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
 
 
 class TestCache(IsolatedAsyncioTestCase):
@@ -45,3 +66,342 @@ class TestCache(IsolatedAsyncioTestCase):
         self.assertEqual(self.cache["key"], "value")
         del self.cache["key"]
         self.assertFalse("key" in self.cache)
+
+    def test_max_size(self):
+        cache = MemoryCache(max_size=2)
+        cache.set("first", 1)
+        cache.set("second", 2)
+        self.assertEqual(cache.get("first"), 1)
+        cache.set("third", 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertTrue("first" in cache)
+        self.assertFalse("second" in cache)
+        self.assertTrue("third" in cache)
+
+    def test_max_size_expired(self):
+        cache = MemoryCache(max_size=2)
+        cache.set("first", 1, ttl=-1.0)
+        cache.set("second", 2)
+        cache.set("third", 3)
+        self.assertEqual(cache.evictions, 0)
+        self.assertFalse("first" in cache)
+        self.assertTrue("second" in cache)
+        self.assertTrue("third" in cache)
+
+    def test_admission(self):
+        cache = MemoryCache(max_size=1, admission=True)
+        cache.set("first", 1)
+        for _ in range(3):
+            cache.get("first")
+        cache.set("second", 2)
+        self.assertTrue("first" in cache)
+        self.assertFalse("second" in cache)
+        for _ in range(5):
+            cache.get("second")
+        cache.set("second", 2)
+        self.assertFalse("first" in cache)
+        self.assertTrue("second" in cache)
+
+    def test_sweep(self):
+        self.cache.set("first", 1, ttl=-1.0)
+        self.cache.set("second", 2, ttl=-1.0)
+        self.cache.set("third", 3, ttl=3600.0)
+        self.cache.set("fourth", 4)
+        self.assertEqual(self.cache.sweep(), 2)
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.cache.sweep(), 0)
+
+    async def test_sweeper(self):
+        cache = MemoryCache(sweep_interval=0.01)
+        cache.set("key", "value", ttl=0.005)
+        self.assertEqual(len(cache), 1)
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(cache), 0)
+        cache.stop()
+
+
+@skipIf(fakeredis is None, "fakeredis not available")
+class TestRedisCache(TestCase):
+    def setUp(self):
+        self.client = fakeredis.FakeRedis()
+        self.cache = RedisCache(namespace="test", client=self.client)
+
+    def test_set_and_get(self):
+        self.cache.set(("key", "other"), "value")
+        self.assertEqual(self.cache.get(("key", "other")), "value")
+        self.assertEqual(self.cache.get("non_existent_key"), None)
+
+        self.cache.set("key", [1, 2], ttl=3600.0)
+        item = self.cache.get_item("key")
+        self.assertEqual(item.value, [1, 2])
+        self.assertEqual(item.timeout, item.timestamp + 3600.0)
+        self.assertGreater(self.client.pttl(self.cache.key("key")), 0)
+
+        self.cache.set("key", "value", ttl=-1.0)
+        self.assertEqual(self.cache.get("key"), None)
+
+    def test_delete(self):
+        self.cache.set("key", "value")
+        self.assertTrue("key" in self.cache)
+        del self.cache["key"]
+        self.assertFalse("key" in self.cache)
+        self.assertRaises(KeyError, self.cache.delete, "key")
+
+    def test_bulk(self):
+        self.cache.set_items([("first", 1), ("second", 2)], ttl=3600.0)
+        items = self.cache.get_items(["first", "third", "second"])
+        self.assertEqual([item.value if item else None for item in items], [1, None, 2])
+
+    def test_encoder(self):
+        cache = RedisCache(
+            namespace="encoded",
+            client=self.client,
+            encoder=lambda value: sorted(value),
+            decoder=lambda value: set(value),
+        )
+        cache.set("key", set([2, 1]))
+        self.assertEqual(cache.get("key"), set([1, 2]))
+
+
+@skipIf(fakeredis is None, "fakeredis not available")
+class TestTieredCache(TestCase):
+    def setUp(self):
+        self.client = fakeredis.FakeRedis()
+        self.cache = TieredCache(RedisCache(namespace="test", client=self.client))
+        self.other = TieredCache(RedisCache(namespace="test", client=self.client))
+
+    def tearDown(self):
+        self.cache.stop()
+        self.other.stop()
+
+    def test_set_and_get(self):
+        self.cache.set("key", "value", ttl=3600.0)
+        self.assertEqual(self.cache.get("key"), "value")
+        self.assertEqual(self.other.get("key"), "value")
+        self.assertEqual(len(self.other.local), 1)
+        self.assertEqual(
+            self.other.get_item("key").timestamp, self.cache.get_item("key").timestamp
+        )
+
+    def test_invalidation(self):
+        self.cache.set("key", "value")
+        self.assertEqual(self.other.get("key"), "value")
+        self.cache.set("key", "other_value")
+        for _ in range(100):
+            if not len(self.other.local):
+                break
+            sleep(0.01)
+        self.assertEqual(self.other.get("key"), "other_value")
+
+    def test_invalidation_lock(self):
+        self.other.set("key", "value")
+        local_key = self.other.remote.key("key")
+
+        # the invalidation (from the listener thread) waits for the
+        # access to the L1 cache in progress to be over
+        with self.other._lock:
+            thread = Thread(
+                target=self.other._on_invalidate,
+                args=(dict(data=f"{self.cache.id} {local_key}"),),
+            )
+            thread.start()
+            thread.join(0.05)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(len(self.other.local), 1)
+        thread.join()
+        self.assertEqual(len(self.other.local), 0)
+
+    def test_sweep_lock(self):
+        self.other.set("key", "value", ttl=0.01)
+        sleep(0.02)
+
+        # the (background) sweep of the L1 cache is serialized with the
+        # invalidations, as it holds the same lock
+        self.assertIs(self.other.local.lock, self.other._lock)
+        with self.other._lock:
+            thread = Thread(target=self.other.local.sweep)
+            thread.start()
+            thread.join(0.05)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(len(self.other.local), 1)
+        thread.join()
+        self.assertEqual(len(self.other.local), 0)
+
+    def test_get_items(self):
+        self.cache.set_items([("first", 1), ("second", 2)])
+        items = self.other.get_items(["first", "third", "second"])
+        self.assertEqual([item.value if item else None for item in items], [1, None, 2])
+
+
+class TestSharedCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = SharedCache("test", path=self.directory.name, slots=64)
+        self.other = SharedCache("test", path=self.directory.name, slots=64)
+
+    def tearDown(self):
+        self.cache.stop()
+        self.other.stop()
+        self.directory.cleanup()
+
+    def test_set_and_get(self):
+        self.cache.set(("email", "mx"), ["mx1", "mx2"])
+        self.cache.set("key", "value", ttl=3600.0)
+        self.assertEqual(self.other.get(("email", "mx")), ["mx1", "mx2"])
+        self.assertEqual(self.other.get("key"), "value")
+        self.assertEqual(self.other.get("unknown", "default"), "default")
+        self.cache.set("key", "other_value")
+        self.assertEqual(self.other.get_item("key").timeout, None)
+        self.assertEqual(self.other.get("key"), "other_value")
+        self.assertEqual(len(self.other), 2)
+
+    def test_expired(self):
+        self.cache.set("key", "value", ttl=0.05)
+        sleep(0.1)
+        self.assertFalse(self.other.contains("key"))
+        self.assertRaises(KeyError, self.other.get_item, "key")
+
+    def test_delete(self):
+        self.cache.set("key", "value")
+        self.other.delete("key")
+        self.assertFalse("key" in self.cache)
+        self.assertRaises(KeyError, self.cache.delete, "key")
+
+    def test_eviction(self):
+        for index in range(256):
+            self.cache.set(f"key{index}", index)
+        self.assertEqual(self.other.get("key255"), 255)
+        self.assertEqual(len(self.other), 64)
+        self.assertEqual(self.cache.evictions, 256 - 64)
+
+    def test_oversized(self):
+        self.cache.set("key", "x" * 1024)
+        self.assertFalse("key" in self.other)
+        self.assertEqual(self.cache.oversized, 1)
+
+    def test_layout(self):
+        self.cache.set("key", "value")
+        cache = SharedCache("test", path=self.directory.name, slots=128)
+        try:
+            self.assertFalse("key" in cache)
+        finally:
+            cache.stop()
+
+
+class TestSnapshot(TestCase):
+    def setUp(self):
+        # the directory is removed by a cleanup, so that the restores
+        # (closed by cleanups added later) are over by then
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "cache.db")
+        self.addCleanup(self.directory.cleanup)
+
+    def test_save_and_load(self):
+        cache = MemoryCache()
+        cache.set(("email", "mx"), "value", ttl=3600.0)
+        cache.set("key", "other_value")
+        cache.set("expired", "value", ttl=-1.0)
+        snapshot = Snapshot(self.path, "test")
+        self.assertEqual(snapshot.save(cache.items()), 2)
+
+        items = dict(item for batch in snapshot.iter_items() for item in batch)
+        self.assertEqual(len(items), 2)
+        self.assertEqual(items[("email", "mx")], cache.get_item(("email", "mx")))
+        self.assertEqual(items["key"], cache.get_item("key"))
+
+        self.assertEqual(snapshot.save([]), 0)
+        self.assertEqual(list(snapshot.iter_items()), [])
+
+    def test_namespaces(self):
+        Snapshot(self.path, "first").save([("key", CacheItem(1, time(), None))])
+        Snapshot(self.path, "second").save([("key", CacheItem(2, time(), None))])
+        self.assertEqual(Snapshot(self.path, "first").get_item("key").value, 1)
+        self.assertEqual(Snapshot(self.path, "second").get_item("key").value, 2)
+
+    def test_restore(self):
+        cache = MemoryCache()
+        for index in range(1000):
+            cache.set(("email", index), index, ttl=3600.0)
+        snapshot = Snapshot(self.path, "test")
+        snapshot.save(cache.items())
+
+        restored = MemoryCache()
+        restored.set(("email", 0), -1)
+        restored.restore(snapshot, batch_size=100)
+        self.addCleanup(restored.close)
+
+        # keys are available (from the snapshot) before being merged
+        self.assertEqual(restored.get(("email", 999)), 999)
+        self.assertEqual(
+            restored.get_item(("email", 999)), cache.get_item(("email", 999))
+        )
+        self.assertEqual(restored.get(("email", 0)), -1)
+        self.assertEqual(restored.get(("email", 1000)), None)
+
+        for _ in range(1000):
+            if not restored.restoring:
+                break
+            restored.get(("email", 1000))
+            sleep(0.001)
+        self.assertFalse(restored.restoring)
+        self.assertEqual(len(restored), 1000)
+        self.assertEqual(restored.get(("email", 0)), -1)
+        self.assertEqual(
+            restored.get_item(("email", 500)), cache.get_item(("email", 500))
+        )
+
+    def test_restore_full(self):
+        cache = MemoryCache()
+        for index in range(20000):
+            cache.set(("email", index), index, ttl=3600.0)
+        snapshot = Snapshot(self.path, "test")
+        snapshot.save(cache.items())
+
+        restored = MemoryCache(max_size=100)
+        restored.restore(snapshot, batch_size=1000)
+        self.addCleanup(restored.close)
+
+        # the merge stops once the cache is full, with the keys looked
+        # up still being restored from the snapshot
+        self.assertEqual(restored.get(("email", 19999)), 19999)
+        for _ in range(1000):
+            if not restored.restoring:
+                break
+            restored.sweep()
+            sleep(0.001)
+        self.assertFalse(restored.restoring)
+        self.assertEqual(len(restored), 100)
+        self.assertLessEqual(restored.evictions, 1)
+
+    def test_close(self):
+        cache = MemoryCache()
+        for index in range(1000):
+            cache.set(("email", index), index, ttl=3600.0)
+        snapshot = Snapshot(self.path, "test")
+        snapshot.save(cache.items())
+
+        restored = MemoryCache()
+        restored.restore(snapshot, batch_size=10)
+        thread = restored._restorer
+        restored.close()
+        self.assertFalse(restored.restoring)
+        self.assertFalse(thread and thread.is_alive())
+        self.assertEqual(restored.get(("email", 999)), None)
+
+    def test_snapshots(self):
+        cache = MemoryCache()
+        cache.set("key", "value", ttl=3600.0)
+        snapshots = CacheSnapshots(self.path, interval=3600.0)
+        snapshots.add("test", cache)
+        snapshots.add("redis", RedisCache(client=object()))
+        self.assertEqual(len(snapshots.snapshots), 1)
+        snapshots.start()
+        snapshots.stop()
+
+        restored = MemoryCache()
+        snapshots = CacheSnapshots(self.path)
+        snapshots.add("test", restored)
+        snapshots.restore()
+        self.addCleanup(restored.close)
+        self.assertEqual(restored.get("key"), "value")
@@ -0,0 +1,99 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+from unittest import TestCase, mock
+
+import posterum
+
+from posterum.common import config
+from posterum.common.config import CONFIG, conf
+
+
+class TestConfig(TestCase):
+    def test_conf(self):
+        environ = dict(POSTERUM_INT="3", POSTERUM_BOOL="1", POSTERUM_LIST="a;b")
+        with mock.patch.dict(os.environ, environ), mock.patch.dict(CONFIG.CONFIGS):
+            CONFIG.load_env()
+            self.assertEqual(conf("POSTERUM_INT", 1, cast=int), 3)
+            self.assertEqual(conf("POSTERUM_BOOL", False, cast=bool), True)
+            self.assertEqual(conf("POSTERUM_LIST", [], cast=list), ["a", "b"])
+            self.assertEqual(conf("POSTERUM_UNSET", 2.5, cast=float), 2.5)
+            self.assertEqual(conf("POSTERUM_UNSET", None, cast=float), None)
+
+    def test_fallback(self):
+        # without appier the configuration comes from the environment
+        environ = dict(POSTERUM_INT="3", POSTERUM_BOOL="1", POSTERUM_LIST="a;b")
+        with mock.patch.dict(os.environ, environ), mock.patch.object(
+            config, "CONFIG", None
+        ):
+            self.assertEqual(conf("POSTERUM_INT", 1, cast=int), 3)
+            self.assertEqual(conf("POSTERUM_BOOL", False, cast=bool), True)
+            self.assertEqual(conf("POSTERUM_LIST", [], cast=list), ["a", "b"])
+            self.assertEqual(conf("POSTERUM_UNSET", None, cast=float), None)
+
+    def test_files(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        home = os.path.join(directory.name, "home")
+        os.makedirs(os.path.join(home, ".config"))
+        with open(os.path.join(home, "appier.json"), "w") as file:
+            json.dump(
+                {"POSTERUM_INT": 1, "POSTERUM_NAME": "home", "$import": "extra.json"},
+                file,
+            )
+        with open(os.path.join(home, "extra.json"), "w") as file:
+            json.dump(dict(POSTERUM_EXTRA="extra", POSTERUM_NAME="extra"), file)
+        with open(os.path.join(home, ".config", "appier.json"), "w") as file:
+            json.dump(dict(POSTERUM_INT=2), file)
+        with open(os.path.join(directory.name, ".env"), "w") as file:
+            file.write('# comment\nPOSTERUM_DOT="dot env"\nPOSTERUM_ENV=dot\n')
+
+        cwd = os.getcwd()
+        os.chdir(directory.name)
+        self.addCleanup(os.chdir, cwd)
+        environ = dict(POSTERUM_ENV="environ")
+        with mock.patch.dict(os.environ, environ), mock.patch.dict(
+            CONFIG.CONFIGS, clear=True
+        ), mock.patch.object(CONFIG, "HOMES", [home]):
+            CONFIG.load()
+            self.assertEqual(conf("POSTERUM_INT", 0, cast=int), 2)
+            self.assertEqual(conf("POSTERUM_NAME"), "home")
+            self.assertEqual(conf("POSTERUM_EXTRA"), "extra")
+            self.assertEqual(conf("POSTERUM_DOT"), "dot env")
+            self.assertEqual(conf("POSTERUM_ENV"), "environ")
+            self.assertEqual(conf("POSTERUM_UNSET", "default"), "default")
+
+    def test_order(self):
+        # the configuration is the same (appier's one) no matter if the
+        # appier app is imported before or after the configuration
+        imports = (
+            "import appier; from posterum.common import config",
+            "from posterum.common import config; import appier",
+        )
+        for _imports in imports:
+            code = (
+                f"{_imports}; assert appier.config is config.CONFIG; "
+                "appier.conf_s('POSTERUM_ORDER', 'set'); "
+                "assert config.conf('POSTERUM_ORDER') == 'set'; "
+                "assert config.conf('POSTERUM_INT', cast=int) == 3; "
+                "assert appier.App"
+            )
+            path = os.path.dirname(os.path.dirname(posterum.__file__))
+            env = dict(os.environ, PYTHONPATH=path, POSTERUM_INT="3")
+            with self.subTest(imports=_imports):
+                subprocess.check_call([sys.executable, "-c", code], env=env)
+
+    def test_lazy(self):
+        # a fresh interpreter is required as appier may already have
+        # been imported by the other tests
+        code = (
+            "import sys, posterum; posterum.SMTPVerifier; posterum.JOB_MANAGER; "
+            "assert not 'appier' in sys.modules; posterum.PosterumApp; "
+            "assert 'appier' in sys.modules"
+        )
+        path = os.path.dirname(os.path.dirname(posterum.__file__))
+        env = dict(os.environ, PYTHONPATH=path)
+        subprocess.check_call([sys.executable, "-c", code], env=env)
@@ -0,0 +1,198 @@
+import random
+import asyncio
+
+from typing import Any, NamedTuple, Sequence
+from aiodns.error import ARES_ENODATA, ARES_ENOTFOUND, DNSError
+
+Record = NamedTuple("Record", [("host", str), ("priority", int), ("ttl", int)])
+
+
+class FakeSMTPServer:
+    """
+    In-process stand-in for an SMTP server, answering the subset of the
+    protocol used by the verifier with configurable behaviour, so that
+    benchmarks can run without reaching any real MX server.
+
+    Recipients whose local part starts with one of the rejected prefixes
+    are refused with 550, unless their domain is a catch-all one, in
+    which case every recipient is accepted.
+
+    :param hosts: The (loopback) addresses the server listens on.
+    :param port: The port the server listens on, random if zero.
+    :param latency: The delay (in seconds) before each reply.
+    :param jitter: The maximum random delay added to the latency.
+    :param greylist: If the first RCPT of each recipient should be
+    temporarily refused (451), as done by greylisting servers.
+    :param reject_prefixes: The local part prefixes refused with 550.
+    :param catch_all_domains: The domains that accept any recipient.
+    :param forward_prefixes: The local part prefixes accepted to be
+    forwarded (251) instead of being delivered locally.
+    :param policy_prefixes: The local part prefixes refused by policy
+    (550 5.7.1), as done for the recipients blocked one by one.
+    :param policy_domains: The domains whose every recipient is refused
+    by policy (550 5.7.1), as done by servers that block the sender.
+    :param stall_hosts: The addresses on which connections are accepted
+    but never answered, causing connect timeouts on the client.
+
+    Every command received is logged (together with the address the
+    connection was made to) in `log`, for the tests to inspect, with
+    the peak number of concurrent connections kept in `peak`.
+    """
+
+    def __init__(
+        self,
+        hosts: Sequence[str] = ("127.0.0.1",),
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        greylist: bool = False,
+        reject_prefixes: Sequence[str] = ("bad", "averylargemail"),
+        catch_all_domains: Sequence[str] = (),
+        forward_prefixes: Sequence[str] = (),
+        policy_prefixes: Sequence[str] = (),
+        policy_domains: Sequence[str] = (),
+        stall_hosts: Sequence[str] = (),
+    ) -> None:
+        self.hosts = list(hosts)
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.greylist = greylist
+        self.reject_prefixes = tuple(reject_prefixes)
+        self.catch_all_domains = set(catch_all_domains)
+        self.forward_prefixes = tuple(forward_prefixes)
+        self.policy_prefixes = tuple(policy_prefixes)
+        self.policy_domains = set(policy_domains)
+        self.stall_hosts = set(stall_hosts)
+        self.connections = 0
+        self.active = 0
+        self.peak = 0
+        self.commands = 0
+        self.log: list[tuple[str, str]] = []
+        self._greylisted: set[str] = set()
+        self._servers: list[asyncio.Server] = []
+
+    async def start(self) -> "FakeSMTPServer":
+        # with a random port the one picked for the first address is
+        # used for the other ones, so that every address is served on
+        # the same port (as used by the verifier for every MX server)
+        for host in self.hosts:
+            server = await asyncio.start_server(self._handle, host=host, port=self.port)
+            self.port = server.sockets[0].getsockname()[1]
+            self._servers.append(server)
+        return self
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+        self._servers = []
+
+    async def __aenter__(self) -> "FakeSMTPServer":
+        return await self.start()
+
+    async def __aexit__(self, *args: Any):
+        await self.stop()
+
+    def rcpt(self, address: str) -> bytes:
+        address = address.strip("<>")
+        local, _, domain = address.partition("@")
+        if domain.lower() in self.policy_domains or (
+            self.policy_prefixes and local.lower().startswith(self.policy_prefixes)
+        ):
+            return b"550 5.7.1 Recipient refused by policy\r\n"
+        if domain.lower() in self.catch_all_domains:
+            return b"250 2.1.5 OK\r\n"
+        if self.forward_prefixes and local.lower().startswith(self.forward_prefixes):
+            return b"251 2.1.5 User not local; will forward\r\n"
+        if local.lower().startswith(self.reject_prefixes):
+            return b"550 5.1.1 The email account that you tried to reach does not exist\r\n"
+        if self.greylist and not address in self._greylisted:
+            self._greylisted.add(address)
+            return b"451 4.7.1 Greylisted, please try again later\r\n"
+        return b"250 2.1.5 OK\r\n"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        host = writer.get_extra_info("sockname")[0]
+        try:
+            if host in self.stall_hosts:
+                await reader.read()
+                return
+            await self._reply(writer, b"220 fake.posterum ESMTP ready\r\n")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.commands += 1
+                command = line.decode("utf-8", "replace").strip()
+                self.log.append((host, command))
+                verb, _, argument = command.partition(" ")
+                verb = verb.upper()
+                if verb in ("EHLO", "HELO"):
+                    reply = b"250-fake.posterum\r\n250-PIPELINING\r\n250 8BITMIME\r\n"
+                elif verb == "RCPT":
+                    reply = self.rcpt(argument.partition(":")[2].strip())
+                elif verb == "VRFY":
+                    reply = b"252 2.1.5 Cannot VRFY user\r\n"
+                elif verb == "QUIT":
+                    await self._reply(writer, b"221 2.0.0 Bye\r\n")
+                    break
+                elif verb in ("MAIL", "RSET", "NOOP"):
+                    reply = b"250 2.1.0 OK\r\n"
+                else:
+                    reply = b"502 5.5.1 Unrecognized command\r\n"
+                await self._reply(writer, reply)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.active -= 1
+            writer.close()
+
+    async def _reply(self, writer: asyncio.StreamWriter, data: bytes):
+        delay = self.latency + (random.random() * self.jitter if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        writer.write(data)
+        await writer.drain()
+
+
+class FakeResolver:
+    """
+    Stub DNS resolver, compatible with the subset of the `aiodns`
+    resolver used by `MXResolver`, answering from a static map of
+    domains to MX servers (with a default for unknown domains).
+
+    :param records: The map of domains to their (ordered) MX servers.
+    :param default: The MX servers of the domains not in the map, the
+    domains are handled as non existent when not set.
+    :param latency: The delay (in seconds) of each query.
+    :param ttl: The TTL of every answer.
+    """
+
+    def __init__(
+        self,
+        records: dict[str, list[str]] | None = None,
+        default: list[str] | None = None,
+        latency: float = 0.0,
+        ttl: int = 300,
+    ) -> None:
+        self.records = records or {}
+        self.default = default
+        self.latency = latency
+        self.ttl = ttl
+        self.queries = 0
+
+    async def query(self, domain: str, qtype: str) -> list[Record]:
+        self.queries += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        hosts = self.records.get(domain, self.default)
+        if hosts is None:
+            raise DNSError(ARES_ENOTFOUND, "Domain name not found")
+        if not qtype == "MX":
+            raise DNSError(ARES_ENODATA, "DNS server returned answer with no data")
+        return [
+            Record(host, (index + 1) * 10, self.ttl) for index, host in enumerate(hosts)
+        ]
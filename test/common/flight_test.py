@@ -0,0 +1,64 @@
+import asyncio
+
+from unittest import IsolatedAsyncioTestCase
+
+from posterum.common.flight import SingleFlight
+
+
+class TestSingleFlight(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.flight: SingleFlight[str] = SingleFlight()
+        self.calls = 0
+
+    async def _operation(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def _failing(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("failure")
+
+    async def test_coalesce(self):
+        results = await asyncio.gather(
+            *(self.flight.run("key", self._operation) for _ in range(5))
+        )
+        self.assertEqual(self.calls, 1)
+        self.assertEqual([value for value, _ in results], ["value"] * 5)
+        self.assertEqual([coalesced for _, coalesced in results].count(False), 1)
+        self.assertEqual(len(self.flight), 0)
+
+    async def test_different_keys(self):
+        await asyncio.gather(
+            self.flight.run("key", self._operation),
+            self.flight.run("other_key", self._operation),
+        )
+        self.assertEqual(self.calls, 2)
+
+    async def test_sequential(self):
+        _, coalesced = await self.flight.run("key", self._operation)
+        self.assertFalse(coalesced)
+        _, coalesced = await self.flight.run("key", self._operation)
+        self.assertFalse(coalesced)
+        self.assertEqual(self.calls, 2)
+
+    async def test_exception(self):
+        results = await asyncio.gather(
+            *(self.flight.run("key", self._failing) for _ in range(3)),
+            return_exceptions=True,
+        )
+        self.assertEqual(self.calls, 1)
+        for result in results:
+            self.assertIsInstance(result, RuntimeError)
+        self.assertFalse(self.flight.in_flight("key"))
+
+    async def test_cancel(self):
+        first = asyncio.ensure_future(self.flight.run("key", self._operation))
+        second = asyncio.ensure_future(self.flight.run("key", self._operation))
+        await asyncio.sleep(0)
+        first.cancel()
+        value, coalesced = await second
+        self.assertEqual(value, "value")
+        self.assertTrue(coalesced)
+        self.assertEqual(self.calls, 1)
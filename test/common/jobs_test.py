@@ -0,0 +1,301 @@
+import os
+import queue
+import pickle
+import asyncio
+import tempfile
+
+from json import loads
+from time import sleep, time
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from posterum import SMTPVerifier, ValidationResult
+from posterum.common.jobs import (
+    Chunk,
+    DiskJobStore,
+    Job,
+    JobManager,
+    MemoryJobStore,
+    _serve,
+)
+
+
+class TestJobStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.stores = (
+            MemoryJobStore(ttl=60.0),
+            DiskJobStore(os.path.join(self.directory.name, "jobs.db"), ttl=60.0),
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_results(self):
+        for store in self.stores:
+            job = Job(status="running", total=3)
+            store.create(job)
+            store.add_results(job.id, [(2, '{"index":2}'), (0, '{"index":0}')])
+            store.add_results(job.id, [(1, '{"index":1}')])
+            self.assertEqual(store.get(job.id).processed, 3)
+            self.assertEqual(
+                store.results(job.id),
+                ['{"index":2}', '{"index":0}', '{"index":1}'],
+            )
+            self.assertEqual(store.results(job.id, offset=1, limit=1), ['{"index":0}'])
+
+    def test_cancelled(self):
+        for store in self.stores:
+            job = Job(status="running", total=2)
+            store.create(job)
+            store.update(job.id, status="cancelled")
+            self.assertEqual(store.add_results(job.id, [(0, '{"index":0}')]), None)
+            self.assertEqual(store.get(job.id).to_dict()["status"], "cancelled")
+            self.assertEqual(store.results(job.id), [])
+
+    def test_delete(self):
+        for store in self.stores:
+            job = Job()
+            store.create(job)
+            store.delete(job.id)
+            self.assertEqual(store.get(job.id), None)
+            self.assertEqual(store.get("unknown"), None)
+
+    def test_shared(self):
+        memory, disk = self.stores
+        self.assertFalse(memory.shared)
+        self.assertTrue(disk.shared)
+
+        # the disk store is handed to the worker processes, which only
+        # need the location of the database to open their own
+        job = Job(status="running")
+        disk.create(job)
+        other = pickle.loads(pickle.dumps(disk))
+        self.assertEqual(other.path, disk.path)
+        self.assertEqual(other.get(job.id).status, "running")
+
+    def test_expire(self):
+        for store in self.stores:
+            finished = Job(status="completed", updated=time() - 120.0)
+            running = Job(status="running", updated=time() - 120.0)
+            recent = Job(status="cancelled")
+            for job in (finished, running, recent):
+                store.create(job)
+            store.add_results(running.id, [(0, '{"index":0}')])
+
+            # the finished jobs are removed as new jobs are created, once
+            # they have not been updated for the TTL
+            store.create(Job())
+            self.assertEqual(store.get(finished.id), None)
+            self.assertEqual(store.results(finished.id), [])
+            self.assertEqual(store.get(running.id).status, "running")
+            self.assertEqual(store.get(recent.id).status, "cancelled")
+
+
+class TestJobRunner(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.inbox = queue.Queue()
+        self.outbox = queue.Queue()
+        self.serve = asyncio.ensure_future(_serve(self.inbox, self.outbox, 2))
+
+    async def asyncTearDown(self):
+        self.inbox.put(None)
+        await self.serve
+
+    async def test_validate(self):
+        async def validate_emails(emails, cache=None, shed=True, deadline=None):
+            self.assertFalse(shed)
+            self.assertIsNone(deadline.when)
+            return [ValidationResult(result=True, status="deliverable")] * len(emails)
+
+        with patch.object(SMTPVerifier, "validate_emails", validate_emails):
+            self.inbox.put(
+                ("validate", "job", 0, [(2, "joao@a.com"), (0, "b@a.com")], None)
+            )
+            job_id, sequence, results, error = await asyncio.to_thread(
+                self.outbox.get, timeout=5.0
+            )
+
+        self.assertEqual(job_id, "job")
+        self.assertEqual(sequence, 0)
+        self.assertEqual(error, None)
+        self.assertEqual([index for index, _ in results], [2, 0])
+        self.assertTrue(results[0][1].startswith('{"index":2,"address":"joao@a.com"'))
+
+    async def test_failed(self):
+        async def validate_emails(emails, cache=None, shed=True, deadline=None):
+            raise RuntimeError("failure")
+
+        with patch.object(SMTPVerifier, "validate_emails", validate_emails):
+            self.inbox.put(("validate", "job", 1, [(0, "joao@a.com")], None))
+            message = await asyncio.to_thread(self.outbox.get, timeout=5.0)
+
+        self.assertEqual(message, ("job", 1, None, "failure"))
+
+    async def test_cancel(self):
+        started = asyncio.Event()
+
+        async def validate_emails(emails, cache=None, shed=True, deadline=None):
+            started.set()
+            await asyncio.sleep(60.0)
+
+        with patch.object(SMTPVerifier, "validate_emails", validate_emails):
+            self.inbox.put(("validate", "job", 0, [(0, "joao@a.com")], None))
+            await asyncio.wait_for(started.wait(), 5.0)
+            self.inbox.put(("cancel", "job", None, None, None))
+            await asyncio.sleep(0.1)
+
+        self.assertTrue(self.outbox.empty())
+
+    async def test_store(self):
+        store = MemoryJobStore()
+        job = Job(status="running", total=1)
+        store.create(job)
+        store.update(job.id, status="cancelled")
+        called = False
+
+        async def validate_emails(emails, cache=None, shed=True, deadline=None):
+            nonlocal called
+            called = True
+            return [ValidationResult(result=True, status="deliverable")] * len(emails)
+
+        # the status of the job is checked in the (shared) store before
+        # validating a chunk, as it may be cancelled by another process
+        inbox = queue.Queue()
+        serve = asyncio.ensure_future(_serve(inbox, self.outbox, 2, store))
+        try:
+            with patch.object(SMTPVerifier, "validate_emails", validate_emails):
+                inbox.put(("validate", job.id, 3, [(0, "joao@a.com")], None))
+                message = await asyncio.to_thread(self.outbox.get, timeout=5.0)
+        finally:
+            inbox.put(None)
+            await serve
+
+        self.assertEqual(message, (job.id, 3, [], None))
+        self.assertFalse(called)
+
+
+class TestJobManager(TestCase):
+    def test_collect(self):
+        manager = JobManager(store=MemoryJobStore(), workers=1)
+        manager._outbox = queue.Queue()
+        manager._inboxes = [queue.Queue()]
+
+        job = Job(status="running", total=3)
+        manager.store.create(job)
+        for sequence in range(3):
+            manager._pending[(job.id, sequence)] = Chunk(0, [(sequence, "a@a.com")])
+        for message in (
+            (job.id, 0, [(0, '{"index":0}')], None),
+            (job.id, 0, [(0, '{"index":0}')], None),
+            (job.id, 1, None, "failure"),
+            (job.id, 2, [(1, '{"index":1}')], None),
+            None,
+        ):
+            manager._outbox.put(message)
+        manager._collect()
+
+        # a chunk that failed fails the whole job, cancelling the other
+        # chunks and ignoring their results (as the repeated ones)
+        job = manager.store.get(job.id)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "failure")
+        self.assertEqual(job.processed, 1)
+        self.assertEqual(manager._pending, {})
+        self.assertEqual(
+            manager._inboxes[0].get_nowait(), ("cancel", job.id, None, None, None)
+        )
+
+    def test_watch(self):
+        manager = JobManager(store=MemoryJobStore(), workers=1, retries=1)
+        processes = [FakeProcess(False, -9)]
+        manager._inboxes = [FakeInbox()]
+        manager._processes = [processes[0]]
+
+        def spawn(index):
+            processes.append(FakeProcess(True))
+            return FakeInbox(), processes[-1]
+
+        job = Job(status="running", total=1)
+        manager.store.create(job)
+        manager._pending[(job.id, 0)] = Chunk(0, [(0, "joao@a.com")])
+        with patch.object(manager, "_spawn", spawn):
+            # the exited worker is restarted with its chunk re-queued
+            manager._watch()
+            self.assertEqual(manager.restarts, 1)
+            self.assertIs(manager._processes[0], processes[1])
+            self.assertEqual(
+                manager._inboxes[0].get_nowait(),
+                ("validate", job.id, 0, [(0, "joao@a.com")], None),
+            )
+            self.assertEqual(manager.store.get(job.id).status, "running")
+
+            # once the retries are exhausted the job is failed instead
+            processes[1].alive, processes[1].exitcode = False, 1
+            manager._watch()
+            self.assertEqual(manager.restarts, 2)
+            self.assertEqual(manager.store.get(job.id).status, "failed")
+            self.assertEqual(
+                manager.store.get(job.id).error, "Worker exited with code 1"
+            )
+            self.assertEqual(manager._pending, {})
+
+    def test_submit(self):
+        manager = JobManager(store=MemoryJobStore(), workers=1)
+        try:
+            # the invalid addresses are validated with no network work
+            job = manager.submit(["joao", "maria@", "@"], cache=False)
+            self.assertEqual(job.status, "running")
+            for _ in range(600):
+                job = manager.store.get(job.id)
+                if job.done:
+                    break
+                sleep(0.05)
+        finally:
+            manager.stop()
+
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.processed, 3)
+        results = [loads(data) for data in manager.store.results(job.id)]
+        self.assertEqual(sorted(result["index"] for result in results), [0, 1, 2])
+        self.assertEqual(set(result["status"] for result in results), {"invalid"})
+
+    def test_restart(self):
+        manager = JobManager(store=MemoryJobStore(), workers=1)
+        try:
+            # the chunks sent to a worker that was killed are validated
+            # by the worker that replaces it
+            manager.start()
+            process = manager._processes[0]
+            process.kill()
+            process.join()
+            job = manager.submit(["joao", "maria@"], cache=False)
+            for _ in range(600):
+                job = manager.store.get(job.id)
+                if job.done:
+                    break
+                sleep(0.05)
+            restarts = manager.restarts
+        finally:
+            manager.stop()
+
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.processed, 2)
+        self.assertEqual(restarts, 1)
+
+
+class FakeInbox(queue.Queue):
+    def cancel_join_thread(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeProcess:
+    def __init__(self, alive: bool, exitcode: int | None = None):
+        self.alive = alive
+        self.exitcode = exitcode
+
+    def is_alive(self) -> bool:
+        return self.alive
@@ -0,0 +1,55 @@
+from unittest import TestCase
+
+from posterum.common.metrics import Registry
+
+
+class TestRegistry(TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter(self):
+        counter = self.registry.counter(
+            "requests_total", "Number of requests", labels=("status",)
+        )
+        counter.inc("ok")
+        counter.inc("ok")
+        counter.inc("error", amount=3)
+        lines = self.registry.render().splitlines()
+        self.assertIn("# TYPE requests_total counter", lines)
+        self.assertIn('requests_total{status="ok"} 2', lines)
+        self.assertIn('requests_total{status="error"} 3', lines)
+
+    def test_gauge_collect(self):
+        self.registry.gauge(
+            "size", "Size", labels=("cache",), collect=lambda: [(("mx",), 7)]
+        )
+        self.assertIn('size{cache="mx"} 7', self.registry.render().splitlines())
+
+    def test_histogram(self):
+        histogram = self.registry.histogram(
+            "duration_seconds", "Duration", labels=("phase",), buckets=(0.1, 1.0)
+        )
+        histogram.observe(0.05, "dns")
+        histogram.observe(0.1, "dns")
+        histogram.observe(0.5, "dns")
+        histogram.observe(5.0, "dns")
+        lines = self.registry.render().splitlines()
+        self.assertIn('duration_seconds_bucket{phase="dns",le="0.1"} 2', lines)
+        self.assertIn('duration_seconds_bucket{phase="dns",le="1"} 3', lines)
+        self.assertIn('duration_seconds_bucket{phase="dns",le="+Inf"} 4', lines)
+        self.assertIn('duration_seconds_sum{phase="dns"} 5.65', lines)
+        self.assertIn('duration_seconds_count{phase="dns"} 4', lines)
+
+    def test_escape(self):
+        counter = self.registry.counter("errors_total", "Errors", labels=("message",))
+        counter.inc('a "quoted"\nvalue')
+        self.assertIn(
+            'errors_total{message="a \\"quoted\\"\\nvalue"} 1',
+            self.registry.render().splitlines(),
+        )
+
+    def test_duplicated(self):
+        self.registry.counter("requests_total", "Number of requests")
+        self.assertRaises(
+            ValueError, self.registry.counter, "requests_total", "Number of requests"
+        )
@@ -0,0 +1,186 @@
+import asyncio
+
+from unittest import IsolatedAsyncioTestCase
+from aiosmtplib import SMTPTimeoutError
+
+from posterum.common.pool import PooledSMTP, SMTPPool
+from posterum.common.timeouts import LatencyEstimator
+
+from fakes import FakeSMTPServer
+
+
+class TestPooledSMTP(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.chunks: list[bytes] = []
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.write(b"220 fake ESMTP\r\n")
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            self.chunks.append(line)
+            command = line.strip().upper()
+            if command.startswith(b"EHLO"):
+                writer.write(b"250-fake\r\n250 PIPELINING\r\n")
+            elif command.startswith(b"RCPT") and b"BAD" in command:
+                writer.write(b"550 5.1.1 no such user\r\n")
+            elif command == b"QUIT":
+                writer.write(b"221 bye\r\n")
+                break
+            else:
+                # the multiline response is written in parts, so that
+                # the responses arrive split across multiple reads
+                writer.write(b"250-first\r\n")
+                await writer.drain()
+                await asyncio.sleep(0.001)
+                writer.write(b"250 ok\r\n")
+            await writer.drain()
+        writer.close()
+
+    async def test_pipeline(self):
+        latencies = LatencyEstimator()
+        client = PooledSMTP(
+            hostname="127.0.0.1", port=self.port, timeout=2.0, latencies=latencies
+        )
+        await client.connect()
+        self.assertTrue(client.pipelining)
+
+        commands = [b"MAIL FROM:<joe@example.com>"]
+        commands += [b"RCPT TO:<user%d@example.com>" % index for index in range(20)]
+        commands += [b"RCPT TO:<bad@example.com>"]
+        responses = await client.pipeline(*commands, timeout=2.0)
+        self.assertEqual(len(responses), 22)
+        self.assertEqual(responses[0].code, 250)
+        self.assertEqual(responses[0].message, "first\nok")
+        self.assertEqual(responses[-1].code, 550)
+        self.assertNotEqual(latencies.estimate(("127.0.0.1", "command")), None)
+
+        # the session remains usable for regular (non pipelined) commands
+        code, _ = await client.rset()
+        self.assertEqual(code, 250)
+        with self.assertRaises(ValueError):
+            await client.pipeline(b"RSET\r\nQUIT")
+        await client.quit()
+
+    async def test_spans(self):
+        pool = SMTPPool(port=self.port)
+        async with pool.session("127.0.0.1", timeout=2.0) as client:
+            self.assertEqual(
+                [span[0] for span in client.spans], ["connect", "banner", "ehlo"]
+            )
+            self.assertTrue(all(span[2] >= 0.0 for span in client.spans))
+        async with pool.session("127.0.0.1", timeout=2.0) as client:
+            self.assertEqual([span[0] for span in client.spans], ["rset"])
+        pool.close()
+
+
+class TestSMTPPool(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = await FakeSMTPServer().start()
+
+    async def asyncTearDown(self):
+        await self.server.stop()
+
+    async def test_reuse(self):
+        pool = SMTPPool(port=self.server.port)
+        async with pool.session("127.0.0.1", timeout=2.0) as client:
+            first = client
+        self.assertEqual(pool.size, 1)
+        async with pool.session("127.0.0.1", timeout=2.0) as client:
+            self.assertIs(client, first)
+            self.assertEqual(pool.active, 1)
+            self.assertEqual(pool.size, 0)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(
+            [command for _, command in self.server.log], ["EHLO localhost", "RSET"]
+        )
+
+        # sessions with a different EHLO hostname are not shared
+        async with pool.session("127.0.0.1", hostname="other", timeout=2.0) as client:
+            self.assertIsNot(client, first)
+        self.assertEqual(self.server.connections, 2)
+        pool.close()
+
+    async def test_expiry(self):
+        pool = SMTPPool(port=self.server.port, idle_timeout=0.0)
+        async with pool.session("127.0.0.1", timeout=2.0) as client:
+            first = client
+        await asyncio.sleep(0.01)
+        async with pool.session("127.0.0.1", timeout=2.0) as client:
+            self.assertIsNot(client, first)
+        self.assertEqual(self.server.connections, 2)
+
+        # the sessions that ran too many commands are not re-used
+        pool = SMTPPool(port=self.server.port, max_commands=1)
+        async with pool.session("127.0.0.1", timeout=2.0) as client:
+            await client.noop()
+        self.assertEqual(pool.size, 0)
+        pool.close()
+        await asyncio.gather(*pool._tasks)
+        self.assertTrue(any(command == "QUIT" for _, command in self.server.log))
+
+    async def test_pipeline(self):
+        pool = SMTPPool(port=self.server.port)
+        async with pool.session("127.0.0.1", timeout=2.0) as client:
+            self.assertTrue(client.pipelining)
+            responses = await client.pipeline(
+                b"MAIL FROM:<noreply@posterum.fake>",
+                b"RCPT TO:<joao@posterum.fake>",
+                b"RCPT TO:<bad@posterum.fake>",
+                b"RCPT TO:<maria@posterum.fake>",
+                timeout=2.0,
+            )
+            self.assertEqual(
+                [response.code for response in responses], [250, 250, 550, 250]
+            )
+
+            # the session protocol is back in charge of the transport
+            code, _ = await client.noop()
+            self.assertEqual(code, 250)
+        self.assertEqual(
+            [command.split(" ")[0] for _, command in self.server.log],
+            ["EHLO", "MAIL", "RCPT", "RCPT", "RCPT", "NOOP"],
+        )
+        self.assertEqual(pool.size, 1)
+        pool.close()
+
+    async def test_pipeline_timeout(self):
+        server = await FakeSMTPServer(latency=0.2).start()
+        try:
+            client = PooledSMTP(hostname="127.0.0.1", port=server.port, timeout=2.0)
+            await client.connect()
+            with self.assertRaises(SMTPTimeoutError):
+                await client.pipeline(b"RSET", b"NOOP", timeout=0.05)
+
+            # the responses are no longer in sync with the commands, so
+            # the session is closed
+            self.assertFalse(client.is_connected)
+        finally:
+            await server.stop()
+
+    async def test_discard(self):
+        pool = SMTPPool(port=self.server.port)
+
+        # a session whose user failed can no longer be trusted
+        with self.assertRaises(RuntimeError):
+            async with pool.session("127.0.0.1", timeout=2.0) as client:
+                raise RuntimeError("failure")
+        self.assertEqual(pool.size, 0)
+
+        # an idle session that was disconnected (or that fails the
+        # RSET) is replaced by a new one
+        async with pool.session("127.0.0.1", timeout=2.0) as client:
+            first = client
+        first.close()
+        async with pool.session("127.0.0.1", timeout=2.0) as client:
+            self.assertIsNot(client, first)
+            self.assertTrue(client.is_connected)
+        self.assertEqual(self.server.connections, 3)
+        pool.close()
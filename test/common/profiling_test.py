@@ -0,0 +1,51 @@
+import os
+import asyncio
+import tempfile
+
+from json import loads
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from posterum.common.profiling import Profiler, Timings
+
+
+class TestTimings(IsolatedAsyncioTestCase):
+    async def test_measure(self):
+        timings = Timings(trace=True)
+        self.assertEqual(await timings.measure("rcpt", asyncio.sleep(0.0, 250)), 250)
+        with self.assertRaises(ValueError):
+            await timings.measure("rcpt", self._fail())
+        timings.session(timings.origin, [("connect", timings.origin, 0.0)])
+        self.assertEqual(list(timings.phases), ["rcpt", "queue", "connect"])
+        self.assertEqual([span[0] for span in timings.spans or []][:2], ["rcpt"] * 2)
+        self.assertEqual(Timings().spans, None)
+
+    async def _fail(self):
+        raise ValueError()
+
+
+class TestProfiler(TestCase):
+    def test_start(self):
+        profiler = Profiler()
+        self.assertEqual(profiler.start(), None)
+        self.assertEqual(profiler.start(False), None)
+        self.assertEqual(Profiler(sample=1.0).start(False), None)
+        profile = profiler.start(True)
+        assert profile
+        profile.timings.add("rcpt", profile.timings.origin, 0.5)
+        data = profiler.finish(profile, "joao@gmail.com")
+        self.assertEqual(data["name"], "joao@gmail.com")
+        self.assertEqual(data["trace"], [dict(phase="rcpt", start=0.0, time=0.5)])
+        self.assertFalse("cprofile" in data)
+
+    def test_cprofile(self):
+        with tempfile.TemporaryDirectory() as path:
+            profiler = Profiler(mode="cprofile", path=path)
+            profile = profiler.start(True)
+            assert profile
+            self.assertTrue(Profiler.active)
+            self.assertEqual(profiler.start(True).profile, None)  # type: ignore
+            data = profiler.finish(profile, "joao@gmail.com")
+            self.assertFalse(Profiler.active)
+            self.assertEqual(os.path.dirname(data["path"]), path)
+            with open(data["path"], "r", encoding="utf-8") as file:
+                self.assertTrue("function calls" in loads(file.read())["cprofile"])
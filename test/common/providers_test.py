@@ -0,0 +1,58 @@
+from unittest import TestCase
+
+from posterum.common.providers import AhoCorasick, ProviderIndex, SuffixTrie
+
+
+class TestSuffixTrie(TestCase):
+    def test_find(self):
+        trie = SuffixTrie()
+        trie.add("outlook.com", "outlook")
+        trie.add("protection.outlook.com", "microsoft")
+        self.assertEqual(
+            trie.find("Example-com.mail.protection.outlook.com."), "microsoft"
+        )
+        self.assertEqual(trie.find("smtp.outlook.com"), "outlook")
+        self.assertEqual(trie.find("outlook.com"), "outlook")
+        self.assertEqual(trie.find("myoutlook.com"), None)
+        self.assertEqual(trie.find("com"), None)
+
+
+class TestAhoCorasick(TestCase):
+    def test_search(self):
+        automaton = AhoCorasick(
+            [("he", "he"), ("she", "she"), ("hers", "hers"), ("yahoo", "yahoo")]
+        )
+        self.assertEqual(automaton.search("USHERS"), "she")
+        self.assertEqual(automaton.search("ahers"), "he")
+        self.assertEqual(automaton.search("mta.YAHOO.com"), "yahoo")
+        self.assertEqual(automaton.search("yaho"), None)
+        self.assertEqual(AhoCorasick().search("anything"), None)
+
+
+class TestProviderIndex(TestCase):
+    def setUp(self):
+        self.index = ProviderIndex.load()
+
+    def test_mx_server(self):
+        self.assertEqual(self.index.classify("aspmx.l.google.com"), "google")
+        self.assertEqual(
+            self.index.classify("example-com.mail.protection.outlook.com"), "microsoft"
+        )
+        self.assertEqual(self.index.classify("mta7.am0.yahoodns.net"), "yahoo")
+        self.assertEqual(self.index.classify("mx.zoho.eu"), "zoho")
+        self.assertEqual(self.index.classify("mx.example.com"), "unknown")
+
+    def test_message(self):
+        self.assertEqual(
+            self.index.classify("mx.example.com", "2.1.5 OK 5si2397ejb.123 - gsmtp"),
+            "google",
+        )
+        self.assertEqual(self.index.classify(message="Zoho Mail ESMTP"), "zoho")
+        self.assertEqual(self.index.classify("mx.zoho.com", "2.1.5 OK - gsmtp"), "zoho")
+        self.assertEqual(self.index.classify(message="250 OK"), "unknown")
+
+    def test_memo(self):
+        index = ProviderIndex(dict(google=dict(mx=["google.com"])), memo_size=2)
+        for host in ("a.google.com", "b.google.com", "c.example.com"):
+            self.assertEqual(index.classify(host), index.classify(host))
+        self.assertLessEqual(len(index._memo), 2)
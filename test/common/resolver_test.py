@@ -0,0 +1,68 @@
+from typing import Any, NamedTuple
+from unittest import IsolatedAsyncioTestCase
+
+from aiodns.error import ARES_ENODATA, ARES_ENOTFOUND, ARES_ETIMEOUT, DNSError
+
+from posterum.common.resolver import MXResolver
+
+Record = NamedTuple("Record", [("host", str), ("priority", int), ("ttl", int)])
+
+
+class StubResolver:
+    def __init__(self, answers: dict[tuple[str, str], Any]):
+        self.answers = answers
+        self.queries: list[tuple[str, str]] = []
+
+    async def query(self, domain: str, qtype: str):
+        self.queries.append((domain, qtype))
+        answer = self.answers.get((domain, qtype), DNSError(ARES_ENOTFOUND, ""))
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+class TestMXResolver(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.stub = StubResolver(
+            {
+                ("sorted.com", "MX"): [
+                    Record("mx2.sorted.com", 20, 7200),
+                    Record("mx1.sorted.com", 10, 600),
+                ],
+                ("short.com", "MX"): [Record("mx.short.com", 10, 1)],
+                ("implicit.com", "MX"): DNSError(ARES_ENODATA, ""),
+                ("implicit.com", "A"): [Record("", 0, 900)],
+                ("nomx.com", "MX"): DNSError(ARES_ENODATA, ""),
+                ("null.com", "MX"): [Record("", 0, 3600)],
+                ("timeout.com", "MX"): DNSError(ARES_ETIMEOUT, ""),
+            }
+        )
+        self.resolver = MXResolver(
+            min_ttl=60.0, max_ttl=3600.0, negative_ttl=300.0, factory=lambda: self.stub
+        )
+
+    async def test_sorted(self):
+        mx_servers, ttl = await self.resolver.resolve("sorted.com")
+        self.assertEqual(mx_servers, ["mx1.sorted.com", "mx2.sorted.com"])
+        self.assertEqual(ttl, 600.0)
+
+    async def test_ttl_bounds(self):
+        _, ttl = await self.resolver.resolve("short.com")
+        self.assertEqual(ttl, 60.0)
+
+    async def test_implicit(self):
+        mx_servers, ttl = await self.resolver.resolve("implicit.com")
+        self.assertEqual(mx_servers, ["implicit.com"])
+        self.assertEqual(ttl, 900.0)
+
+    async def test_negative(self):
+        self.assertEqual(await self.resolver.resolve("unknown.com"), ([], 300.0))
+        self.assertEqual(await self.resolver.resolve("nomx.com"), ([], 300.0))
+        self.assertEqual(await self.resolver.resolve("null.com"), ([], 300.0))
+
+    async def test_transient(self):
+        with self.assertRaises(DNSError):
+            await self.resolver.resolve("timeout.com")
+
+    async def test_shared(self):
+        self.assertIs(self.resolver.resolver, self.resolver.resolver)
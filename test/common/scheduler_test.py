@@ -0,0 +1,107 @@
+import asyncio
+
+from time import monotonic
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from posterum.common.cache import MemoryCache
+from posterum.common.scheduler import CircuitBreaker, Limits, MXScheduler, TokenBucket
+from posterum.common.timeouts import Deadline
+
+
+class TestCircuitBreaker(TestCase):
+    def test_open(self):
+        breaker = CircuitBreaker(threshold=0.5, min_calls=4, backoff=30.0)
+        breaker.record(False)
+        breaker.record(False)
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+        breaker.record(True)
+        breaker.record(False)
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+        self.assertTrue(breaker.is_open)
+        self.assertGreater(breaker.retry_after, 29.0)
+
+    def test_half_open(self):
+        breaker = CircuitBreaker(threshold=0.5, min_calls=1, backoff=0.0)
+        breaker.record(False)
+        self.assertEqual(breaker.state, "open")
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, "half-open")
+        self.assertFalse(breaker.allow())
+        breaker.record(True)
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+
+    def test_backoff(self):
+        breaker = CircuitBreaker(
+            threshold=0.5, min_calls=1, backoff=10.0, max_backoff=25.0
+        )
+        breaker.record(False)
+        self.assertAlmostEqual(breaker.retry_after, 10.0, places=1)
+        breaker._retry_at = monotonic()
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertAlmostEqual(breaker.retry_after, 20.0, places=1)
+        breaker._retry_at = monotonic()
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+        self.assertAlmostEqual(breaker.retry_after, 25.0, places=1)
+        self.assertEqual(breaker.opens, 3)
+
+
+class TestMXScheduler(IsolatedAsyncioTestCase):
+    async def test_token_bucket(self):
+        bucket = TokenBucket(100.0, burst=2)
+        start = monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        self.assertGreater(monotonic() - start, 0.015)
+
+    async def test_concurrency(self):
+        scheduler = MXScheduler(
+            limits=Limits(2, None, 1), overrides=dict(google=Limits(4, None, 1))
+        )
+        running = 0
+        peaks: dict[str, int] = {}
+
+        async def work(mx_server: str, provider: str):
+            nonlocal running
+            async with scheduler.slot(mx_server, provider=provider):
+                running += 1
+                peaks[mx_server] = max(peaks.get(mx_server, 0), running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(work("mx.example.com", "unknown") for _ in range(6)))
+        await asyncio.gather(*(work("mx.google.com", "google") for _ in range(8)))
+        self.assertEqual(peaks["mx.example.com"], 2)
+        self.assertEqual(peaks["mx.google.com"], 4)
+
+    async def test_deadline(self):
+        scheduler = MXScheduler(limits=Limits(1, None, 1))
+        async with scheduler.slot("mx.example.com"):
+            start = monotonic()
+            with self.assertRaises(asyncio.TimeoutError):
+                async with scheduler.slot("mx.example.com", deadline=Deadline(0.05)):
+                    pass
+            self.assertLess(monotonic() - start, 1.0)
+        async with scheduler.slot("mx.example.com", deadline=Deadline(0.05)):
+            pass
+
+    def test_breakers(self):
+        scheduler = MXScheduler(min_calls=1)
+        self.assertFalse(scheduler.is_open("mx.example.com"))
+        scheduler.record("mx.example.com", False)
+        self.assertTrue(scheduler.is_open("mx.example.com"))
+        self.assertFalse(scheduler.allow("mx.example.com"))
+        self.assertTrue(scheduler.allow("other.example.com"))
+
+    def test_shared_breakers(self):
+        shared = MemoryCache()
+        scheduler = MXScheduler(min_calls=1, shared=shared)
+        other = MXScheduler(min_calls=1, shared=shared)
+        scheduler.record("mx.example.com", False)
+        self.assertTrue(other.is_open("mx.example.com"))
+        self.assertFalse(other.allow("mx.example.com"))
+        self.assertTrue(other.allow("other.example.com"))
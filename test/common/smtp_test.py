@@ -0,0 +1,561 @@
+import asyncio
+
+from json import loads
+from time import time
+from unittest import IsolatedAsyncioTestCase, TestCase
+from unittest.mock import patch
+
+from posterum import ResultRecord, SMTPVerifier, ValidationResult
+from posterum.common import smtp
+from posterum.common.admission import AdmissionController
+from posterum.common.cache import CacheItem, MemoryCache
+from posterum.common.errors import OverloadedError
+from posterum.common.pool import SMTPPool
+from posterum.common.scheduler import Limits, MXScheduler
+from posterum.common.timeouts import Deadline
+from posterum.common.verdicts import VerdictStore
+
+from fakes import FakeSMTPServer
+
+
+class TestValidationResult(TestCase):
+    def setUp(self):
+        self.result = ValidationResult(
+            result=True,
+            status="deliverable",
+            message="2.1.5 OK ✓",
+            code=250,
+            provider="google",
+            mx_server="aspmx.l.google.com",
+            catch_all=False,
+            dns_time=0.01,
+            smtp_time=0.2,
+            total_time=0.21,
+        )
+
+    def test_record(self):
+        record = self.result.record
+        self.assertEqual(record.status, "deliverable")
+        self.assertRaises(AttributeError, setattr, record, "status", "unknown")
+        self.assertRaises(AttributeError, setattr, record, "other", 1)
+        self.assertFalse(hasattr(record, "__dict__"))
+        self.assertFalse(hasattr(self.result, "__dict__"))
+
+    def test_encode(self):
+        record = ResultRecord.decode(self.result.encode())
+        self.assertEqual(record, self.result.record)
+        self.assertEqual(
+            ValidationResult.decode(record.encode()).to_dict()["code"], 250
+        )
+
+    def test_view(self):
+        record = self.result.record
+        view = ValidationResult.view(
+            record, cached=True, cache_timestamp=10.0, cache_timeout=3610.0
+        )
+        other = ValidationResult.view(record, coalesced=True)
+        view.dns_time = 0.5
+        self.assertIs(view.record, record)
+        self.assertEqual(view.status, "deliverable")
+        self.assertEqual(other.dns_time, None)
+        self.assertEqual(self.result.dns_time, 0.01)
+        self.assertEqual(view.to_dict()["cache"]["ttl"], 3600.0)
+        self.assertEqual(view.to_dict()["cache"]["stale"], False)
+        self.assertFalse("cache" in other.to_dict())
+
+    def test_result_ttl(self):
+        record = self.result.record
+        bounce = ValidationResult(status="undeliverable", provider="google").record
+        transient = ValidationResult(status="unknown", provider="yahoo").record
+        with patch.object(smtp, "CACHE_TTL_PROVIDER", dict(google=dict(risky=60.0))):
+            self.assertEqual(smtp.result_ttl(record, 3600.0), 3600.0)
+            self.assertEqual(smtp.result_ttl(bounce), 86400.0)
+            self.assertEqual(smtp.result_ttl(transient), 300.0)
+        with patch.object(
+            smtp, "CACHE_TTL_PROVIDER", dict(google=120.0, yahoo=dict(unknown=30.0))
+        ):
+            self.assertEqual(smtp.result_ttl(record, 3600.0), 120.0)
+            self.assertEqual(smtp.result_ttl(bounce), 120.0)
+            self.assertEqual(smtp.result_ttl(transient), 30.0)
+
+    def test_to_json(self):
+        for result in (
+            self.result,
+            ValidationResult.view(
+                self.result.record, cached=True, cache_timestamp=10.0
+            ),
+        ):
+            data = loads(result.to_json("joe@gmail.com"))
+            expected = dict(address="joe@gmail.com", **result.to_dict())
+            if "cache" in data:
+                data["cache"].pop("age")
+                expected["cache"].pop("age")
+            self.assertEqual(data, expected)
+            self.assertEqual(list(data.keys()), list(expected.keys()))
+
+        self.assertEqual(loads(self.result.to_json()), self.result.to_dict())
+        self.assertEqual(
+            loads(ValidationResult.serialize("joe@nomx.com", None)),
+            dict(address="joe@nomx.com"),
+        )
+
+
+class TestSMTPVerifier(IsolatedAsyncioTestCase):
+    async def test_stale(self):
+        record = ValidationResult(result=True, status="deliverable").record
+        now = time()
+        calls: list[int] = []
+
+        async def validate() -> ValidationResult:
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return ValidationResult.view(record)
+
+        with patch.object(smtp, "CACHE_STALE", 60.0):
+            fresh = SMTPVerifier._cached(CacheItem(record, now, now + 120.0))
+            stale = SMTPVerifier._cached(CacheItem(record, now - 100.0, now + 20.0))
+            self.assertFalse(fresh.stale)
+            self.assertTrue(stale.stale)
+            self.assertEqual(stale.cache_timeout, now - 40.0)
+            self.assertEqual(stale.to_dict()["cache"]["stale"], True)
+
+        self.assertTrue(SMTPVerifier._refresh("stale", validate))
+        self.assertFalse(SMTPVerifier._refresh("stale", validate))
+        with patch.object(smtp, "CACHE_REFRESH_LIMIT", 1):
+            self.assertFalse(SMTPVerifier._refresh("other", validate))
+        await smtp.REFRESHES["stale"]
+        self.assertEqual(calls, [1])
+        self.assertFalse("stale" in smtp.REFRESHES)
+
+    async def test_verdict(self):
+        async def mx_records(domain: str) -> list[str]:
+            return ["mx.verdict.test"]
+
+        async def validate(*args, **kwargs) -> ValidationResult:
+            raise AssertionError("SMTP dialogue not expected")
+
+        smtp.VERDICTS.update("catchall.com", "mx.verdict.test", catch_all=True)
+        smtp.VERDICTS.update("blocked.com", "mx.verdict.test", reject_all=True)
+        with patch.object(SMTPVerifier, "_mx_records", mx_records), patch.object(
+            SMTPVerifier, "_validate_email_failover", validate
+        ), patch.object(SMTPVerifier, "_validate_emails_mx", validate):
+            result = await SMTPVerifier.validate_email("joao@catchall.com")
+            self.assertEqual(result.status, "risky")
+            self.assertEqual(result.catch_all, True)
+            self.assertEqual(result.mx_server, "mx.verdict.test")
+            results = await SMTPVerifier.validate_emails(
+                ["joao@catchall.com", "joao@blocked.com"]
+            )
+            self.assertEqual(
+                [result.status for result in results], ["risky", "unknown"]
+            )
+
+    async def test_admission(self):
+        async def mx_records(domain: str) -> list[str]:
+            return ["mx.admission.test"]
+
+        async def validate(*args, **kwargs) -> ValidationResult:
+            raise AssertionError("SMTP dialogue not expected")
+
+        admission = AdmissionController(limit=1, max_wait=0.01)
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.slot():
+                await release.wait()
+
+        record = ValidationResult(result=True, status="deliverable").record
+        key = smtp.ADDRESS_PARSER.parse("joao@cached.com").key
+        smtp.RESULT_CACHE.set((key, "mx.admission.test", smtp.SMTP_HOST), record)
+
+        task = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        with patch.object(smtp, "ADMISSION", admission), patch.object(
+            SMTPVerifier, "_mx_records", mx_records
+        ), patch.object(SMTPVerifier, "_validate_email_failover", validate):
+            # the cache hits are answered even when overloaded
+            result = await SMTPVerifier.validate_email("joao@cached.com")
+            self.assertEqual(result.status, "deliverable")
+            self.assertEqual(result.cached, True)
+
+            with self.assertRaises(OverloadedError) as context:
+                await SMTPVerifier.validate_email("joao@shed.com")
+            self.assertEqual(context.exception.code, 503)
+            results = await SMTPVerifier.validate_emails(["joao@shed.com"])
+            self.assertEqual(results[0] and results[0].status, "unknown")
+            self.assertEqual(results[0] and results[0].code, None)
+            self.assertEqual(
+                results[0] and results[0].exception_name, "OverloadedError"
+            )
+
+        release.set()
+        await task
+
+    async def test_admission_batch(self):
+        async def mx_records(domain: str) -> list[str]:
+            return [f"mx.{domain}"]
+
+        async def validate_emails_mx(
+            emails: list[str], mx_server: str, **kwargs
+        ) -> dict[str, ValidationResult]:
+            await asyncio.sleep(0.05)
+            return dict(
+                (email, ValidationResult(result=True, status="deliverable"))
+                for email in emails
+            )
+
+        # a single group is admitted at a time, so the second one is
+        # shed while the first one is validated (and not cancelled)
+        admission = AdmissionController(limit=1, max_wait=0.01)
+        with patch.object(smtp, "ADMISSION", admission), patch.object(
+            SMTPVerifier, "_mx_records", mx_records
+        ), patch.object(SMTPVerifier, "_validate_emails_mx", validate_emails_mx):
+            results = await SMTPVerifier.validate_emails(
+                ["joao@first.com", "maria@second.com", "ana@second.com"], cache=False
+            )
+        self.assertEqual(
+            [result and (result.status, result.code) for result in results],
+            [("deliverable", None), ("unknown", None), ("unknown", None)],
+        )
+        self.assertIn("retry after 1s", (results[1] and results[1].message) or "")
+        self.assertEqual(results[1] and results[1].mx_server, "mx.second.com")
+        self.assertIsInstance(results[1] and results[1].exception, OverloadedError)
+        self.assertEqual(admission.sheds["bulk"], 1)
+
+    async def test_rejected(self):
+        result = await SMTPVerifier.validate_email("joao@@")
+        self.assertEqual(result.status, "invalid")
+        self.assertEqual(result.exception_name, "AddressError")
+        results = await SMTPVerifier.validate_emails(
+            ["joao", "joao@mailinator.com", "joao"]
+        )
+        self.assertEqual(
+            [result.status for result in results], ["invalid", "disposable", "invalid"]
+        )
+
+
+class TestSMTPVerifierFake(IsolatedAsyncioTestCase):
+    """
+    Runs the verifier against the in-process fake SMTP server, listening
+    on multiple loopback addresses (one per MX server), with a pool and
+    a scheduler of its own.
+    """
+
+    async def asyncSetUp(self):
+        self.server = await FakeSMTPServer(
+            hosts=("127.0.0.1", "127.0.0.2", "127.0.0.3"),
+            catch_all_domains=("catchall.fake",),
+            forward_prefixes=("forward",),
+            policy_prefixes=("blocked",),
+            policy_domains=("policy.fake",),
+            stall_hosts=("127.0.0.3",),
+        ).start()
+        self.records: dict[str, list[str]] = {}
+        self.pool = SMTPPool(port=self.server.port, sizes=smtp._pool_size)
+
+        async def mx_records(domain: str) -> list[str]:
+            return self.records.get(domain, [])
+
+        for patcher in (
+            patch.object(smtp, "SMTP_POOL", self.pool),
+            patch.object(smtp, "MX_SCHEDULER", MXScheduler()),
+            patch.object(SMTPVerifier, "_mx_records", mx_records),
+            patch.object(smtp, "VERDICTS", VerdictStore(MemoryCache())),
+            patch.object(smtp, "VRFY_CACHE", MemoryCache()),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        self.pool.close()
+        await asyncio.gather(*self.pool._tasks)
+        await self.server.stop()
+
+    def commands(self, verb: str, host: str | None = None) -> list[str]:
+        return [
+            command
+            for _host, command in self.server.log
+            if command.upper().startswith(verb) and (host is None or _host == host)
+        ]
+
+    async def test_provider_limits(self):
+        # the sessions of a provider with a larger concurrency limit are
+        # not capped by the default (pool) limit of the other MX servers
+        self.records["google.fake"] = ["127.0.0.1"]
+        self.server.latency = 0.05
+        scheduler = MXScheduler(overrides=dict(google=Limits(32, None, 1)))
+        with patch.object(smtp, "MX_SCHEDULER", scheduler), patch.object(
+            smtp.PROVIDER_INDEX, "classify", lambda *args, **kwargs: "google"
+        ):
+            results = await asyncio.gather(
+                *(
+                    SMTPVerifier.validate_email(f"user{index}@google.fake", cache=False)
+                    for index in range(24)
+                )
+            )
+        self.assertEqual(set(result.status for result in results), set(["deliverable"]))
+        self.assertGreater(self.server.peak, 8)
+        self.assertLessEqual(self.server.peak, 32)
+
+    async def test_batch(self):
+        self.records.update(
+            {
+                "one.fake": ["127.0.0.1"],
+                "three.fake": ["127.0.0.1"],
+                "two.fake": ["127.0.0.2"],
+            }
+        )
+        emails = [
+            "joao@one.fake",
+            "bad@two.fake",
+            "maria@three.fake",
+            "joao@one.fake",
+            "JOAO@one.fake",
+            "joao@none.fake",
+            "joao",
+        ]
+        results = await SMTPVerifier.validate_emails(emails, cache=False)
+
+        # the results keep the order of the addresses, with the duplicated
+        # (and equivalent) ones sharing the result of a single RCPT
+        self.assertEqual(len(results), len(emails))
+        self.assertEqual(
+            [result and result.status for result in results],
+            [
+                "deliverable",
+                "undeliverable",
+                "deliverable",
+                "deliverable",
+                "deliverable",
+                None,
+                "invalid",
+            ],
+        )
+        self.assertIs(results[0], results[3])
+        self.assertIs(results[0], results[4])
+        self.assertEqual(results[1].mx_server, "127.0.0.2")
+        self.assertEqual(
+            len(
+                [
+                    command
+                    for command in self.commands("RCPT")
+                    if "joao@" in command.lower()
+                ]
+            ),
+            1,
+        )
+
+        # the addresses are grouped by MX server, with a single session
+        # (and mail transaction) per MX server
+        self.assertEqual(len(self.commands("EHLO", "127.0.0.1")), 1)
+        self.assertEqual(len(self.commands("EHLO", "127.0.0.2")), 1)
+        self.assertEqual(len(self.commands("MAIL", "127.0.0.1")), 1)
+        self.assertEqual(self.server.connections, 2)
+
+    async def test_failover(self):
+        self.records.update({"stall.fake": ["127.0.0.3", "127.0.0.1"]})
+        with patch.object(smtp, "SMTP_TIMEOUT", 0.2):
+            result = await SMTPVerifier.validate_email("joao@stall.fake", cache=False)
+
+        # the MX server that never answers is given up once the timeout
+        # expires, with the next one providing the answer
+        self.assertEqual(result.status, "deliverable")
+        self.assertEqual(result.mx_server, "127.0.0.1")
+        self.assertEqual(smtp.MX_SCHEDULER.breaker("127.0.0.3")._failures, 1)
+        self.assertEqual(smtp.MX_SCHEDULER.breaker("127.0.0.1")._failures, 0)
+        self.assertEqual(len(self.commands("RCPT", "127.0.0.1")), 2)
+
+    async def test_hedged(self):
+        self.records.update({"stall.fake": ["127.0.0.3", "127.0.0.1"]})
+
+        # the primary MX server is due to be probed (half-open)
+        breaker = smtp.MX_SCHEDULER.breaker("127.0.0.3")
+        breaker.state = "open"
+        breaker._retry_at = 0.0
+
+        with patch.object(smtp, "SMTP_TIMEOUT", 0.2), patch.object(
+            smtp, "SMTP_HEDGE_DELAY", 0.05
+        ):
+            result = await SMTPVerifier.validate_email("joao@stall.fake", cache=False)
+
+        # the hedged session to the next MX server wins the race, with
+        # the outcome being recorded against the probed MX server
+        self.assertEqual(result.status, "deliverable")
+        self.assertEqual(result.mx_server, "127.0.0.1")
+        self.assertEqual(self.server.connections, 2)
+        self.assertIsNone(breaker._probe_at)
+        self.assertNotEqual(breaker.state, "half-open")
+        self.assertNotIn("127.0.0.1", smtp.MX_SCHEDULER.breakers)
+
+        # waits for the session that lost the race to give up
+        await asyncio.sleep(0.3)
+
+    async def test_slot_timeout(self):
+        scheduler = MXScheduler(limits=Limits(1, None, 1))
+        held, release = asyncio.Event(), asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot("127.0.0.1"):
+                held.set()
+                await release.wait()
+
+        task = asyncio.ensure_future(hold())
+        await held.wait()
+        try:
+            with patch.object(smtp, "MX_SCHEDULER", scheduler):
+                result = await SMTPVerifier._validate_email_mx(
+                    "joao@one.fake", "127.0.0.1", deadline=Deadline(0.05)
+                )
+                probe = await SMTPVerifier._probe_verdict(
+                    "127.0.0.1", "one.fake", deadline=Deadline(0.05)
+                )
+        finally:
+            release.set()
+            await task
+
+        # the deadline expired while waiting for the MX slot, which is
+        # not a failure of the MX server
+        self.assertEqual(result.status, "unknown")
+        self.assertFalse(probe)
+        self.assertEqual(len(scheduler.breaker("127.0.0.1")._calls), 0)
+        self.assertEqual(self.server.connections, 0)
+
+    async def test_deadline(self):
+        async def mx_records(domain: str) -> list[str]:
+            if domain == "slow.fake":
+                await asyncio.sleep(1.0)
+            return self.records.get(domain, [])
+
+        # the deadline bounds the resolution of the MX servers as well
+        # as the SMTP work of the batch (eg: a stalled connect)
+        self.records.update(
+            {
+                "one.fake": ["127.0.0.1"],
+                "slow.fake": ["127.0.0.1"],
+                "stall.fake": ["127.0.0.3"],
+            }
+        )
+        start = time()
+        with patch.object(smtp, "SMTP_DEADLINE", 0.2), patch.object(
+            SMTPVerifier, "_mx_records", mx_records
+        ):
+            result = await SMTPVerifier.validate_email("joao@slow.fake", cache=False)
+            slow = await SMTPVerifier.validate_emails(["joao@slow.fake"], cache=False)
+            results = await SMTPVerifier.validate_emails(
+                ["joao@one.fake", "joao@stall.fake"], cache=False
+            )
+        self.assertLess(time() - start, 0.9)
+        self.assertEqual(result.status, "unknown")
+        self.assertEqual(result.message, "Validation deadline exceeded (DNS)")
+        self.assertEqual(
+            slow[0] and (slow[0].status, slow[0].message),
+            ("unknown", "Validation deadline exceeded (DNS)"),
+        )
+        self.assertEqual(
+            [result and result.status for result in results],
+            ["deliverable", "unknown"],
+        )
+        self.assertEqual(results[1] and results[1].mx_server, "127.0.0.3")
+
+    async def test_forward(self):
+        # a recipient that is accepted to be forwarded (251) is as
+        # deliverable as a local one, in every one of the paths
+        self.records["one.fake"] = ["127.0.0.1"]
+        for pipelining in (True, False):
+            with self.subTest(pipelining=pipelining), patch.object(
+                smtp, "SMTP_PIPELINING", pipelining
+            ):
+                result = await SMTPVerifier.validate_email(
+                    "forward@one.fake", cache=False
+                )
+                results = await SMTPVerifier.validate_emails(
+                    ["forward.batch@one.fake", "bad@one.fake"], cache=False
+                )
+                self.assertEqual((result.status, result.code), ("deliverable", 251))
+                self.assertEqual(
+                    [result and (result.status, result.code) for result in results],
+                    [("deliverable", 251), ("undeliverable", 550)],
+                )
+
+    async def test_policy(self):
+        self.records.update({"one.fake": ["127.0.0.1"], "policy.fake": ["127.0.0.2"]})
+        for pipelining in (True, False):
+            with self.subTest(pipelining=pipelining), patch.object(
+                smtp, "SMTP_PIPELINING", pipelining
+            ), patch.object(smtp, "RESULT_CACHE", MemoryCache()):
+                smtp.VERDICTS.cache.clear()
+
+                # a single recipient refused by policy does not make the
+                # domain a reject-all one, as the probe address is not
+                result = await SMTPVerifier.validate_email("blocked@one.fake")
+                self.assertEqual(result.code, 550)
+                await asyncio.gather(*smtp.REFRESHES.values())
+                self.assertEqual(
+                    smtp.VERDICTS.get("one.fake", "127.0.0.1").reject_all, False
+                )
+                del self.server.log[:]
+                result = await SMTPVerifier.validate_email("joao@one.fake")
+                self.assertEqual(result.status, "deliverable")
+                self.assertEqual(len(self.commands("RCPT")), 1)
+
+                # once the probe address is refused by policy as well the
+                # other addresses of the domain are answered from the verdict
+                result = await SMTPVerifier.validate_email("joao@policy.fake")
+                self.assertEqual(result.code, 550)
+                await asyncio.gather(*smtp.REFRESHES.values())
+                self.assertEqual(
+                    smtp.VERDICTS.get("policy.fake", "127.0.0.2").reject_all, True
+                )
+                del self.server.log[:]
+                result = await SMTPVerifier.validate_email("maria@policy.fake")
+                self.assertEqual(result.status, "unknown")
+                self.assertEqual(result.cached, True)
+                self.assertEqual(self.commands("RCPT"), [])
+
+    async def test_catch_all(self):
+        self.records.update(
+            {"catchall.fake": ["127.0.0.1"], "strict.fake": ["127.0.0.2"]}
+        )
+        for pipelining in (True, False):
+            with self.subTest(pipelining=pipelining), patch.object(
+                smtp, "SMTP_PIPELINING", pipelining
+            ):
+                smtp.VERDICTS.cache.clear()
+                del self.server.log[:]
+                connections = self.server.connections
+
+                result = await SMTPVerifier.validate_email(
+                    "joao@catchall.fake", cache=False
+                )
+                other = await SMTPVerifier.validate_email(
+                    "joao@strict.fake", cache=False
+                )
+
+                # the probe is an extra recipient of the session (and mail
+                # transaction) of the address, with no session of its own
+                for host in ("127.0.0.1", "127.0.0.2"):
+                    rcpts = self.commands("RCPT", host)
+                    self.assertEqual(len(rcpts), 2)
+                    self.assertIn("averylargemail", rcpts[1])
+                    self.assertEqual(len(self.commands("MAIL", host)), 1)
+                self.assertLessEqual(self.server.connections - connections, 2)
+
+                # the verdict of the probe is applied to the result and
+                # stored, so that the next address skips the probe
+                self.assertEqual(result.status, "risky")
+                self.assertEqual(result.catch_all, True)
+                self.assertEqual(other.status, "deliverable")
+                self.assertEqual(other.catch_all, False)
+                self.assertEqual(
+                    smtp.VERDICTS.get("catchall.fake", "127.0.0.1").catch_all, True
+                )
+                self.assertEqual(
+                    smtp.VERDICTS.get("strict.fake", "127.0.0.2").catch_all, False
+                )
+
+                del self.server.log[:]
+                result = await SMTPVerifier.validate_email(
+                    "maria@catchall.fake", cache=False
+                )
+                self.assertEqual(result.status, "risky")
+                self.assertEqual(len(self.commands("RCPT")), 1)
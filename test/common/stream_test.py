@@ -0,0 +1,114 @@
+import asyncio
+
+from typing import Any
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+from posterum.common.errors import OverloadedError
+from posterum.common.stream import aiter_sync, iter_lines, parse_lines, validate_stream
+
+
+async def _validate(address: str, cache: bool | None = None) -> dict[str, Any]:
+    await asyncio.sleep(0.05 if address.startswith("slow") else 0.01)
+    return dict(address=address)
+
+
+class TestStream(IsolatedAsyncioTestCase):
+    async def test_validate_stream(self):
+        addresses = ["slow@a.com", "b@b.com", "c@c.com", "d@d.com"]
+        with patch("posterum.common.stream._validate", _validate):
+            ordered = [
+                data["address"]
+                async for data in validate_stream(
+                    aiter_sync(addresses), concurrency=2, ordered=True
+                )
+            ]
+            unordered = [
+                data["address"]
+                async for data in validate_stream(
+                    aiter_sync(addresses), concurrency=2, ordered=False
+                )
+            ]
+        self.assertEqual(ordered, addresses)
+        self.assertEqual(sorted(unordered), sorted(addresses))
+        self.assertEqual(unordered[-1], "slow@a.com")
+
+    async def test_concurrency(self):
+        running = 0
+        peak = 0
+
+        async def validate(address: str, cache: bool | None = None):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return dict(address=address)
+
+        with patch("posterum.common.stream._validate", validate):
+            results = [
+                data
+                async for data in validate_stream(
+                    aiter_sync([f"{index}@a.com" for index in range(20)]),
+                    concurrency=3,
+                )
+            ]
+        self.assertEqual(len(results), 20)
+        self.assertEqual(peak, 3)
+
+    async def test_overloaded(self):
+        reads: list[str] = []
+        calls: list[tuple[str, float]] = []
+
+        async def addresses():
+            for address in ["shed@a.com", "b@b.com", "c@c.com"]:
+                reads.append(address)
+                yield address
+
+        async def validate(address: str, cache: bool | None = None, delay=0.0):
+            calls.append((address, delay))
+            await asyncio.sleep(delay or 0.01)
+            if address.startswith("shed") and not delay:
+                raise OverloadedError(code=429, retry_after=0.1)
+            return dict(address=address)
+
+        results = []
+        with patch("posterum.common.stream._validate", validate):
+            async for data in validate_stream(addresses(), concurrency=2):
+                results.append(data["address"])
+                # no other address is read while the shed one is retried
+                if data["address"] == "shed@a.com":
+                    self.assertEqual(reads, ["shed@a.com", "b@b.com"])
+        self.assertEqual(results, ["b@b.com", "shed@a.com", "c@c.com"])
+        self.assertEqual(
+            [call for call in calls if call[0] == "shed@a.com"],
+            [("shed@a.com", 0.0), ("shed@a.com", 0.1)],
+        )
+
+    async def test_parse_ndjson(self):
+        lines = ['"a@a.com"', '{"email": "b@b.com"}', "", "c@c.com", "{}"]
+        addresses = [address async for address in parse_lines(aiter_sync(lines))]
+        self.assertEqual(addresses, ["a@a.com", "b@b.com", "c@c.com"])
+
+    async def test_parse_csv(self):
+        lines = ["name,Email", "A,a@a.com", '"B, b",b@b.com']
+        addresses = [
+            address
+            async for address in parse_lines(aiter_sync(lines), input_format="csv")
+        ]
+        self.assertEqual(addresses, ["a@a.com", "b@b.com"])
+
+        lines = ["a@a.com,A", "b@b.com,B"]
+        addresses = [
+            address
+            async for address in parse_lines(aiter_sync(lines), input_format="csv")
+        ]
+        self.assertEqual(addresses, ["a@a.com", "b@b.com"])
+
+    async def test_iter_lines(self):
+        async def chunks():
+            for chunk in (b"a@a.c", b"om\nb@b.com\n", b"c@c.com"):
+                yield chunk
+
+        lines = [line async for line in iter_lines(chunks())]
+        self.assertEqual(lines, ["a@a.com", "b@b.com", "c@c.com"])
@@ -0,0 +1,67 @@
+from unittest import TestCase
+
+from posterum.common.syntax import AddressError, AddressParser
+
+
+class TestAddressParser(TestCase):
+    def setUp(self):
+        self.parser = AddressParser.load()
+
+    def test_parse(self):
+        address = self.parser.parse(" Joao.Magalhaes@Example.PT ")
+        self.assertEqual(address.local, "Joao.Magalhaes")
+        self.assertEqual(address.domain, "example.pt")
+        self.assertEqual(address.address, "Joao.Magalhaes@example.pt")
+        self.assertEqual(address.key, "joao.magalhaes@example.pt")
+
+        address = self.parser.parse('"john doe@home"@bücher.de')
+        self.assertEqual(address.domain, "xn--bcher-kva.de")
+        self.assertEqual(address.key, '"john doe@home"@xn--bcher-kva.de')
+
+    def test_local_rules(self):
+        for email in (
+            "JoaoMagalhaes@gmail.com",
+            "joao.magalhaes@gmail.com",
+            "joao.magalhaes+news@googlemail.com",
+        ):
+            self.assertEqual(self.parser.parse(email).key, "joaomagalhaes@gmail.com")
+        self.assertEqual(
+            self.parser.parse("joao.m+news@outlook.com").key, "joao.m@outlook.com"
+        )
+        self.assertEqual(self.parser.parse("+news@gmail.com").key, "+news@gmail.com")
+
+    def test_invalid(self):
+        for email in (
+            "joao",
+            "joao@",
+            "@example.pt",
+            "joao..m@example.pt",
+            ".joao@example.pt",
+            "joao m@example.pt",
+            "joao\n@example.pt",
+            "joao@example",
+            "joao@exa_mple.pt",
+            "joao@-example.pt",
+            "joao@example..pt",
+            "joao@example.123",
+            "joao@[127.0.0.1]",
+            "a" * 65 + "@example.pt",
+        ):
+            with self.assertRaises(AddressError, msg=email) as context:
+                self.parser.parse(email)
+            self.assertEqual(context.exception.status, "invalid")
+
+    def test_reserved(self):
+        for email in ("joao@example.com", "joao@host.test", "joao@printer.local"):
+            with self.assertRaises(AddressError) as context:
+                self.parser.parse(email)
+            self.assertEqual(context.exception.status, "invalid")
+
+    def test_disposable(self):
+        for email in ("joao@mailinator.com", "joao@eu.Mailinator.com"):
+            with self.assertRaises(AddressError) as context:
+                self.parser.parse(email)
+            self.assertEqual(context.exception.status, "disposable")
+        parser = AddressParser(disposable=["throwaway.pt"])
+        self.assertRaises(AddressError, parser.parse, "joao@throwaway.pt")
+        self.assertEqual(parser.parse("joao@mailinator.com").domain, "mailinator.com")
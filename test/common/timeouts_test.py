@@ -0,0 +1,48 @@
+import asyncio
+
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from posterum.common.timeouts import Deadline, LatencyEstimator
+
+
+class TestDeadline(IsolatedAsyncioTestCase):
+    async def test_cap(self):
+        deadline = Deadline(5.0)
+        self.assertEqual(deadline.cap(1.0), 1.0)
+        self.assertLessEqual(deadline.cap(10.0), 5.0)
+        self.assertFalse(deadline.expired)
+        self.assertEqual(Deadline().cap(10.0), 10.0)
+        self.assertEqual(Deadline().remaining, None)
+        self.assertTrue(Deadline(0.0).expired)
+        self.assertEqual(Deadline(0.0).cap(10.0), 0.0)
+
+    async def test_wait_for(self):
+        deadline = Deadline(0.05)
+        self.assertEqual(await deadline.wait_for(asyncio.sleep(0.0, "done")), "done")
+        with self.assertRaises(asyncio.TimeoutError):
+            await deadline.wait_for(asyncio.sleep(1.0))
+        self.assertTrue(deadline.expired)
+
+
+class TestLatencyEstimator(TestCase):
+    def test_timeout(self):
+        estimator = LatencyEstimator(min_samples=3, min_timeout=0.5)
+        self.assertEqual(estimator.timeout("mx", 10.0), 10.0)
+        for latency in (0.2, 0.3, 0.2, 0.3, 0.25):
+            estimator.observe("mx", latency)
+        mean, deviation = estimator.estimate("mx")
+        self.assertAlmostEqual(mean, 0.24, places=1)
+        self.assertGreater(deviation, 0.0)
+        self.assertAlmostEqual(
+            estimator.timeout("mx", 10.0), max(mean + 4.0 * deviation, 0.5)
+        )
+        self.assertEqual(estimator.timeout("mx", 0.1), 0.1)
+        self.assertEqual(estimator.estimate("other"), None)
+
+    def test_censored(self):
+        estimator = LatencyEstimator(min_samples=1, min_timeout=0.0)
+        estimator.observe("mx", 1.0)
+        estimator.observe("mx", 0.1, censored=True)
+        self.assertEqual(estimator.estimate("mx"), (1.0, 0.0))
+        estimator.observe("mx", 5.0, censored=True)
+        self.assertGreater(estimator.timeout("mx", 10.0), 1.0)
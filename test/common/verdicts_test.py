@@ -0,0 +1,26 @@
+from unittest import TestCase
+
+from posterum.common.cache import MemoryCache
+from posterum.common.verdicts import Verdict, VerdictStore
+
+
+class TestVerdictStore(TestCase):
+    def test_update(self):
+        store = VerdictStore(MemoryCache(), ttl=60.0, refresh=3600.0)
+        self.assertEqual(store.get("a.com", "mx"), Verdict())
+        self.assertEqual(store.lookup("a.com", "mx"), (None, False))
+
+        verdict = store.update("a.com", "mx", catch_all=True)
+        self.assertEqual(verdict, Verdict(catch_all=True))
+        verdict = store.update("a.com", "mx", tarpit=False)
+        self.assertEqual(verdict, Verdict(catch_all=True, tarpit=False))
+        self.assertEqual(store.lookup("a.com", "mx"), (verdict, False))
+        self.assertEqual(store.get("a.com", "other"), Verdict())
+
+        store.refresh = 0.0
+        self.assertEqual(store.lookup("a.com", "mx"), (verdict, True))
+
+    def test_encode(self):
+        verdict = Verdict(catch_all=True, reject_all=False)
+        self.assertEqual(verdict.encode(), [True, False, None, None])
+        self.assertEqual(Verdict.decode(verdict.encode()), verdict)
@@ -0,0 +1,80 @@
+import io
+
+from json import loads
+from typing import Any
+from unittest import TestCase
+
+import appier
+
+from posterum.main import PosterumApp
+
+
+class TestAddressController(TestCase):
+    """
+    Runs the address endpoints of the appier app through its WSGI
+    interface, which handles the errors raised by the controllers.
+    """
+
+    app: PosterumApp
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = PosterumApp(session_c=appier.MemorySession)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.unload()
+
+    def request(self, method: str, path: str, body: bytes = b"") -> tuple[int, Any]:
+        path, _, query = path.partition("?")
+        environ = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "8080",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.url_scheme": "http",
+        }
+        status: list[str] = []
+
+        def start_response(_status: str, _headers: list[tuple[str, str]]):
+            status.append(_status)
+
+        data = b"".join(self.app.application(environ, start_response))
+        return int(status[0].split(" ", 1)[0]), loads(data)
+
+    def test_batch_errors(self):
+        for body, message in (
+            (b"[]", "Missing email addresses"),
+            (b'{"addresses": []}', "Missing email addresses"),
+            (b"[", "Missing email addresses"),
+            (b'"joao@a.com"', "Invalid email addresses (expected a list of strings)"),
+            (b"[1, 2]", "Invalid email addresses (expected a list of strings)"),
+        ):
+            code, error = self.request("POST", "/v1/addresses/validate/batch", body)
+            self.assertEqual(code, 400)
+            self.assertEqual(error["name"], "UserError")
+            self.assertEqual(error["message"], message)
+
+    def test_batch_limit(self):
+        # both the plain list of addresses and the object containing
+        # them are accepted, as in the FastAPI app
+        appier.conf_s("BATCH_LIMIT", 1)
+        try:
+            for body in (
+                b'["joao@a.com", "maria@a.com"]',
+                b'{"emails": ["joao@a.com", "maria@a.com"]}',
+            ):
+                code, error = self.request("POST", "/v1/addresses/validate/batch", body)
+                self.assertEqual(code, 400)
+                self.assertEqual(
+                    error["message"], "Too many email addresses (limit is 1)"
+                )
+        finally:
+            appier.conf_r("BATCH_LIMIT")